@@ -0,0 +1,136 @@
+"""
+Background nutrition analysis for the two-phase upload.
+
+api/upload/async/ classifies the image inside the request, records an
+AnalysisJob with the predictions and hands the nutrition step (Gemini or the
+local nutrient table) to a thread pool, so a worker is held only for inference.
+Clients poll api/upload/jobs/<id>/, optionally long-polling with ?wait=<seconds>.
+Jobs live in the database, so any worker can answer a poll.
+
+A long poll holds a sync (WSGI) worker for its whole wait, so the wait is
+capped at ANALYSIS_JOB_MAX_WAIT (2 s by default) and pending responses carry
+Retry-After; clients are expected to poll again rather than hold the request.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import AnalysisJob
+
+
+# Database re-check interval while long-polling a job running in another worker
+POLL_INTERVAL = 0.25
+
+# Expired jobs are purged at most this often (seconds) per process
+CLEANUP_INTERVAL = 60.0
+
+# Default upper bound of a long poll (seconds), see ANALYSIS_JOB_MAX_WAIT
+MAX_WAIT = 2.0
+
+# Retry-After (seconds) suggested to clients polling a pending job
+RETRY_AFTER = 1
+
+
+class AnalysisJobRunner:
+    """Run job tasks on a thread pool and persist their results on the AnalysisJob row."""
+
+    def __init__(self, max_workers: int = 4, ttl_hours: float = 24):
+        self.ttl = timedelta(hours=ttl_hours)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='analysis-job')
+        self._lock = threading.Lock()
+        self._events: Dict[str, threading.Event] = {}
+        self._last_cleanup = 0.0
+
+    def _cleanup(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_cleanup < CLEANUP_INTERVAL:
+                return
+            self._last_cleanup = now
+        AnalysisJob.objects.filter(created_at__lt=timezone.now() - self.ttl).delete()
+
+    def submit(self, predictions: List[Dict], task: Callable[[], Dict]) -> AnalysisJob:
+        """
+        Create a pending job and run task() in the background.
+
+        Args:
+            predictions: Classifier output, returned to pollers while the job is pending
+            task: Produces the final JSON-serialisable result
+        """
+        self._cleanup()
+        job = AnalysisJob.objects.create(predictions=predictions)
+        event = threading.Event()
+        with self._lock:
+            self._events[str(job.id)] = event
+        self._executor.submit(self._run, str(job.id), task, event)
+        return job
+
+    def complete(self, predictions: List[Dict], result: Dict) -> AnalysisJob:
+        """Record a job whose result is already known (e.g. a result cache hit)."""
+        self._cleanup()
+        return AnalysisJob.objects.create(predictions=predictions, status=AnalysisJob.DONE, result=result,
+                                          finished_at=timezone.now())
+
+    def _run(self, job_id: str, task: Callable[[], Dict], event: threading.Event):
+        try:
+            result = task()
+            AnalysisJob.objects.filter(pk=job_id).update(
+                status=AnalysisJob.DONE, result=result, finished_at=timezone.now()
+            )
+        except Exception as e:
+            print(f"[WARN] Analysis job {job_id} failed: {e}")
+            AnalysisJob.objects.filter(pk=job_id).update(
+                status=AnalysisJob.FAILED, error=str(e), finished_at=timezone.now()
+            )
+        finally:
+            event.set()
+            with self._lock:
+                self._events.pop(job_id, None)
+            # Pool threads are not request threads, so Django will not close this for us
+            connection.close()
+
+    def wait(self, job_id: str, timeout: float = 0.0) -> Optional[AnalysisJob]:
+        """
+        Fetch a job, waiting up to timeout seconds for it to finish.
+
+        Jobs started by this process are awaited on an in-process event; jobs
+        from other workers are re-read every POLL_INTERVAL seconds.
+
+        Returns:
+            AnalysisJob or None if it does not exist (or has expired)
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._lock:
+            event = self._events.get(job_id)
+        if event is not None and timeout > 0:
+            event.wait(timeout)
+
+        job = AnalysisJob.objects.filter(pk=job_id).first()
+        while job is not None and job.status == AnalysisJob.PENDING:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(POLL_INTERVAL, remaining))
+            job = AnalysisJob.objects.filter(pk=job_id).first()
+        return job
+
+
+_job_runner = None
+
+
+def get_job_runner() -> AnalysisJobRunner:
+    """Global job runner configured from settings."""
+    global _job_runner
+    if _job_runner is None:
+        _job_runner = AnalysisJobRunner(
+            max_workers=getattr(settings, 'ANALYSIS_JOB_WORKERS', 4),
+            ttl_hours=getattr(settings, 'ANALYSIS_JOB_TTL_HOURS', 24),
+        )
+    return _job_runner
@@ -0,0 +1,125 @@
+import json
+import tempfile
+from pathlib import Path
+
+import torch
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_models.benchmark import (
+    BACKENDS, ClassifierFactory, case_key, compare_to_baseline, environment, load_images, peak_rss_bytes,
+    run_case, synthetic_jpegs,
+)
+from ml_models.food_classifier import FoodSeg103Classifier
+from ml_models.image_preprocessing import find_images
+
+
+class Command(BaseCommand):
+    help = ('Benchmark FoodSeg103 inference end to end (decode, preprocess, forward, postprocess) '
+            'across models, backends, image sizes, batch sizes and thread counts')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models', nargs='+', default=['resnet50_attention'],
+                            choices=FoodSeg103Classifier.MODEL_NAMES)
+        parser.add_argument('--backends', nargs='+', default=['torch', 'onnx'], choices=list(BACKENDS))
+        parser.add_argument('--image-sizes', nargs='+', type=int, default=[224])
+        parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8])
+        parser.add_argument('--threads', nargs='+', type=int, default=None,
+                            help='torch/ONNX Runtime intra-op threads (default: current setting)')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed batches per case')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed batches per case')
+        parser.add_argument('--images', default=None,
+                            help='Folder of food photos (default: synthetic 640x480 JPEGs)')
+        parser.add_argument('--num-images', type=int, default=32)
+        parser.add_argument('--checkpoint', default=None,
+                            help='Checkpoint used for every model (default: random weights, no download)')
+        parser.add_argument('--int8-path', default=None, help='Calibrated INT8 file for the int8 backend')
+        parser.add_argument('--workdir', default=None,
+                            help='Where random weights and ONNX exports are kept (default: temporary)')
+        parser.add_argument('--output', default=None, help='Write the JSON report to this file')
+        parser.add_argument('--baseline', default=None, help='Previous JSON report to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.1,
+                            help='Relative slowdown / throughput loss / weight size growth counted as a regression')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error when a case regressed against the baseline')
+
+    def handle(self, *args, **options):
+        if options['checkpoint'] and not Path(options['checkpoint']).exists():
+            raise CommandError(f"Checkpoint not found: {options['checkpoint']}")
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline {options['baseline']}: {e}")
+
+        if options['images']:
+            images = load_images(find_images(options['images'], options['num_images']))
+            if not images:
+                raise CommandError(f"No images found in {options['images']}")
+        else:
+            images = synthetic_jpegs(max(1, options['num_images']))
+
+        default_threads = torch.get_num_threads()
+        thread_counts = options['threads'] or [default_threads]
+
+        with tempfile.TemporaryDirectory(prefix='foodseg-benchmark-') as tmpdir:
+            factory = ClassifierFactory(options['workdir'] or tmpdir, checkpoint=options['checkpoint'],
+                                        int8_path=options['int8_path'])
+            cases = []
+            try:
+                for model_name in options['models']:
+                    for image_size in options['image_sizes']:
+                        # Only one model's weights resident at a time
+                        factory.clear()
+                        for backend in options['backends']:
+                            for threads in thread_counts:
+                                torch.set_num_threads(threads)
+                                for batch_size in options['batch_sizes']:
+                                    cases.append(self._case(factory, images, options, model_name, image_size,
+                                                            backend, threads, batch_size))
+            finally:
+                torch.set_num_threads(default_threads)
+
+        report = {
+            'environment': environment(),
+            'config': {
+                'images': options['images'] or 'synthetic',
+                'num_images': len(images),
+                'checkpoint': options['checkpoint'] or 'random',
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+            },
+            'cases': cases,
+            # Whole-run high-water mark; not comparable per case, so not part of the baseline check
+            'peak_rss_mb': round(peak_rss_bytes() / 1e6, 1),
+        }
+        if baseline is not None:
+            report['tolerance'] = options['tolerance']
+            report['regressions'] = compare_to_baseline(cases, baseline, options['tolerance'])
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2))
+        self.stdout.write(json.dumps(report, indent=2))
+
+        for case in cases:
+            if 'error' in case:
+                self.stderr.write(f"{case_key(case)} skipped: {case['error']}")
+        regressions = report.get('regressions', [])
+        for r in regressions:
+            self.stderr.write(f"{r['case']} regressed: {r['metric']} {r['baseline']} -> {r['current']} "
+                              f"({r['ratio']}x)")
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}")
+
+    def _case(self, factory, images, options, model_name, image_size, backend, threads, batch_size):
+        case = {'model': model_name, 'backend': backend, 'image_size': image_size,
+                'batch_size': batch_size, 'threads': threads}
+        try:
+            classifier = factory.get(model_name, image_size, backend, threads)
+            case.update(run_case(classifier, images, batch_size,
+                                 iterations=max(1, options['iterations']), warmup=max(0, options['warmup'])))
+        except Exception as e:
+            # Keep sweeping; the failure is part of the report
+            case['error'] = f"{type(e).__name__}: {e}"
+        return case
@@ -0,0 +1,52 @@
+import time
+from pathlib import Path
+
+import torch
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_models.food_classifier import FoodSeg103Classifier
+from ml_models.image_preprocessing import find_images
+from ml_models.quantization import calibrate, model_size_bytes
+
+
+class Command(BaseCommand):
+    help = 'Calibrate static INT8 quantization of the FoodSeg103 classifier on a local image folder'
+
+    def add_arguments(self, parser):
+        parser.add_argument('image_dir', help='Folder of representative food photos (searched recursively)')
+        parser.add_argument('--model-path', default=None, help='Float checkpoint (default: the served checkpoint)')
+        parser.add_argument('--output', default=None, help='Output file (default: <checkpoint>_int8.pth)')
+        parser.add_argument('--num-images', type=int, default=200, help='Maximum calibration images')
+        parser.add_argument('--batch-size', type=int, default=16)
+
+    def handle(self, *args, **options):
+        paths = find_images(options['image_dir'], options['num_images'])
+        if not paths:
+            raise CommandError(f"No images found in {options['image_dir']}")
+
+        classifier = FoodSeg103Classifier(model_path=options['model_path'], quantization='fp32')
+        output = Path(options['output'] or classifier.quantized_model_path)
+        batch_size = max(1, options['batch_size'])
+
+        def batches():
+            for start in range(0, len(paths), batch_size):
+                yield classifier.preprocess_images([str(p) for p in paths[start:start + batch_size]])
+
+        self.stdout.write(f"Calibrating on {len(paths)} images...")
+        started = time.perf_counter()
+        quantized = calibrate(classifier.model, batches())
+        elapsed = time.perf_counter() - started
+
+        torch.save({
+            'quantized_state_dict': quantized.state_dict(),
+            'source_checkpoint': str(classifier.model_path),
+            'num_calibration_images': len(paths),
+            'quantized_engine': torch.backends.quantized.engine,
+        }, output)
+
+        fp32_mb = model_size_bytes(classifier.model) / 1e6
+        int8_mb = model_size_bytes(quantized) / 1e6
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved INT8 model to {output} ({int8_mb:.1f} MB vs {fp32_mb:.1f} MB fp32, "
+            f"calibration took {elapsed:.1f}s)"
+        ))
@@ -0,0 +1,75 @@
+import json
+import time
+from pathlib import Path
+
+import torch
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_models.food_classifier import FoodSeg103Classifier
+from ml_models.slim_checkpoint import default_slim_path, save_slim_checkpoint
+
+
+class Command(BaseCommand):
+    help = 'Convert a FoodSeg103 training checkpoint into a slim, memory-mappable inference checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-name', default='resnet50_attention', choices=FoodSeg103Classifier.MODEL_NAMES)
+        parser.add_argument('--checkpoint', default=None,
+                            help='Training checkpoint (default: ml_models/models/foodseg103_resnet50_attention.pth)')
+        parser.add_argument('--output', default=None, help='Output file (default: <checkpoint>.safetensors)')
+        parser.add_argument('--class-names', default=None, help='Class mapping JSON to embed (default: FoodSeg103)')
+        parser.add_argument('--image-size', type=int, default=224)
+        parser.add_argument('--dtype', default='fp32', choices=('fp32', 'fp16'),
+                            help='Storage precision; only fp32 weights are served straight from the mapping')
+        parser.add_argument('--atol', type=float, default=None,
+                            help='Max allowed probability difference (default: 1e-6 for fp32, 1e-2 for fp16)')
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint'] or (
+            Path(settings.BASE_DIR) / 'ml_models' / 'models' / 'foodseg103_resnet50_attention.pth'
+        )
+        if not Path(checkpoint).exists():
+            raise CommandError(f"Checkpoint not found: {checkpoint}")
+        output = Path(options['output'] or default_slim_path(checkpoint))
+
+        started = time.perf_counter()
+        source = FoodSeg103Classifier(model_path=str(checkpoint), class_names_path=options['class_names'],
+                                      model_name=options['model_name'], image_size=options['image_size'])
+        source_seconds = time.perf_counter() - started
+
+        save_slim_checkpoint(
+            source.model.state_dict(), output,
+            metadata={
+                'model_name': source.model_name,
+                'num_classes': source.num_classes,
+                'image_size': source.image_size,
+                'class_names': json.dumps(source.class_names, ensure_ascii=False),
+                'source_checkpoint': Path(checkpoint).name,
+                'dtype': options['dtype'],
+            },
+            dtype=torch.float16 if options['dtype'] == 'fp16' else None,
+        )
+
+        started = time.perf_counter()
+        slim = FoodSeg103Classifier(model_path=str(output), class_names_path=options['class_names'],
+                                    model_name=options['model_name'], image_size=options['image_size'])
+        slim_seconds = time.perf_counter() - started
+
+        size = options['image_size']
+        images = torch.rand(2, 3, size, size, generator=torch.Generator().manual_seed(0))
+        max_diff = (source.predict_probabilities(images) - slim.predict_probabilities(images)).abs().max().item()
+        atol = options['atol'] if options['atol'] is not None else (1e-6 if options['dtype'] == 'fp32' else 1e-2)
+
+        self.stdout.write(json.dumps({
+            'output': str(output),
+            'checkpoint_mb': round(Path(checkpoint).stat().st_size / 1e6, 1),
+            'slim_mb': round(output.stat().st_size / 1e6, 1),
+            'checkpoint_load_seconds': round(source_seconds, 3),
+            'slim_load_seconds': round(slim_seconds, 3),
+            'weights_mapped': slim.weights_mapped,
+            'max_abs_diff': max_diff,
+        }, indent=2))
+        if max_diff > atol:
+            raise CommandError(f"Slim checkpoint outputs differ from the training checkpoint by {max_diff:.2e} > {atol}")
+        self.stdout.write(self.style.SUCCESS(f"Wrote slim checkpoint to {output}"))
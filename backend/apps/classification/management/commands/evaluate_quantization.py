@@ -0,0 +1,137 @@
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_models.food_classifier import FoodSeg103Classifier
+from ml_models.image_preprocessing import find_images
+from ml_models.quantization import QUANTIZATION_MODES, model_size_bytes
+
+
+def average_precision(scores, targets):
+    """Per-class average precision; classes without positives are NaN."""
+    order = np.argsort(-scores, axis=0, kind='stable')
+    sorted_targets = np.take_along_axis(targets, order, axis=0)
+    hits = np.cumsum(sorted_targets, axis=0)
+    precision = hits / np.arange(1, scores.shape[0] + 1)[:, None]
+    positives = sorted_targets.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (precision * sorted_targets).sum(axis=0) / positives
+
+
+def mean_average_precision(scores, targets):
+    ap = average_precision(scores, targets)
+    return round(float(np.nanmean(ap)), 4) if np.isfinite(ap).any() else None
+
+
+class Command(BaseCommand):
+    help = 'Compare quantized FoodSeg103 inference modes against fp32 (mAP, top-k agreement, latency, size)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('image_dir', help='Folder of evaluation food photos (searched recursively)')
+        parser.add_argument('--modes', nargs='+', default=['dynamic', 'int8'],
+                            choices=[m for m in QUANTIZATION_MODES if m != 'fp32'])
+        parser.add_argument('--model-path', default=None, help='Float checkpoint (default: the served checkpoint)')
+        parser.add_argument('--int8-path', default=None, help='Calibrated INT8 file for int8 mode')
+        parser.add_argument('--labels', default=None,
+                            help='Optional JSON {relative image path: [class names]}; '
+                                 'without it mAP is measured against fp32 predictions')
+        parser.add_argument('--num-images', type=int, default=0, help='Maximum images (0 = all)')
+        parser.add_argument('--batch-size', type=int, default=8)
+        parser.add_argument('--top-k', type=int, default=5)
+        parser.add_argument('--threshold', type=float, default=0.5,
+                            help='Threshold turning fp32 probabilities into pseudo-labels')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def _run(self, classifier, batches):
+        """Probabilities for all images plus per-batch forward latencies."""
+        outputs, latencies = [], []
+        classifier.warmup(iterations=1, batch_size=batches[0].shape[0])
+        for batch in batches:
+            started = time.perf_counter()
+            outputs.append(classifier.predict_probabilities(batch))
+            latencies.append(time.perf_counter() - started)
+        return torch.cat(outputs).numpy(), np.array(latencies)
+
+    def _targets(self, options, root, paths, classifier, reference):
+        if not options['labels']:
+            return (reference >= options['threshold']).astype(np.float64)
+        with open(options['labels']) as f:
+            labels = json.load(f)
+        index = {name: i for i, name in enumerate(classifier.output_class_names)}
+        targets = np.zeros_like(reference, dtype=np.float64)
+        for row, path in enumerate(paths):
+            for name in labels.get(str(path.relative_to(root)), []):
+                if name in index:
+                    targets[row, index[name]] = 1.0
+        return targets
+
+    def _report(self, mode, classifier, probs, latencies, num_images, reference, targets, top_k):
+        latencies_ms = latencies * 1000.0
+        report = {
+            'mode': mode,
+            'model_size_mb': round(model_size_bytes(classifier.model) / 1e6, 2),
+            'latency_ms_per_batch': {
+                'mean': round(float(latencies_ms.mean()), 2),
+                'p50': round(float(np.percentile(latencies_ms, 50)), 2),
+                'p95': round(float(np.percentile(latencies_ms, 95)), 2),
+            },
+            'images_per_second': round(num_images / float(latencies.sum()), 2),
+            'mAP': mean_average_precision(probs, targets),
+        }
+        if mode != 'fp32':
+            ref_top = np.argsort(-reference, axis=1)[:, :top_k]
+            top = np.argsort(-probs, axis=1)[:, :top_k]
+            overlap = [np.intersect1d(a, b).size / top_k for a, b in zip(ref_top, top)]
+            report['top1_agreement'] = round(float(np.mean(ref_top[:, 0] == top[:, 0])), 4)
+            report[f'top{top_k}_overlap'] = round(float(np.mean(overlap)), 4)
+            report['max_abs_prob_diff'] = round(float(np.abs(probs - reference).max()), 4)
+        return report
+
+    def handle(self, *args, **options):
+        root = Path(options['image_dir'])
+        paths = find_images(root, options['num_images'])
+        if not paths:
+            raise CommandError(f"No images found in {root}")
+
+        batch_size = max(1, options['batch_size'])
+        top_k = options['top_k']
+
+        fp32 = FoodSeg103Classifier(model_path=options['model_path'], quantization='fp32')
+        batches = [
+            fp32.preprocess_images([str(p) for p in paths[start:start + batch_size]]).cpu()
+            for start in range(0, len(paths), batch_size)
+        ]
+
+        reference, latencies = self._run(fp32, batches)
+        targets = self._targets(options, root, paths, fp32, reference)
+        reports = [self._report('fp32', fp32, reference, latencies, len(paths), reference, targets, top_k)]
+
+        for mode in options['modes']:
+            classifier = FoodSeg103Classifier(model_path=options['model_path'], quantization=mode,
+                                              quantized_model_path=options['int8_path'])
+            if classifier.quantization != mode:
+                self.stderr.write(f"Mode '{mode}' unavailable, skipped")
+                continue
+            probs, latencies = self._run(classifier, batches)
+            report = self._report(mode, classifier, probs, latencies, len(paths), reference, targets, top_k)
+            report['speedup_vs_fp32'] = round(
+                reports[0]['latency_ms_per_batch']['mean'] / report['latency_ms_per_batch']['mean'], 2
+            )
+            reports.append(report)
+
+        if options['json']:
+            self.stdout.write(json.dumps(reports, indent=2))
+            return
+        label_source = 'labels' if options['labels'] else f"fp32 predictions >= {options['threshold']}"
+        self.stdout.write(f"{len(paths)} images, batch size {batch_size}, mAP against {label_source}")
+        for r in reports:
+            line = (f"{r['mode']}: {r['model_size_mb']} MB, {r['latency_ms_per_batch']['mean']} ms/batch "
+                    f"(p95 {r['latency_ms_per_batch']['p95']}), {r['images_per_second']} img/s, mAP {r['mAP']}")
+            if r['mode'] != 'fp32':
+                line += (f", speedup {r['speedup_vs_fp32']}x, top-1 agreement {r['top1_agreement']:.1%}, "
+                         f"top-{top_k} overlap {r[f'top{top_k}_overlap']:.1%}")
+            self.stdout.write(line)
@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_models.onnx_backend import ONNXRUNTIME_AVAILABLE, default_onnx_path
+from ml_models.onnx_export import EXPORTABLE_MODELS, check_equivalence, export_onnx, load_float_model
+
+
+class Command(BaseCommand):
+    help = 'Export a food classifier to ONNX (dynamic batch axis) and check it against PyTorch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-name', default='resnet50_attention', choices=EXPORTABLE_MODELS)
+        parser.add_argument('--checkpoint', default=None,
+                            help='Training checkpoint (default: the served FoodSeg103 checkpoint for '
+                                 'resnet50_attention, random weights otherwise)')
+        parser.add_argument('--output', default=None, help='Output .onnx file (default: <checkpoint>.onnx)')
+        parser.add_argument('--num-classes', type=int, default=103)
+        parser.add_argument('--image-size', type=int, default=224)
+        parser.add_argument('--opset', type=int, default=17)
+        parser.add_argument('--atol', type=float, default=1e-4, help='Max allowed probability difference')
+        parser.add_argument('--skip-check', action='store_true', help='Do not run the equivalence check')
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        if checkpoint is None and options['model_name'] == 'resnet50_attention':
+            checkpoint = Path(settings.BASE_DIR) / 'ml_models' / 'models' / 'foodseg103_resnet50_attention.pth'
+        if checkpoint is not None and not Path(checkpoint).exists():
+            raise CommandError(f"Checkpoint not found: {checkpoint}")
+
+        output = options['output'] or (default_onnx_path(checkpoint) if checkpoint else None)
+        if output is None:
+            raise CommandError("--output is required when exporting without a checkpoint")
+
+        model = load_float_model(options['model_name'], checkpoint, num_classes=options['num_classes'])
+        path = export_onnx(model, output, image_size=options['image_size'], opset=options['opset'])
+        size_mb = path.stat().st_size / 1e6
+        self.stdout.write(f"Exported {options['model_name']} to {path} ({size_mb:.1f} MB)")
+
+        if options['skip_check']:
+            return
+        if not ONNXRUNTIME_AVAILABLE:
+            raise CommandError("onnxruntime is not installed, cannot run the equivalence check")
+
+        report = check_equivalence(model, path, image_size=options['image_size'], atol=options['atol'])
+        self.stdout.write(json.dumps(report, indent=2))
+        if not report['passed']:
+            raise CommandError(f"ONNX outputs differ from PyTorch by more than {options['atol']}")
+        self.stdout.write(self.style.SUCCESS("ONNX Runtime output matches PyTorch"))
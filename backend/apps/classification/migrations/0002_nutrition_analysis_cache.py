@@ -0,0 +1,31 @@
+# Generated by Django 5.2
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classification', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NutritionAnalysisCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(help_text='SHA-256 of prompt version + sorted normalised food names', max_length=64, unique=True)),
+                ('food_names', models.JSONField(default=list)),
+                ('prompt_version', models.CharField(max_length=16)),
+                ('raw_response', models.TextField(blank=True)),
+                ('advanced', models.JSONField(blank=True, null=True)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
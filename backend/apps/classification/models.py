@@ -3,8 +3,10 @@ from django.db import models
 # Create your models here.
 
 import os
+import uuid
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 def user_directory_path(instance, filename):
     # if user is logged in use their username, otherwise “guest”
@@ -22,3 +24,44 @@ class Photo(models.Model):
     uploaded  = models.DateTimeField(auto_now_add=True)
 
 
+
+
+class NutritionAnalysisCache(models.Model):
+    """Parsed Gemini nutrition analysis for one normalised food-name set and prompt version."""
+    cache_key      = models.CharField(max_length=64, unique=True,
+                                      help_text="SHA-256 of prompt version + sorted normalised food names")
+    food_names     = models.JSONField(default=list)
+    prompt_version = models.CharField(max_length=16)
+    raw_response   = models.TextField(blank=True)
+    advanced       = models.JSONField(null=True, blank=True)
+    hit_count      = models.PositiveIntegerField(default=0)
+    created_at     = models.DateTimeField(default=timezone.now)
+    last_used_at   = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{'、'.join(self.food_names)} ({self.prompt_version})"
+
+
+class AnalysisJob(models.Model):
+    """Nutrition analysis running in the background for a two-phase upload (api/upload/async/)."""
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    id          = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status      = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    predictions = models.JSONField(default=list)
+    result      = models.JSONField(null=True, blank=True)
+    error       = models.TextField(blank=True)
+    created_at  = models.DateTimeField(default=timezone.now, db_index=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.id} ({self.status})"
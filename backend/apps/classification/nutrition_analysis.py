@@ -0,0 +1,324 @@
+"""
+Gemini nutrition analysis for a set of detected foods, with a persistent cache.
+
+The prompt depends only on the detected food names, so results are stored in
+NutritionAnalysisCache keyed by the normalised, sorted food-name set and
+PROMPT_VERSION. Concurrent requests for the same set in one worker are
+coalesced onto a single upstream call. With a timeout the call runs on a small
+background pool and keeps going after the caller gives up, so a slow reply still
+lands in the cache for the next request.
+"""
+
+import hashlib
+import json
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import NutritionAnalysisCache
+
+
+# Bump whenever the prompt or the parsing below changes; older cache rows are then ignored
+PROMPT_VERSION = 'v1'
+
+
+def normalize_food_names(food_names: Iterable[str]) -> List[str]:
+    """Sorted, de-duplicated, lower-cased and whitespace-collapsed food names."""
+    return sorted({' '.join(name.split()).lower() for name in food_names if name and name.strip()})
+
+
+def cache_key(food_names: List[str], prompt_version: str = PROMPT_VERSION) -> str:
+    """SHA-256 over the prompt version and the normalised food-name set."""
+    payload = json.dumps([prompt_version, food_names], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def build_prompt(food_names: List[str]) -> str:
+    """Gemini nutrition analysis for combined foods (request STRICT JSON)."""
+    food_list_str = "、".join(food_names)
+    return (
+        f"這張圖片中檢測到以下食物：「{food_list_str}」，"
+        "請根據這些食物提供『合計』的營養素，並且只回覆一段有效的 JSON（不要加入任何解說或前後文，也不要使用 Markdown 區塊）。\n"
+        "請以單人份計算；若份量不明，假設整體重約 300 克。\n"
+        "務必使 calories_kcal = 4×macros.carbs_g + 4×macros.protein_g + 9×macros.fat_g，且所有數值皆針對同一份量（不是每100克）。\n"
+        "欄位與單位請完全依下列結構輸出（數值請為數字型態，沒有資料請填 0）：\n"
+        "{\n"
+        "  \"calories_kcal\": 0,\n"
+        "  \"macros\": {\n"
+        "    \"carbs_g\": 0,\n"
+        "    \"protein_g\": 0,\n"
+        "    \"fat_g\": 0,\n"
+        "    \"fiber_g\": 0,\n"
+        "    \"sugar_g\": 0\n"
+        "  },\n"
+        "  \"fat_breakdown\": {\n"
+        "    \"saturated_fat_g\": 0,\n"
+        "    \"monounsaturated_fat_g\": 0,\n"
+        "    \"polyunsaturated_fat_g\": 0,\n"
+        "    \"trans_fat_g\": 0\n"
+        "  },\n"
+        "  \"cholesterol_mg\": 0,\n"
+        "  \"sodium_mg\": 0,\n"
+        "  \"potassium_mg\": 0,\n"
+        "  \"minerals_mg\": {\n"
+        "    \"calcium\": 0,\n"
+        "    \"iron\": 0,\n"
+        "    \"magnesium\": 0,\n"
+        "    \"phosphorus\": 0,\n"
+        "    \"zinc\": 0\n"
+        "  },\n"
+        "  \"vitamins\": {\n"
+        "    \"vitamin_a_ug_rae\": 0,\n"
+        "    \"vitamin_c_mg\": 0,\n"
+        "    \"vitamin_d_ug\": 0,\n"
+        "    \"vitamin_e_mg\": 0,\n"
+        "    \"vitamin_k_ug\": 0,\n"
+        "    \"thiamin_b1_mg\": 0,\n"
+        "    \"riboflavin_b2_mg\": 0,\n"
+        "    \"niacin_b3_mg\": 0,\n"
+        "    \"vitamin_b6_mg\": 0,\n"
+        "    \"folate_b9_ug_dfe\": 0,\n"
+        "    \"vitamin_b12_ug\": 0\n"
+        "  }\n"
+        "}"
+    )
+
+
+def parse_nutrition_response(gemini_resp: str) -> Tuple[Optional[Dict], Dict[str, str]]:
+    """
+    Parse the Gemini reply.
+
+    Returns:
+        (advanced_out with Atwater-corrected calories or None,
+         key: value fallback fields of the old line format)
+    """
+    # Parse the structured response (prefer JSON, fallback to simple key:value lines)
+    nutrition_data = {}
+    advanced = None
+    if gemini_resp:
+        # Try JSON parse directly
+        try:
+            advanced = json.loads(gemini_resp)
+        except Exception:
+            # Try to extract JSON block within text if any
+            try:
+                start = gemini_resp.find('{')
+                end = gemini_resp.rfind('}')
+                if start != -1 and end != -1 and end > start:
+                    advanced = json.loads(gemini_resp[start:end+1])
+            except Exception:
+                advanced = None
+
+        if advanced is None:
+            # Fallback: parse simple key: value lines (old format)
+            for line in gemini_resp.split('\n'):
+                if ':' in line:
+                    key, value = line.split(':', 1)
+                    nutrition_data[key.strip()] = value.strip()
+
+    # Helpers to safely read from advanced JSON
+    def get_num(obj, key, default=0.0):
+        try:
+            val = obj.get(key, default)
+            return float(val) if isinstance(val, (int, float, str)) and str(val).strip() != '' else default
+        except Exception:
+            return default
+
+    def get_nested(obj, path, default=0.0):
+        try:
+            cur = obj
+            for p in path:
+                cur = cur.get(p, {}) if isinstance(cur, dict) else {}
+            if isinstance(cur, (int, float)):
+                return float(cur)
+            if isinstance(cur, str):
+                m = re.search(r'(\d+\.?\d*)', cur)
+                return float(m.group(1)) if m else default
+            return default
+        except Exception:
+            return default
+
+    # Derive advanced fields if available
+    advanced_out = None
+    if isinstance(advanced, dict):
+        advanced_out = {
+            'calories_kcal': get_num(advanced, 'calories_kcal', 0.0),
+            'macros': {
+                'carbs_g': get_nested(advanced, ['macros', 'carbs_g'], 0.0),
+                'protein_g': get_nested(advanced, ['macros', 'protein_g'], 0.0),
+                'fat_g': get_nested(advanced, ['macros', 'fat_g'], 0.0),
+                'fiber_g': get_nested(advanced, ['macros', 'fiber_g'], 0.0),
+                'sugar_g': get_nested(advanced, ['macros', 'sugar_g'], 0.0),
+            },
+            'fat_breakdown': {
+                'saturated_fat_g': get_nested(advanced, ['fat_breakdown', 'saturated_fat_g'], 0.0),
+                'monounsaturated_fat_g': get_nested(advanced, ['fat_breakdown', 'monounsaturated_fat_g'], 0.0),
+                'polyunsaturated_fat_g': get_nested(advanced, ['fat_breakdown', 'polyunsaturated_fat_g'], 0.0),
+                'trans_fat_g': get_nested(advanced, ['fat_breakdown', 'trans_fat_g'], 0.0),
+            },
+            'cholesterol_mg': get_num(advanced, 'cholesterol_mg', 0.0),
+            'sodium_mg': get_num(advanced, 'sodium_mg', 0.0),
+            'potassium_mg': get_num(advanced, 'potassium_mg', 0.0),
+            'minerals_mg': {
+                'calcium': get_nested(advanced, ['minerals_mg', 'calcium'], 0.0),
+                'iron': get_nested(advanced, ['minerals_mg', 'iron'], 0.0),
+                'magnesium': get_nested(advanced, ['minerals_mg', 'magnesium'], 0.0),
+                'phosphorus': get_nested(advanced, ['minerals_mg', 'phosphorus'], 0.0),
+                'zinc': get_nested(advanced, ['minerals_mg', 'zinc'], 0.0),
+            },
+            'vitamins': {
+                'vitamin_a_ug_rae': get_nested(advanced, ['vitamins', 'vitamin_a_ug_rae'], 0.0),
+                'vitamin_c_mg': get_nested(advanced, ['vitamins', 'vitamin_c_mg'], 0.0),
+                'vitamin_d_ug': get_nested(advanced, ['vitamins', 'vitamin_d_ug'], 0.0),
+                'vitamin_e_mg': get_nested(advanced, ['vitamins', 'vitamin_e_mg'], 0.0),
+                'vitamin_k_ug': get_nested(advanced, ['vitamins', 'vitamin_k_ug'], 0.0),
+                'thiamin_b1_mg': get_nested(advanced, ['vitamins', 'thiamin_b1_mg'], 0.0),
+                'riboflavin_b2_mg': get_nested(advanced, ['vitamins', 'riboflavin_b2_mg'], 0.0),
+                'niacin_b3_mg': get_nested(advanced, ['vitamins', 'niacin_b3_mg'], 0.0),
+                'vitamin_b6_mg': get_nested(advanced, ['vitamins', 'vitamin_b6_mg'], 0.0),
+                'folate_b9_ug_dfe': get_nested(advanced, ['vitamins', 'folate_b9_ug_dfe'], 0.0),
+                'vitamin_b12_ug': get_nested(advanced, ['vitamins', 'vitamin_b12_ug'], 0.0),
+            }
+        }
+
+    # Recalculate calories with Atwater formula when advanced JSON is available
+    if isinstance(advanced_out, dict):
+        carbs = advanced_out['macros'].get('carbs_g', 0.0) if isinstance(advanced_out.get('macros'), dict) else 0.0
+        protein = advanced_out['macros'].get('protein_g', 0.0) if isinstance(advanced_out.get('macros'), dict) else 0.0
+        fat = advanced_out['macros'].get('fat_g', 0.0) if isinstance(advanced_out.get('macros'), dict) else 0.0
+        try:
+            atwater_cal = int(round(4 * float(carbs) + 4 * float(protein) + 9 * float(fat)))
+        except Exception:
+            atwater_cal = 0
+        advanced_out['calories_kcal'] = atwater_cal
+
+    return advanced_out, nutrition_data
+
+
+def _request_analysis(food_names: List[str], generate) -> Dict:
+    """Call Gemini and parse the reply; errors yield an empty reply like before."""
+    try:
+        gemini_raw = generate(build_prompt(food_names))
+        gemini_resp = getattr(gemini_raw, 'text', '') or ''
+    except Exception as e:
+        print(f"[WARN] Gemini analysis failed: {e}")
+        gemini_resp = ''
+    advanced_out, nutrition_data = parse_nutrition_response(gemini_resp) if gemini_resp else (None, {})
+    return {'raw': gemini_resp, 'advanced': advanced_out, 'nutrition_data': nutrition_data, 'cached': False}
+
+
+def _load_cached(key: str) -> Optional[Dict]:
+    entries = NutritionAnalysisCache.objects.filter(cache_key=key)
+    max_age_days = getattr(settings, 'NUTRITION_CACHE_MAX_AGE_DAYS', 30)
+    if max_age_days:
+        entries = entries.filter(created_at__gte=timezone.now() - timedelta(days=max_age_days))
+    entry = entries.only('id', 'raw_response', 'advanced').first()
+    if entry is None:
+        return None
+    NutritionAnalysisCache.objects.filter(pk=entry.pk).update(
+        hit_count=F('hit_count') + 1, last_used_at=timezone.now()
+    )
+    return {'raw': entry.raw_response, 'advanced': entry.advanced, 'nutrition_data': {}, 'cached': True}
+
+
+def _store(key: str, food_names: List[str], result: Dict):
+    defaults = {
+        'food_names': food_names,
+        'prompt_version': PROMPT_VERSION,
+        'raw_response': result['raw'],
+        'advanced': result['advanced'],
+        'created_at': timezone.now(),
+    }
+    try:
+        NutritionAnalysisCache.objects.update_or_create(cache_key=key, defaults=defaults)
+    except IntegrityError:
+        # Another worker stored the same set concurrently
+        pass
+
+
+class NutritionAnalyzer:
+    """Cache lookup plus per-key coalescing of in-flight Gemini calls."""
+
+    def __init__(self, generate):
+        """
+        Args:
+            generate: Callable sending a prompt upstream (e.g. GenerativeModel.generate_content)
+        """
+        self.generate = generate
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._executor = None
+
+    def _background(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(1, getattr(settings, 'NUTRITION_BACKGROUND_WORKERS', 4)),
+                    thread_name_prefix='nutrition',
+                )
+            return self._executor
+
+    def analyze(self, food_names: Iterable[str], timeout: Optional[float] = None) -> Optional[Dict]:
+        """
+        Args:
+            food_names: Detected food names
+            timeout: Seconds to wait for an upstream call. None waits in the calling
+                thread; otherwise None is returned on expiry while the call finishes
+                in the background and fills the cache.
+
+        Returns:
+            {'raw': Gemini text, 'advanced': advanced_out or None,
+             'nutrition_data': line-format fallback fields, 'cached': bool}, or None on timeout
+        """
+        names = normalize_food_names(food_names)
+        key = cache_key(names)
+        use_cache = getattr(settings, 'NUTRITION_CACHE_ENABLED', True)
+
+        if use_cache:
+            cached = _load_cached(key)
+            if cached is not None:
+                return cached
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+        if leader:
+            if timeout is None:
+                self._resolve(key, names, future, use_cache)
+            else:
+                self._background().submit(self._resolve_in_background, key, names, future, use_cache)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            return None
+
+    def _resolve(self, key: str, names: List[str], future: Future, use_cache: bool):
+        try:
+            result = _request_analysis(names, self.generate)
+            # Only fully parsed results are worth keeping; failures and old formats are retried
+            if use_cache and result['advanced'] is not None:
+                _store(key, names, result)
+            future.set_result(result)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _resolve_in_background(self, key: str, names: List[str], future: Future, use_cache: bool):
+        try:
+            self._resolve(key, names, future, use_cache)
+        finally:
+            # Pool threads are not request threads, so Django will not close this for us
+            connection.close()
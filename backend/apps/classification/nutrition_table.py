@@ -0,0 +1,179 @@
+"""
+Local per-class nutrient table for FoodSeg103.
+
+ml_models/models/foodseg103_nutrition.csv holds one nutrient vector per class
+for a default portion, with a '# version: N' header line. It is loaded once into
+a [num_classes, num_nutrients] float64 matrix, so the totals for a meal are a
+single weights @ matrix product, weighted by prediction confidence or by
+portion multipliers. This answers without any network call; Gemini becomes an
+optional refinement (see NUTRITION_MODE).
+"""
+
+import csv
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+
+
+# Column name -> path in the advanced_out structure returned by parse_nutrition_response
+NUTRIENT_FIELDS = {
+    'carbs_g': ('macros', 'carbs_g'),
+    'protein_g': ('macros', 'protein_g'),
+    'fat_g': ('macros', 'fat_g'),
+    'fiber_g': ('macros', 'fiber_g'),
+    'sugar_g': ('macros', 'sugar_g'),
+    'saturated_fat_g': ('fat_breakdown', 'saturated_fat_g'),
+    'monounsaturated_fat_g': ('fat_breakdown', 'monounsaturated_fat_g'),
+    'polyunsaturated_fat_g': ('fat_breakdown', 'polyunsaturated_fat_g'),
+    'trans_fat_g': ('fat_breakdown', 'trans_fat_g'),
+    'cholesterol_mg': ('cholesterol_mg',),
+    'sodium_mg': ('sodium_mg',),
+    'potassium_mg': ('potassium_mg',),
+    'calcium_mg': ('minerals_mg', 'calcium'),
+    'iron_mg': ('minerals_mg', 'iron'),
+    'magnesium_mg': ('minerals_mg', 'magnesium'),
+    'phosphorus_mg': ('minerals_mg', 'phosphorus'),
+    'zinc_mg': ('minerals_mg', 'zinc'),
+    'vitamin_a_ug_rae': ('vitamins', 'vitamin_a_ug_rae'),
+    'vitamin_c_mg': ('vitamins', 'vitamin_c_mg'),
+    'vitamin_d_ug': ('vitamins', 'vitamin_d_ug'),
+    'vitamin_e_mg': ('vitamins', 'vitamin_e_mg'),
+    'vitamin_k_ug': ('vitamins', 'vitamin_k_ug'),
+    'thiamin_b1_mg': ('vitamins', 'thiamin_b1_mg'),
+    'riboflavin_b2_mg': ('vitamins', 'riboflavin_b2_mg'),
+    'niacin_b3_mg': ('vitamins', 'niacin_b3_mg'),
+    'vitamin_b6_mg': ('vitamins', 'vitamin_b6_mg'),
+    'folate_b9_ug_dfe': ('vitamins', 'folate_b9_ug_dfe'),
+    'vitamin_b12_ug': ('vitamins', 'vitamin_b12_ug'),
+}
+
+WEIGHTINGS = ('confidence', 'portion')
+
+
+class NutritionTable:
+    """
+    Nutrient matrix aligned with the FoodSeg103 class ids.
+
+    Attributes:
+        version: Data file version (from the '# version:' header)
+        class_names: Row names, row i is class id i + 1
+        portion_g: Default portion per class in grams [num_classes]
+        matrix: Nutrients per default portion [num_classes, len(nutrients)]
+        nutrients: Column names, in NUTRIENT_FIELDS order
+    """
+
+    def __init__(self, version: str, class_names: List[str], portion_g: np.ndarray, matrix: np.ndarray):
+        self.version = version
+        self.class_names = class_names
+        self.portion_g = portion_g
+        self.matrix = matrix
+        self.nutrients = list(NUTRIENT_FIELDS)
+        self._index = {name.lower(): i for i, name in enumerate(class_names)}
+        self._atwater = np.array([4.0 if n in ('carbs_g', 'protein_g') else 9.0 if n == 'fat_g' else 0.0
+                                  for n in self.nutrients])
+
+    @classmethod
+    def from_csv(cls, path) -> 'NutritionTable':
+        version = 'unknown'
+        with open(path, newline='', encoding='utf-8') as f:
+            lines = []
+            for line in f:
+                if line.startswith('#'):
+                    key, _, value = line[1:].partition(':')
+                    if key.strip() == 'version':
+                        version = value.strip()
+                    continue
+                lines.append(line)
+            rows = list(csv.DictReader(lines))
+
+        missing = [c for c in ('class_id', 'name', 'portion_g', *NUTRIENT_FIELDS) if c not in rows[0]]
+        if missing:
+            raise ValueError(f"Nutrition table {path} is missing columns: {', '.join(missing)}")
+        rows.sort(key=lambda r: int(r['class_id']))
+        class_ids = [int(r['class_id']) for r in rows]
+        if class_ids != list(range(1, len(rows) + 1)):
+            raise ValueError(f"Nutrition table {path} must list class ids 1..N exactly once")
+
+        matrix = np.array([[float(r[c] or 0) for c in NUTRIENT_FIELDS] for r in rows], dtype=np.float64)
+        portion_g = np.array([float(r['portion_g']) for r in rows], dtype=np.float64)
+        return cls(version, [r['name'] for r in rows], portion_g, matrix)
+
+    def weights(self, predictions: List[Dict], weighting: str = 'confidence',
+                portions: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """
+        Per-class weight vector for a meal.
+
+        Args:
+            predictions: [{'name', 'confidence'}, ...] as returned by the classifier
+            weighting: 'confidence' (expected portions) or 'portion' (one portion per detected food)
+            portions: Optional {name: number of default portions}, overriding the weighting
+        """
+        if weighting not in WEIGHTINGS:
+            raise ValueError(f"Unknown weighting '{weighting}', expected one of {WEIGHTINGS}")
+        portions = {k.lower(): v for k, v in (portions or {}).items()}
+        w = np.zeros(len(self.class_names), dtype=np.float64)
+        for pred in predictions:
+            name = pred['name'].lower()
+            row = self._index.get(name)
+            if row is None:
+                continue
+            if name in portions:
+                w[row] = float(portions[name])
+            else:
+                w[row] = float(pred.get('confidence', 1.0)) if weighting == 'confidence' else 1.0
+        return w
+
+    def totals(self, weights: np.ndarray) -> np.ndarray:
+        """Meal nutrient totals: weights [num_classes] or [B, num_classes] @ matrix."""
+        return weights @ self.matrix
+
+    def to_advanced(self, totals: np.ndarray) -> Dict:
+        """Nutrient totals in the advanced_out structure, with Atwater calories."""
+        advanced = {
+            'calories_kcal': int(round(float(totals @ self._atwater))),
+            'macros': {}, 'fat_breakdown': {}, 'minerals_mg': {}, 'vitamins': {},
+        }
+        for value, name in zip(totals.tolist(), self.nutrients):
+            path = NUTRIENT_FIELDS[name]
+            target = advanced
+            for part in path[:-1]:
+                target = target[part]
+            target[path[-1]] = round(value, 2)
+        return advanced
+
+    def estimate(self, predictions: List[Dict], weighting: str = 'confidence',
+                 portions: Optional[Dict[str, float]] = None) -> Dict:
+        """
+        Local nutrition analysis, shaped like NutritionAnalyzer.analyze().
+
+        Returns:
+            {'raw': '', 'advanced': advanced_out, 'nutrition_data': {}, 'cached': False,
+             'source': 'local', 'table_version': version}
+        """
+        totals = self.totals(self.weights(predictions, weighting, portions))
+        return {
+            'raw': '',
+            'advanced': self.to_advanced(totals),
+            'nutrition_data': {},
+            'cached': False,
+            'source': 'local',
+            'table_version': self.version,
+        }
+
+
+def default_table_path() -> Path:
+    return Path(settings.BASE_DIR) / 'ml_models' / 'models' / 'foodseg103_nutrition.csv'
+
+
+_nutrition_table = None
+
+
+def get_nutrition_table() -> NutritionTable:
+    """Global nutrient table loaded from NUTRITION_TABLE_PATH (default: the bundled CSV)."""
+    global _nutrition_table
+    if _nutrition_table is None:
+        path = getattr(settings, 'NUTRITION_TABLE_PATH', '') or default_table_path()
+        _nutrition_table = NutritionTable.from_csv(path)
+    return _nutrition_table
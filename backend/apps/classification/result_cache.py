@@ -0,0 +1,281 @@
+"""
+Two-level result cache for uploaded food images.
+
+1. Exact: SHA-256 of the uploaded bytes -> cached response payload.
+2. Perceptual (opt-in, FOODSEG_PHASH_MAX_DISTANCE > 0): 64-bit difference hash
+   (dHash) of the image. A new upload whose hash is within a small Hamming
+   distance of a cached one (re-encoded, resized or re-compressed copy of the
+   same photo) reuses that entry. dHash only sees grayscale gradients, so two
+   different dishes photographed on the same plate and background can match;
+   it is off by default.
+
+Payloads live in a pluggable backend with TTL and LRU eviction: an in-process
+store ('memory') or any Django cache alias ('django', e.g. Redis shared by all
+workers). The perceptual index is always in-process and only points at
+SHA-256 keys, so a worker that has not seen a photo still gets exact hits from
+a shared backend.
+
+Keys are prefixed with the reload version of the model that produced the
+payload (ModelManager.version(), the same in every worker), so results of a
+previous checkpoint are never served after a hot reload.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+from ml_models.image_preprocessing import decode_image
+
+
+HIT_EXACT = 'exact'
+HIT_PERCEPTUAL = 'perceptual'
+MISS = 'miss'
+
+KEY_PREFIX = 'foodseg:result:'
+
+
+def content_hash(file_obj) -> str:
+    """SHA-256 of an uploaded file's bytes; the file is rewound afterwards."""
+    digest = hashlib.sha256()
+    if hasattr(file_obj, 'chunks'):
+        for chunk in file_obj.chunks():
+            digest.update(chunk)
+    else:
+        digest.update(file_obj.read())
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def perceptual_hash(file_obj) -> int:
+    """
+    64-bit difference hash: sign of horizontal gradients on a 9x8 grayscale thumbnail.
+
+    Uses the reduced-size JPEG decode, so it costs about as much as a thumbnail.
+    The file is rewound afterwards.
+    """
+    image = decode_image(file_obj, (64, 64)).convert('L').resize((9, 8), Image.BILINEAR)
+    file_obj.seek(0)
+    pixels = np.asarray(image, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+class InMemoryResultBackend:
+    """Thread-safe in-process store with per-entry TTL and LRU eviction."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DjangoCacheResultBackend:
+    """Store payloads in a Django cache alias; TTL and eviction are handled by the cache."""
+
+    def __init__(self, alias: str = 'default'):
+        from django.core.cache import caches
+        self.cache = caches[alias]
+
+    def get(self, key: str):
+        return self.cache.get(KEY_PREFIX + key)
+
+    def set(self, key: str, value, ttl: float):
+        self.cache.set(KEY_PREFIX + key, value, timeout=int(ttl))
+
+    def delete(self, key: str):
+        self.cache.delete(KEY_PREFIX + key)
+
+
+class ImageResultCache:
+    """
+    Exact + perceptual lookup in front of the image analysis pipeline.
+
+    Args:
+        backend: Payload store with get/set/delete
+        ttl_seconds: Lifetime of a cached payload
+        max_distance: Maximum Hamming distance between dHashes for a perceptual hit (0 disables)
+        max_index_entries: Size of the in-process perceptual index (LRU)
+    """
+
+    def __init__(self, backend, ttl_seconds: float = 86400, max_distance: int = 0,
+                 max_index_entries: int = 4096):
+        self.backend = backend
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_distance = max(0, int(max_distance))
+        self.max_index_entries = max(1, int(max_index_entries))
+
+        self._lock = threading.Lock()
+        # Perceptual index: parallel arrays of dHashes and the SHA-256 key they point at
+        self._phashes = np.zeros(self.max_index_entries, dtype=np.uint64)
+        self._keys = [None] * self.max_index_entries
+        self._last_used = np.zeros(self.max_index_entries, dtype=np.float64)
+        self._slots: Dict[str, int] = {}
+        self._stats = {HIT_EXACT: 0, HIT_PERCEPTUAL: 0, MISS: 0, 'stored': 0, 'invalidations': 0}
+        self._model_version: Optional[str] = None
+
+    @staticmethod
+    def _versioned(key: str, model_version: Optional[str]) -> str:
+        return f"{model_version}:{key}" if model_version else key
+
+    def _set_model_version(self, model_version: Optional[str]):
+        """Drop the perceptual index (and in-process payloads) of a previous model version."""
+        if model_version == self._model_version:
+            return
+        self._model_version = model_version
+        self._slots.clear()
+        self._keys = [None] * self.max_index_entries
+        self._last_used[:] = 0
+        self._stats['invalidations'] += 1
+        clear = getattr(self.backend, 'clear', None)
+        if clear is not None:
+            clear()
+
+    def _nearest(self, phash: int) -> Optional[str]:
+        """SHA-256 key of the closest indexed image within max_distance."""
+        if not self._slots:
+            return None
+        used = np.fromiter(self._slots.values(), dtype=np.intp)
+        xor = self._phashes[used] ^ np.uint64(phash)
+        distances = np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        best = int(np.argmin(distances))
+        if distances[best] > self.max_distance:
+            return None
+        slot = int(used[best])
+        self._last_used[slot] = time.monotonic()
+        return self._keys[slot]
+
+    def _index(self, key: str, phash: int):
+        slot = self._slots.get(key)
+        if slot is None:
+            if len(self._slots) < self.max_index_entries:
+                slot = len(self._slots)
+            else:
+                # Evict the least recently used index entry
+                slot = int(np.argmin(self._last_used))
+                del self._slots[self._keys[slot]]
+            self._slots[key] = slot
+            self._keys[slot] = key
+        self._phashes[slot] = np.uint64(phash)
+        self._last_used[slot] = time.monotonic()
+
+    def lookup(self, file_obj,
+               model_version: Optional[str] = None) -> Tuple[Optional[Any], str, str, Optional[int]]:
+        """
+        Args:
+            file_obj: Uploaded image (rewound afterwards)
+            model_version: Reload version of the model that will serve a miss
+
+        Returns:
+            (payload or None, hit type, cache key, dHash or None)
+        """
+        with self._lock:
+            self._set_model_version(model_version)
+        key = self._versioned(content_hash(file_obj), model_version)
+        payload = self.backend.get(key)
+        if payload is not None:
+            with self._lock:
+                self._stats[HIT_EXACT] += 1
+            return payload, HIT_EXACT, key, None
+
+        phash = None
+        if self.max_distance > 0:
+            try:
+                phash = perceptual_hash(file_obj)
+            except Exception:
+                # Not decodable here; let the pipeline report the error
+                file_obj.seek(0)
+            if phash is not None:
+                with self._lock:
+                    similar_key = self._nearest(phash)
+                if similar_key is not None:
+                    payload = self.backend.get(similar_key)
+                    if payload is not None:
+                        with self._lock:
+                            self._stats[HIT_PERCEPTUAL] += 1
+                        return payload, HIT_PERCEPTUAL, key, phash
+
+        with self._lock:
+            self._stats[MISS] += 1
+        return None, MISS, key, phash
+
+    def store(self, key: str, payload, phash: Optional[int] = None):
+        """Cache a payload under the key returned by lookup() and index its dHash."""
+        self.backend.set(key, payload, self.ttl_seconds)
+        with self._lock:
+            # A result computed just before a reload is stored but not indexed for the new model
+            current = key.startswith(f"{self._model_version}:") if self._model_version else ':' not in key
+            if phash is not None and current:
+                self._index(key, phash)
+            self._stats['stored'] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._stats[HIT_EXACT] + self._stats[HIT_PERCEPTUAL] + self._stats[MISS]
+            hits = self._stats[HIT_EXACT] + self._stats[HIT_PERCEPTUAL]
+            return {
+                **self._stats,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'indexed_phashes': len(self._slots),
+                'ttl_seconds': self.ttl_seconds,
+                'max_distance': self.max_distance,
+                'model_version': self._model_version,
+            }
+
+
+_result_cache = None
+
+
+def get_result_cache() -> Optional[ImageResultCache]:
+    """Global result cache configured from settings (None when disabled)."""
+    global _result_cache
+    if not getattr(settings, 'FOODSEG_RESULT_CACHE_ENABLED', True):
+        return None
+    if _result_cache is None:
+        max_entries = getattr(settings, 'FOODSEG_RESULT_CACHE_MAX_ENTRIES', 1024)
+        if getattr(settings, 'FOODSEG_RESULT_CACHE_BACKEND', 'memory') == 'django':
+            backend = DjangoCacheResultBackend(getattr(settings, 'FOODSEG_RESULT_CACHE_ALIAS', 'default'))
+        else:
+            backend = InMemoryResultBackend(max_entries)
+        _result_cache = ImageResultCache(
+            backend,
+            ttl_seconds=getattr(settings, 'FOODSEG_RESULT_CACHE_TTL', 86400),
+            max_distance=getattr(settings, 'FOODSEG_PHASH_MAX_DISTANCE', 0),
+            max_index_entries=max_entries,
+        )
+    return _result_cache
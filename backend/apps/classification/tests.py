@@ -1,3 +1,51 @@
-from django.test import TestCase
+import tempfile
+from pathlib import Path
 
-# Create your tests here.
+import torch
+from django.test import SimpleTestCase
+
+from ml_models.food_classifier import FoodSeg103Classifier
+from ml_models.foodseg103_model import create_model
+from ml_models.slim_checkpoint import save_slim_checkpoint
+
+
+class SetrServingSizeTests(SimpleTestCase):
+    """A SETR checkpoint trained at 768 px served at a smaller input size."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        torch.manual_seed(0)
+        cls.state_dict = create_model('setr_mla', num_classes=104, pretrained=False, img_size=768).state_dict()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+        super().tearDownClass()
+
+    def _assert_serves_at_384(self, model_path):
+        classifier = FoodSeg103Classifier(model_path=str(model_path), model_name='setr_mla', image_size=384)
+        self.assertEqual(classifier.model.img_size, 768)
+        self.assertEqual(tuple(classifier.model.backbone.vit.pos_embed.shape), (1, 2305, 768))
+        self.assertEqual(classifier.preprocessor.size, (384, 384))
+        probabilities = classifier.predict_probabilities(torch.rand(1, 3, 384, 384))
+        self.assertEqual(tuple(probabilities.shape), (1, 104))
+
+    def test_training_checkpoint(self):
+        # mmsegmentation key layout, as in the released SETR checkpoint
+        mmseg_state_dict = {}
+        for key, value in self.state_dict.items():
+            if key.startswith('backbone.vit.'):
+                key = 'backbone.' + key[len('backbone.vit.'):]
+            elif key.startswith('backbone.mla_p'):
+                key = 'backbone.mla.' + key[len('backbone.'):]
+            mmseg_state_dict[key] = value
+        path = Path(self.tmpdir.name) / 'setr_768.pth'
+        torch.save({'state_dict': mmseg_state_dict}, path)
+        self._assert_serves_at_384(path)
+
+    def test_slim_checkpoint(self):
+        path = Path(self.tmpdir.name) / 'setr_768.safetensors'
+        save_slim_checkpoint(self.state_dict, path, metadata={'model_name': 'setr_mla', 'image_size': 384})
+        self._assert_serves_at_384(path)
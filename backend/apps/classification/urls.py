@@ -1,6 +1,17 @@
 from django.urls import path
-from .views import UploadAndAnalyze
+from .views import (
+    UploadAndAnalyze, UploadAndAnalyzeAsync, UploadAndAnalyzeBatch, AnalysisJobResult, upload_stream,
+    ClassifierMetrics, ClassifierReadiness, ClassifierReload, RuntimeDiagnostics,
+)
 
 urlpatterns = [
     path('api/upload/', UploadAndAnalyze.as_view(), name='api_upload_analyze'),
+    path('api/upload/batch/', UploadAndAnalyzeBatch.as_view(), name='api_upload_batch'),
+    path('api/upload/stream/', upload_stream, name='api_upload_stream'),
+    path('api/upload/async/', UploadAndAnalyzeAsync.as_view(), name='api_upload_async'),
+    path('api/upload/jobs/<uuid:job_id>/', AnalysisJobResult.as_view(), name='api_upload_job'),
+    path('api/classifier/metrics/', ClassifierMetrics.as_view(), name='api_classifier_metrics'),
+    path('api/classifier/runtime/', RuntimeDiagnostics.as_view(), name='api_classifier_runtime'),
+    path('api/classifier/ready/', ClassifierReadiness.as_view(), name='api_classifier_ready'),
+    path('api/classifier/reload/', ClassifierReload.as_view(), name='api_classifier_reload'),
 ]
\ No newline at end of file
@@ -9,25 +9,161 @@ from rest_framework import status
 from django.conf import settings
 import google.generativeai as genai
 import os, json, sys
+from pathlib import Path
 from rest_framework.permissions import AllowAny 
 from rest_framework.authentication import SessionAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+import time
 
 # Add ml_models to path
 sys.path.insert(0, os.path.join(settings.BASE_DIR, 'ml_models'))
 
-from ml_models.food_classifier import get_foodseg103_classifier
+from ml_models.food_classifier import get_foodseg103_manager
+from ml_models.image_preprocessing import decode_image
+from ml_models.model_registry import get_model_registry
+from ml_models.thread_budget import thread_budget_status
+from ml_models.worker_memory import process_memory
+from .jobs import MAX_WAIT, RETRY_AFTER, get_job_runner
+from .models import AnalysisJob
+from .nutrition_analysis import NutritionAnalyzer
+from .nutrition_table import get_nutrition_table
+from .result_cache import get_result_cache
 
-# ── Load your model + pipeline once ──
+# ── Models are loaded lazily on first use (or preloaded at worker start) ──
 
 # 1) Gemini setup
-genai.configure(api_key=os.getenv("GENAI_API_KEY"))
-gmodel = genai.GenerativeModel(model_name="gemini-2.0-flash")
+_gmodel = None
+
+
+def get_gemini_model():
+    global _gmodel
+    if _gmodel is None:
+        genai.configure(api_key=os.getenv("GENAI_API_KEY"))
+        _gmodel = genai.GenerativeModel(model_name="gemini-2.0-flash")
+    return _gmodel
+
+
+# 2) Nutrition analysis (persistent cache per food set + in-flight coalescing)
+_nutrition_analyzer = None
+
+
+def get_nutrition_analyzer():
+    global _nutrition_analyzer
+    if _nutrition_analyzer is None:
+        _nutrition_analyzer = NutritionAnalyzer(lambda prompt: get_gemini_model().generate_content(prompt))
+    return _nutrition_analyzer
+
+
+def analyze_nutrition(predictions, background=False):
+    """
+    Nutrition for the detected foods according to NUTRITION_MODE.
+
+    'gemini' (default) waits for Gemini (or its cache); the opt-in 'local' only uses
+    the per-class nutrient table; the opt-in 'hybrid' waits up to NUTRITION_GEMINI_TIMEOUT
+    (100 ms by default) for Gemini and otherwise answers from the table while Gemini
+    refines the cache in the background.
+    Background jobs (background=True) have no client waiting, so hybrid waits for
+    Gemini there and only falls back to the table when it fails.
+    """
+    mode = getattr(settings, 'NUTRITION_MODE', 'gemini')
+    analysis = None
+    if mode != 'local':
+        timeout = None if mode == 'gemini' or background else getattr(settings, 'NUTRITION_GEMINI_TIMEOUT', 0.1)
+        analysis = get_nutrition_analyzer().analyze([p['name'] for p in predictions], timeout=timeout)
+        if analysis is not None:
+            analysis['source'] = 'cache' if analysis['cached'] else 'gemini'
+    if mode != 'gemini' and (analysis is None or analysis['advanced'] is None):
+        analysis = get_nutrition_table().estimate(
+            predictions, weighting=getattr(settings, 'NUTRITION_LOCAL_WEIGHTING', 'confidence')
+        )
+    return analysis
+
+
+def build_analysis_result(predictions, analysis):
+    """Response payload for confident predictions and their nutrition analysis."""
+    gemini_resp = analysis['raw']
+    advanced_out = analysis['advanced']
+    nutrition_data = analysis['nutrition_data']
+
+    # Extract calories
+    calories_str = nutrition_data.get('熱量', '0 大卡')
+    calories_match = re.search(r'(\d+)', calories_str)
+    est_cal = int(calories_match.group(1)) if calories_match else 0
+
+    # Extract other nutrition values with safe regex
+    def safe_extract_float(key, default='0'):
+        value_str = nutrition_data.get(key, default)
+        match = re.search(r'(\d+\.?\d*)', value_str)
+        return float(match.group(1)) if match else 0.0
+
+    # Build JSON response (preserve backward-compatible fields)
+    basic_carbs = safe_extract_float('碳水化合物') if advanced_out is None else advanced_out['macros']['carbs_g']
+    basic_protein = safe_extract_float('蛋白質') if advanced_out is None else advanced_out['macros']['protein_g']
+    basic_fat = safe_extract_float('脂肪') if advanced_out is None else advanced_out['macros']['fat_g']
+    vitamins_text = nutrition_data.get('維生素', '')
+    minerals_text = nutrition_data.get('礦物質', '')
+
+    # Fallback Atwater calories if only basic fields are available
+    basic_atwater = 0
+    try:
+        if (basic_carbs or basic_protein or basic_fat):
+            basic_atwater = int(round(4 * float(basic_carbs) + 4 * float(basic_protein) + 9 * float(basic_fat)))
+    except Exception:
+        basic_atwater = 0
+
+    # Choose final calories with sanity cap
+    if advanced_out is not None:
+        calories_candidate = int(round(advanced_out.get('calories_kcal') or 0))
+    else:
+        calories_candidate = basic_atwater if basic_atwater > 0 else est_cal
+
+    MAX_CALORIES_PER_MEAL = 1200
+    calories_final = max(0, min(calories_candidate, MAX_CALORIES_PER_MEAL))
+
+    result_data = {
+        'predictions': predictions,
+        'gemini': gemini_resp or '營養模型暫無回覆，已提供基本預測結果',
+        'nutrition': {
+            'calories': calories_final,
+            'carbs': basic_carbs,
+            'protein': basic_protein,
+            'fat': basic_fat,
+            'fiber': 0.0 if advanced_out is None else advanced_out['macros']['fiber_g'],
+            'sugar': 0.0 if advanced_out is None else advanced_out['macros']['sugar_g'],
+            'sodium_mg': 0.0 if advanced_out is None else advanced_out['sodium_mg'],
+            'cholesterol_mg': 0.0 if advanced_out is None else advanced_out['cholesterol_mg'],
+            'potassium_mg': 0.0 if advanced_out is None else advanced_out['potassium_mg'],
+            'fat_breakdown': None if advanced_out is None else advanced_out['fat_breakdown'],
+            'minerals_mg': None if advanced_out is None else advanced_out['minerals_mg'],
+            'vitamins_detail': None if advanced_out is None else advanced_out['vitamins'],
+            'vitamins': vitamins_text,
+            'minerals': minerals_text
+        },
+        'total_calories': calories_final,
+        'nutrition_source': analysis['source'],
+    }
+    return result_data
+
+
+def select_model(name):
+    """
+    Registry name of the classifier a request asked for (`model` field).
+
+    Returns:
+        (name, None), or (None, 400 Response) for an unknown model
+    """
+    registry = get_model_registry()
+    name = name or registry.default
+    if name not in registry.names():
+        return None, Response({'error': f'Unknown model: {name}', 'models': registry.names()},
+                              status=status.HTTP_400_BAD_REQUEST)
+    return name, None
 
-# 2) Load FoodSeg103 classifier
-classifier = get_foodseg103_classifier()
 
 # ── The single combined endpoint ──
 
@@ -35,18 +171,70 @@ class UploadAndAnalyze(APIView):
     parser_classes = [MultiPartParser]
     permission_classes = [AllowAny]
     authentication_classes = []  # 不做任何認證
+    asynchronous = False  # True: return predictions + job ID, nutrition runs in the background
+
+    def _respond(self, payload, cache_entry=None, response_class=Response):
+        """Return the analysis payload, caching it when a cache entry (cache, key, phash) is given."""
+        if cache_entry is not None:
+            cache, key, phash = cache_entry
+            cache.store(key, payload, phash)
+        response = response_class(payload)
+        response['X-Result-Cache'] = 'miss'
+        return response
+
+    def _finish_job(self, predictions, cache_entry=None):
+        """Background part of a two-phase upload: nutrition analysis and the final payload."""
+        analysis = analyze_nutrition(predictions, background=True)
+        result_data = build_analysis_result(predictions, analysis)
+        if cache_entry is not None and analysis['raw']:
+            cache, key, phash = cache_entry
+            cache.store(key, result_data, phash)
+        return result_data
+
+    def _accepted(self, job, model):
+        """202 response of a two-phase upload pointing at its job."""
+        response = Response({
+            'job_id': str(job.id),
+            'status': job.status,
+            'model': model,
+            'predictions': job.predictions,
+            'result_url': reverse('api_upload_job', args=[job.id]),
+        }, status=status.HTTP_202_ACCEPTED)
+        if job.status == AnalysisJob.PENDING:
+            response['Retry-After'] = str(RETRY_AFTER)
+        return response
 
     def post(self, request, format=None):
         file_obj = request.data.get('image')
         if not file_obj:
             return Response({'error': 'No image provided'}, status=status.HTTP_400_BAD_REQUEST)
+        model, error = select_model(request.data.get('model'))
+        if error is not None:
+            return error
+
+        # 0) Repeat uploads (exact bytes or a re-encoded/resized copy) reuse the cached result
+        # (cached payloads come from the default model, so other models skip the cache)
+        cache = get_result_cache() if model == get_model_registry().default else None
+        cache_entry = None
+        if cache is not None:
+            cached, hit, key, phash = cache.lookup(file_obj, get_model_registry().manager(model).version())
+            if cached is not None:
+                if self.asynchronous and not cached.get('error'):
+                    # Same 202 + job shape as a miss; the job is already done
+                    job = get_job_runner().complete(cached.get('predictions', []), cached)
+                    response = self._accepted(job, model)
+                else:
+                    response = Response(cached, status=status.HTTP_200_OK)
+                response['X-Result-Cache'] = hit
+                return response
+            cache_entry = (cache, key, phash)
 
-        # 1) Load image
-        img = Image.open(file_obj).convert("RGB")
+        # 1) Image is decoded by the classifier (reduced-size JPEG decode + EXIF orientation)
 
-        # 2) Multi-label Classification with FoodSeg103 ResNet50+CBAM Attention
+        # 2) Multi-label Classification (FoodSeg103 ResNet50+CBAM Attention unless `model` picks another)
         # Using threshold 0.5 for good balance between precision and recall
-        predictions = classifier.predict(img, threshold=0.5)
+        with get_model_registry().use(model) as classifier:
+            predictions = classifier.predict(file_obj, threshold=0.5)
         
         # Debug logging
         print(f"[DEBUG] Predictions count: {len(predictions)}")
@@ -58,7 +246,8 @@ class UploadAndAnalyze(APIView):
             print("[DEBUG] No predictions returned from model")
         
         if not predictions:
-            return JsonResponse({'error': True, 'message': 'No food items detected'})
+            return self._respond({'error': True, 'message': 'No food items detected'},
+                                 cache_entry, JsonResponse)
         
         # Get top prediction confidence
         top_confidence = predictions[0]['confidence']
@@ -66,222 +255,298 @@ class UploadAndAnalyze(APIView):
         
         # Only proceed if we have reasonable confidence (0 for testing)
         if top_confidence > 0.70:
-            # 4) Format food names for Gemini
-            food_names = [p['name'] for p in predictions]
-            food_list_str = "、".join(food_names)
-            
-            # Gemini nutrition analysis for combined foods (request STRICT JSON)
-            desc = (
-                f"這張圖片中檢測到以下食物：「{food_list_str}」，"
-                "請根據這些食物提供『合計』的營養素，並且只回覆一段有效的 JSON（不要加入任何解說或前後文，也不要使用 Markdown 區塊）。\n"
-                "請以單人份計算；若份量不明，假設整體重約 300 克。\n"
-                "務必使 calories_kcal = 4×macros.carbs_g + 4×macros.protein_g + 9×macros.fat_g，且所有數值皆針對同一份量（不是每100克）。\n"
-                "欄位與單位請完全依下列結構輸出（數值請為數字型態，沒有資料請填 0）：\n"
-                "{\n"
-                "  \"calories_kcal\": 0,\n"
-                "  \"macros\": {\n"
-                "    \"carbs_g\": 0,\n"
-                "    \"protein_g\": 0,\n"
-                "    \"fat_g\": 0,\n"
-                "    \"fiber_g\": 0,\n"
-                "    \"sugar_g\": 0\n"
-                "  },\n"
-                "  \"fat_breakdown\": {\n"
-                "    \"saturated_fat_g\": 0,\n"
-                "    \"monounsaturated_fat_g\": 0,\n"
-                "    \"polyunsaturated_fat_g\": 0,\n"
-                "    \"trans_fat_g\": 0\n"
-                "  },\n"
-                "  \"cholesterol_mg\": 0,\n"
-                "  \"sodium_mg\": 0,\n"
-                "  \"potassium_mg\": 0,\n"
-                "  \"minerals_mg\": {\n"
-                "    \"calcium\": 0,\n"
-                "    \"iron\": 0,\n"
-                "    \"magnesium\": 0,\n"
-                "    \"phosphorus\": 0,\n"
-                "    \"zinc\": 0\n"
-                "  },\n"
-                "  \"vitamins\": {\n"
-                "    \"vitamin_a_ug_rae\": 0,\n"
-                "    \"vitamin_c_mg\": 0,\n"
-                "    \"vitamin_d_ug\": 0,\n"
-                "    \"vitamin_e_mg\": 0,\n"
-                "    \"vitamin_k_ug\": 0,\n"
-                "    \"thiamin_b1_mg\": 0,\n"
-                "    \"riboflavin_b2_mg\": 0,\n"
-                "    \"niacin_b3_mg\": 0,\n"
-                "    \"vitamin_b6_mg\": 0,\n"
-                "    \"folate_b9_ug_dfe\": 0,\n"
-                "    \"vitamin_b12_ug\": 0\n"
-                "  }\n"
-                "}"
-            )
-            # Gemini request with safe fallback
-            try:
-                gemini_raw = gmodel.generate_content(desc)
-                gemini_resp = getattr(gemini_raw, 'text', '') or ''
-            except Exception as e:
-                print(f"[WARN] Gemini analysis failed: {e}")
-                gemini_resp = ''
-            
-            # Parse the structured response (prefer JSON, fallback to simple key:value lines)
-            nutrition_data = {}
-            advanced = None
-            if gemini_resp:
-                # Try JSON parse directly
-                try:
-                    advanced = json.loads(gemini_resp)
-                except Exception:
-                    # Try to extract JSON block within text if any
-                    try:
-                        start = gemini_resp.find('{')
-                        end = gemini_resp.rfind('}')
-                        if start != -1 and end != -1 and end > start:
-                            advanced = json.loads(gemini_resp[start:end+1])
-                    except Exception:
-                        advanced = None
-
-                if advanced is None:
-                    # Fallback: parse simple key: value lines (old format)
-                    for line in gemini_resp.split('\n'):
-                        if ':' in line:
-                            key, value = line.split(':', 1)
-                            nutrition_data[key.strip()] = value.strip()
-
-            # Extract calories
-            calories_str = nutrition_data.get('熱量', '0 大卡')
-            calories_match = re.search(r'(\d+)', calories_str)
-            est_cal = int(calories_match.group(1)) if calories_match else 0
-
-            # Extract other nutrition values with safe regex
-            def safe_extract_float(key, default='0'):
-                value_str = nutrition_data.get(key, default)
-                match = re.search(r'(\d+\.?\d*)', value_str)
-                return float(match.group(1)) if match else 0.0
-
-            # Helpers to safely read from advanced JSON
-            def get_num(obj, key, default=0.0):
-                try:
-                    val = obj.get(key, default)
-                    return float(val) if isinstance(val, (int, float, str)) and str(val).strip() != '' else default
-                except Exception:
-                    return default
-
-            def get_nested(obj, path, default=0.0):
-                try:
-                    cur = obj
-                    for p in path:
-                        cur = cur.get(p, {}) if isinstance(cur, dict) else {}
-                    if isinstance(cur, (int, float)):
-                        return float(cur)
-                    if isinstance(cur, str):
-                        m = re.search(r'(\d+\.?\d*)', cur)
-                        return float(m.group(1)) if m else default
-                    return default
-                except Exception:
-                    return default
-
-            # Derive advanced fields if available
-            advanced_out = None
-            if isinstance(advanced, dict):
-                advanced_out = {
-                    'calories_kcal': get_num(advanced, 'calories_kcal', 0.0),
-                    'macros': {
-                        'carbs_g': get_nested(advanced, ['macros', 'carbs_g'], 0.0),
-                        'protein_g': get_nested(advanced, ['macros', 'protein_g'], 0.0),
-                        'fat_g': get_nested(advanced, ['macros', 'fat_g'], 0.0),
-                        'fiber_g': get_nested(advanced, ['macros', 'fiber_g'], 0.0),
-                        'sugar_g': get_nested(advanced, ['macros', 'sugar_g'], 0.0),
-                    },
-                    'fat_breakdown': {
-                        'saturated_fat_g': get_nested(advanced, ['fat_breakdown', 'saturated_fat_g'], 0.0),
-                        'monounsaturated_fat_g': get_nested(advanced, ['fat_breakdown', 'monounsaturated_fat_g'], 0.0),
-                        'polyunsaturated_fat_g': get_nested(advanced, ['fat_breakdown', 'polyunsaturated_fat_g'], 0.0),
-                        'trans_fat_g': get_nested(advanced, ['fat_breakdown', 'trans_fat_g'], 0.0),
-                    },
-                    'cholesterol_mg': get_num(advanced, 'cholesterol_mg', 0.0),
-                    'sodium_mg': get_num(advanced, 'sodium_mg', 0.0),
-                    'potassium_mg': get_num(advanced, 'potassium_mg', 0.0),
-                    'minerals_mg': {
-                        'calcium': get_nested(advanced, ['minerals_mg', 'calcium'], 0.0),
-                        'iron': get_nested(advanced, ['minerals_mg', 'iron'], 0.0),
-                        'magnesium': get_nested(advanced, ['minerals_mg', 'magnesium'], 0.0),
-                        'phosphorus': get_nested(advanced, ['minerals_mg', 'phosphorus'], 0.0),
-                        'zinc': get_nested(advanced, ['minerals_mg', 'zinc'], 0.0),
-                    },
-                    'vitamins': {
-                        'vitamin_a_ug_rae': get_nested(advanced, ['vitamins', 'vitamin_a_ug_rae'], 0.0),
-                        'vitamin_c_mg': get_nested(advanced, ['vitamins', 'vitamin_c_mg'], 0.0),
-                        'vitamin_d_ug': get_nested(advanced, ['vitamins', 'vitamin_d_ug'], 0.0),
-                        'vitamin_e_mg': get_nested(advanced, ['vitamins', 'vitamin_e_mg'], 0.0),
-                        'vitamin_k_ug': get_nested(advanced, ['vitamins', 'vitamin_k_ug'], 0.0),
-                        'thiamin_b1_mg': get_nested(advanced, ['vitamins', 'thiamin_b1_mg'], 0.0),
-                        'riboflavin_b2_mg': get_nested(advanced, ['vitamins', 'riboflavin_b2_mg'], 0.0),
-                        'niacin_b3_mg': get_nested(advanced, ['vitamins', 'niacin_b3_mg'], 0.0),
-                        'vitamin_b6_mg': get_nested(advanced, ['vitamins', 'vitamin_b6_mg'], 0.0),
-                        'folate_b9_ug_dfe': get_nested(advanced, ['vitamins', 'folate_b9_ug_dfe'], 0.0),
-                        'vitamin_b12_ug': get_nested(advanced, ['vitamins', 'vitamin_b12_ug'], 0.0),
-                    }
-                }
-
-            # Recalculate calories with Atwater formula when advanced JSON is available
-            if isinstance(advanced_out, dict):
-                carbs = advanced_out['macros'].get('carbs_g', 0.0) if isinstance(advanced_out.get('macros'), dict) else 0.0
-                protein = advanced_out['macros'].get('protein_g', 0.0) if isinstance(advanced_out.get('macros'), dict) else 0.0
-                fat = advanced_out['macros'].get('fat_g', 0.0) if isinstance(advanced_out.get('macros'), dict) else 0.0
-                try:
-                    atwater_cal = int(round(4 * float(carbs) + 4 * float(protein) + 9 * float(fat)))
-                except Exception:
-                    atwater_cal = 0
-                advanced_out['calories_kcal'] = atwater_cal
-
-            # Build JSON response (preserve backward-compatible fields)
-            basic_carbs = safe_extract_float('碳水化合物') if advanced_out is None else advanced_out['macros']['carbs_g']
-            basic_protein = safe_extract_float('蛋白質') if advanced_out is None else advanced_out['macros']['protein_g']
-            basic_fat = safe_extract_float('脂肪') if advanced_out is None else advanced_out['macros']['fat_g']
-            vitamins_text = nutrition_data.get('維生素', '')
-            minerals_text = nutrition_data.get('礦物質', '')
-
-            # Fallback Atwater calories if only basic fields are available
-            basic_atwater = 0
-            try:
-                if (basic_carbs or basic_protein or basic_fat):
-                    basic_atwater = int(round(4 * float(basic_carbs) + 4 * float(basic_protein) + 9 * float(basic_fat)))
-            except Exception:
-                basic_atwater = 0
-
-            # Choose final calories with sanity cap
-            if advanced_out is not None:
-                calories_candidate = int(round(advanced_out.get('calories_kcal') or 0))
-            else:
-                calories_candidate = basic_atwater if basic_atwater > 0 else est_cal
-
-            MAX_CALORIES_PER_MEAL = 1200
-            calories_final = max(0, min(calories_candidate, MAX_CALORIES_PER_MEAL))
-
-            result_data = {
-                'predictions': predictions,
-                'gemini': gemini_resp or '營養模型暫無回覆，已提供基本預測結果',
-                'nutrition': {
-                    'calories': calories_final,
-                    'carbs': basic_carbs,
-                    'protein': basic_protein,
-                    'fat': basic_fat,
-                    'fiber': 0.0 if advanced_out is None else advanced_out['macros']['fiber_g'],
-                    'sugar': 0.0 if advanced_out is None else advanced_out['macros']['sugar_g'],
-                    'sodium_mg': 0.0 if advanced_out is None else advanced_out['sodium_mg'],
-                    'cholesterol_mg': 0.0 if advanced_out is None else advanced_out['cholesterol_mg'],
-                    'potassium_mg': 0.0 if advanced_out is None else advanced_out['potassium_mg'],
-                    'fat_breakdown': None if advanced_out is None else advanced_out['fat_breakdown'],
-                    'minerals_mg': None if advanced_out is None else advanced_out['minerals_mg'],
-                    'vitamins_detail': None if advanced_out is None else advanced_out['vitamins'],
-                    'vitamins': vitamins_text,
-                    'minerals': minerals_text
-                },
-                'total_calories': calories_final,
-            }
-            return Response(result_data, status=status.HTTP_200_OK)
+            if self.asynchronous:
+                # Two-phase: answer with the predictions now, nutrition runs in the background
+                job = get_job_runner().submit(predictions, lambda: self._finish_job(predictions, cache_entry))
+                return self._accepted(job, model)
+
+            # 4) Nutrition analysis for the detected foods (Gemini / local nutrient table, see NUTRITION_MODE)
+            analysis = analyze_nutrition(predictions)
+            result_data = build_analysis_result(predictions, analysis)
+            # Gemini failures are transient, so only complete results are cached
+            return self._respond(result_data, cache_entry if analysis['raw'] else None)
         
-        return JsonResponse({'error': True, 'message': 'Low confidence detection'})
+        return self._respond({'error': True, 'message': 'Low confidence detection'},
+                             cache_entry, JsonResponse)
+
+
+class UploadAndAnalyzeAsync(UploadAndAnalyze):
+    """
+    Two-phase upload: responds 202 with the predictions and a job ID as soon as
+    inference is done; the full result is fetched from api/upload/jobs/<id>/.
+    A result cache hit answers the same way, with a job that is already done.
+    """
+    asynchronous = True
+
+
+class UploadAndAnalyzeBatch(APIView):
+    """
+    Classify several images (multipart field `images`, repeated) in one forward pass.
+
+    Images are decoded in parallel; undecodable files get a per-image error.
+    With `nutrition=true` the confident predictions of all images are merged into
+    one meal and analysed together (same payload as api/upload/, under 'combined').
+    Like the other upload endpoints, an optional `model` field picks a registered model.
+    """
+    parser_classes = [MultiPartParser]
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def post(self, request, format=None):
+        files = request.FILES.getlist('images')
+        if not files:
+            return Response({'error': 'No images provided'}, status=status.HTTP_400_BAD_REQUEST)
+        max_images = getattr(settings, 'FOODSEG_BATCH_UPLOAD_MAX_IMAGES', 16)
+        if len(files) > max_images:
+            return Response({'error': f'At most {max_images} images per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        with_nutrition = str(request.data.get('nutrition', '')).lower() in ('1', 'true', 'yes')
+        model, error = select_model(request.data.get('model'))
+        if error is not None:
+            return error
+
+        started = time.perf_counter()
+        with get_model_registry().use(model) as classifier:
+            decoded = classifier.preprocessor.decode(files)
+            valid = [i for i, image in enumerate(decoded) if not isinstance(image, Exception)]
+            batch_predictions = classifier.predict_batch([decoded[i] for i in valid], threshold=0.5)
+        predictions_by_index = dict(zip(valid, batch_predictions))
+
+        results = []
+        for i, f in enumerate(files):
+            entry = {'index': i, 'filename': f.name}
+            if i in predictions_by_index:
+                entry['predictions'] = predictions_by_index[i]
+            else:
+                entry['error'] = f'Invalid image: {decoded[i]}'
+            results.append(entry)
+
+        combined = None
+        if with_nutrition:
+            # One meal: every food confidently seen in any photo, at its highest confidence
+            meal = {}
+            for predictions in batch_predictions:
+                if predictions and predictions[0]['confidence'] > 0.70:
+                    for p in predictions:
+                        if p['confidence'] > meal.get(p['name'], 0.0):
+                            meal[p['name']] = p['confidence']
+            if meal:
+                merged = [{'name': name, 'confidence': conf}
+                          for name, conf in sorted(meal.items(), key=lambda item: -item[1])]
+                combined = build_analysis_result(merged, analyze_nutrition(merged))
+
+        return Response({
+            'count': len(files),
+            'model': model,
+            'results': results,
+            'combined': combined,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        }, status=status.HTTP_200_OK)
+
+
+class AnalysisJobResult(APIView):
+    """
+    Poll a two-phase upload job; ?wait=<seconds> long-polls until it finishes.
+
+    The wait is capped at ANALYSIS_JOB_MAX_WAIT (2 s by default) because it
+    holds a sync worker; a still-pending job answers 202 with Retry-After.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request, job_id, format=None):
+        try:
+            wait = float(request.query_params.get('wait', 0))
+        except ValueError:
+            return Response({'error': 'wait must be a number of seconds'}, status=status.HTTP_400_BAD_REQUEST)
+        wait = max(0.0, min(wait, getattr(settings, 'ANALYSIS_JOB_MAX_WAIT', MAX_WAIT)))
+
+        job = get_job_runner().wait(str(job_id), wait)
+        if job is None:
+            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+        payload = {
+            'job_id': str(job.id),
+            'status': job.status,
+            'predictions': job.predictions,
+            'result': job.result,
+        }
+        if job.status == AnalysisJob.FAILED:
+            payload['error'] = job.error
+        if job.status != AnalysisJob.PENDING:
+            return Response(payload, status=status.HTTP_200_OK)
+        response = Response(payload, status=status.HTTP_202_ACCEPTED)
+        response['Retry-After'] = str(RETRY_AFTER)
+        return response
+
+
+def _sse(event, data):
+    """One Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _store_result(cache_entry, payload):
+    if cache_entry is not None:
+        cache, key, phash = cache_entry
+        cache.store(key, payload, phash)
+
+
+def _upload_events(file_obj, model):
+    registry = get_model_registry()
+    cache = get_result_cache() if model == registry.default else None
+    cache_entry = None
+    if cache is not None:
+        cached, hit, key, phash = cache.lookup(file_obj, registry.manager(model).version())
+        if cached is not None:
+            yield _sse('result', {**cached, 'result_cache': hit})
+            return
+        cache_entry = (cache, key, phash)
+
+    # 1) Decode once at the classifier's input size
+    started = time.perf_counter()
+    classifier = registry.acquire(model)
+    try:
+        height, width = classifier.preprocessor.size
+        try:
+            image = decode_image(file_obj, (width, height))
+        except Exception as e:
+            yield _sse('error', {'error': True, 'message': f'Invalid image: {e}'})
+            return
+        yield _sse('decoded', {'width': image.width, 'height': image.height,
+                               'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)})
+
+        # 2) Predictions
+        predictions = classifier.predict(image, threshold=0.5)
+    finally:
+        registry.release(model, time.perf_counter() - started)
+    yield _sse('predictions', {'model': model, 'predictions': predictions,
+                               'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)})
+    if not predictions:
+        payload = {'error': True, 'message': 'No food items detected'}
+        _store_result(cache_entry, payload)
+        yield _sse('error', payload)
+        return
+    if predictions[0]['confidence'] <= 0.70:
+        payload = {'error': True, 'message': 'Low confidence detection'}
+        _store_result(cache_entry, payload)
+        yield _sse('error', payload)
+        return
+
+    # 3) Nutrition: in hybrid mode the local table goes out first, Gemini refines it
+    if getattr(settings, 'NUTRITION_MODE', 'gemini') == 'hybrid':
+        local = get_nutrition_table().estimate(
+            predictions, weighting=getattr(settings, 'NUTRITION_LOCAL_WEIGHTING', 'confidence')
+        )
+        yield _sse('nutrition', {'source': 'local', 'provisional': True, 'nutrition': local['advanced']})
+    analysis = analyze_nutrition(predictions, background=True)
+    yield _sse('nutrition', {'source': analysis['source'], 'provisional': False,
+                             'nutrition': analysis['advanced'], 'gemini': analysis['raw'],
+                             'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)})
+
+    # 4) Final totals, same payload as api/upload/
+    result_data = build_analysis_result(predictions, analysis)
+    if analysis['raw']:
+        _store_result(cache_entry, result_data)
+    yield _sse('result', result_data)
+
+
+@csrf_exempt
+@require_POST
+def upload_stream(request):
+    """
+    Streaming variant of api/upload/ (text/event-stream).
+
+    Events: 'decoded', 'predictions', 'nutrition' (a provisional local estimate
+    first in hybrid mode, then the final analysis), 'result' (the api/upload/
+    payload) or 'error'.
+
+    The events come from a plain (sync) generator, which the sync gunicorn
+    workers flush as each event is yielded. The worker is held until the
+    stream ends, Gemini included, just like api/upload/.
+    """
+    file_obj = request.FILES.get('image')
+    if not file_obj:
+        return JsonResponse({'error': 'No image provided'}, status=status.HTTP_400_BAD_REQUEST)
+    registry = get_model_registry()
+    model = request.POST.get('model') or registry.default
+    if model not in registry.names():
+        return JsonResponse({'error': f'Unknown model: {model}', 'models': registry.names()},
+                            status=status.HTTP_400_BAD_REQUEST)
+    response = StreamingHttpResponse(_upload_events(file_obj, model), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # let nginx pass events through unbuffered
+    return response
+
+
+class ClassifierMetrics(APIView):
+    """Expose classifier micro-batching, per-model and result cache metrics for throughput/latency tuning."""
+    permission_classes = [IsAdminUser]
+    authentication_classes = [JWTAuthentication]
+
+    def get(self, request, format=None):
+        classifier = get_foodseg103_manager().current()
+        stats = classifier.batching_stats() if classifier is not None else None
+        cache = get_result_cache()
+        return Response({
+            'batching': stats,
+            'models': get_model_registry().status(),
+            'worker': process_memory(),
+            'result_cache': cache.stats() if cache is not None else None,
+        }, status=status.HTTP_200_OK)
+
+
+class RuntimeDiagnostics(APIView):
+    """Thread budget and memory of the worker process serving this request."""
+    permission_classes = [IsAdminUser]
+    authentication_classes = [JWTAuthentication]
+
+    def get(self, request, format=None):
+        return Response({
+            'thread_budget': thread_budget_status(),
+            'memory': process_memory(),
+        }, status=status.HTTP_200_OK)
+
+
+class ClassifierReadiness(APIView):
+    """Readiness probe: 200 once the classifier is loaded and warmed up, 503 before."""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request, format=None):
+        manager = get_foodseg103_manager()
+        code = status.HTTP_200_OK if manager.is_ready() else status.HTTP_503_SERVICE_UNAVAILABLE
+        return Response(manager.status(), status=code)
+
+
+class ClassifierReload(APIView):
+    """
+    Load (or hot-swap) the classifier checkpoint without restarting workers.
+
+    The worker handling this request reloads first; the other workers pick
+    the reload up from the shared marker file (FOODSEG_RELOAD_MARKER_DIR)
+    within FOODSEG_RELOAD_CHECK_INTERVAL and swap in the background.
+
+    Optional body field `checkpoint` names a file inside ml_models/models/;
+    `model` picks a registered model other than the default one.
+    """
+    permission_classes = [IsAdminUser]
+    authentication_classes = [JWTAuthentication]
+
+    def post(self, request, format=None):
+        model_path = None
+        checkpoint = request.data.get('checkpoint')
+        if checkpoint:
+            models_dir = (Path(settings.BASE_DIR) / 'ml_models' / 'models').resolve()
+            model_path = (models_dir / Path(checkpoint).name).resolve()
+            if not model_path.is_file():
+                return Response({'error': f'Checkpoint not found: {checkpoint}'}, status=status.HTTP_400_BAD_REQUEST)
 
+        model, error = select_model(request.data.get('model'))
+        if error is not None:
+            return error
+        manager = get_model_registry().manager(model)
+        try:
+            manager.reload(model_path)
+        except Exception as e:
+            return Response({'error': f'Reload failed: {e}', **manager.status()},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(manager.status(), status=status.HTTP_200_OK)
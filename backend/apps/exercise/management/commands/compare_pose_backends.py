@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_models.pose_angles import JOINT_NAMES
+from ml_models.pose_detector import OpenPoseDetector
+
+
+class Command(BaseCommand):
+    help = 'Benchmark pose detector backends on a video and check landmark/rep parity against the first backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('video', help='Path to a video file')
+        parser.add_argument(
+            '--backends', nargs='+', default=list(OpenPoseDetector.BACKENDS),
+            choices=list(OpenPoseDetector.BACKENDS),
+            help='Backends to compare; the first one is the parity reference'
+        )
+        parser.add_argument('--model-path', default=None, help='PoseLandmarker .task model path')
+        parser.add_argument('--max-frames', type=int, default=0, help='Stop after N frames (0 = whole video)')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def _read_frames(self, path, max_frames):
+        capture = cv2.VideoCapture(path)
+        if not capture.isOpened():
+            raise CommandError(f"Cannot open video: {path}")
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        index = 0
+        try:
+            while True:
+                ok, frame = capture.read()
+                if not ok or (max_frames and index >= max_frames):
+                    break
+                yield index, int(index * 1000 / fps), frame
+                index += 1
+        finally:
+            capture.release()
+
+    def _run_sync(self, detector, path, max_frames):
+        results, latencies = [], []
+        for _, timestamp_ms, frame in self._read_frames(path, max_frames):
+            start = time.perf_counter()
+            results.append((timestamp_ms, detector.detect_pose(frame, timestamp_ms=timestamp_ms)))
+            latencies.append(time.perf_counter() - start)
+        return results, latencies
+
+    def _run_pipelined(self, detector, path, max_frames):
+        """live_stream：提交後立即解碼下一幀，推論與解碼重疊"""
+        results = {}
+        submitted = {}
+        latencies = []
+        lock = threading.Lock()
+        done = threading.Condition(lock)
+
+        def _on_result(result, timestamp_ms):
+            with lock:
+                results[timestamp_ms] = result
+                latencies.append(time.perf_counter() - submitted[timestamp_ms])
+                done.notify_all()
+
+        for _, timestamp_ms, frame in self._read_frames(path, max_frames):
+            with lock:
+                submitted[timestamp_ms] = time.perf_counter()
+            detector.detect_pose_async(frame, _on_result, timestamp_ms=timestamp_ms)
+
+        with lock:
+            done.wait_for(lambda: len(results) >= len(submitted), timeout=10.0)
+        ordered = [(ts, results[ts]) for ts in sorted(results)]
+        return ordered, latencies
+
+    def _summarise(self, name, detector, results, latencies, wall_seconds):
+        timestamps = np.array([ts for ts, _ in results], dtype=np.float64) / 1000.0
+        # HOG 備用結果的關鍵點是由人體框估計的，與被丟棄的幀一樣不計入偵測率、角度比較與次數
+        detected = [r.get('detector') == 'mediapipe' for _, r in results]
+        angles = np.array(
+            [[r['joint_angles'].get(j) if ok and r.get('joint_angles') else None for j in JOINT_NAMES]
+             for ok, (_, r) in zip(detected, results)],
+            dtype=np.float64
+        ).reshape(len(results), len(JOINT_NAMES))
+        # 以影片時間戳記離線分段，兩個後端的次數不受執行速度與冷卻計時影響
+        sides = tuple(detector.ARM_KEYPOINT_NAMES.keys())
+        arm_angles = np.array(
+            [[(r.get('angles') or {}).get(side) if ok else None for side in sides]
+             for ok, (_, r) in zip(detected, results)],
+            dtype=np.float64
+        ).reshape(len(results), len(sides))
+        latencies_ms = np.array(latencies) * 1000.0 if latencies else np.zeros(1)
+        return {
+            'backend': name,
+            'frames': len(results),
+            'wall_seconds': round(wall_seconds, 3),
+            'throughput_fps': round(len(results) / wall_seconds, 2) if wall_seconds else None,
+            'latency_ms': {
+                'mean': round(float(latencies_ms.mean()), 2),
+                'p50': round(float(np.percentile(latencies_ms, 50)), 2),
+                'p95': round(float(np.percentile(latencies_ms, 95)), 2),
+            },
+            'detection_rate': round(float(np.mean(detected)), 3) if results else 0.0,
+            'fallback_frames': sum(r.get('detector') == 'fallback' for _, r in results),
+            # live_stream 被 MediaPipe 丟棄的幀（計為未偵測）
+            'dropped_frames': sum(r.get('detector') == 'dropped' for _, r in results),
+            'rep_count': detector.segment_reps_offline(arm_angles, timestamps)['rep_count'] if results else 0,
+            '_timestamps': timestamps,
+            '_angles': angles,
+        }
+
+    def handle(self, *args, **options):
+        reports = []
+        for backend in options['backends']:
+            detector = OpenPoseDetector(model_path=options['model_path'], backend=backend)
+            if detector.backend != backend:
+                self.stderr.write(f"Backend '{backend}' unavailable, skipped")
+                continue
+            detector.reset_action_state()
+            start = time.perf_counter()
+            if backend == 'live_stream':
+                results, latencies = self._run_pipelined(detector, options['video'], options['max_frames'])
+            else:
+                results, latencies = self._run_sync(detector, options['video'], options['max_frames'])
+            reports.append(self._summarise(backend, detector, results, latencies, time.perf_counter() - start))
+            if detector.landmarker is not None:
+                detector.landmarker.close()
+
+        if not reports:
+            raise CommandError("No backend could be loaded")
+
+        # 以第一個後端為基準比較關節角度
+        reference = reports[0]
+        for report in reports:
+            common, ref_idx, idx = np.intersect1d(
+                reference['_timestamps'], report['_timestamps'], return_indices=True
+            )
+            diff = np.abs(reference['_angles'][ref_idx] - report['_angles'][idx])
+            report['parity'] = {
+                'reference': reference['backend'],
+                'compared_frames': int(common.size),
+                'mean_abs_angle_diff_deg': round(float(np.nanmean(diff)), 3) if np.isfinite(diff).any() else None,
+                'rep_count_delta': report['rep_count'] - reference['rep_count'],
+            }
+
+        output = [{k: v for k, v in r.items() if not k.startswith('_')} for r in reports]
+        if options['json']:
+            self.stdout.write(json.dumps(output, indent=2))
+            return
+        for r in output:
+            self.stdout.write(
+                f"{r['backend']}: {r['frames']} frames, {r['throughput_fps']} fps, "
+                f"latency mean {r['latency_ms']['mean']} ms / p95 {r['latency_ms']['p95']} ms, "
+                f"detection {r['detection_rate']:.1%}, reps {r['rep_count']}, "
+                f"angle diff vs {r['parity']['reference']}: {r['parity']['mean_abs_angle_diff_deg']}°"
+            )
@@ -0,0 +1,23 @@
+# Generated by Django 5.2
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercise', '0004_reset_exercise_types'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exercisesession',
+            name='analyzed_frames',
+            field=models.IntegerField(default=0, help_text='已分析幀數'),
+        ),
+        migrations.AddField(
+            model_name='exercisesession',
+            name='persisted_frames',
+            field=models.IntegerField(default=0, help_text='已儲存幀數'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercise', '0005_session_frame_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exercisesession',
+            name='summary',
+            field=models.JSONField(blank=True, help_text='訓練結束時計算的每次動作摘要', null=True),
+        ),
+        migrations.AddField(
+            model_name='poseanalysis',
+            name='angles',
+            field=models.JSONField(blank=True, default=dict, help_text='左右手臂角度'),
+        ),
+        migrations.AddField(
+            model_name='poseanalysis',
+            name='is_rep_completed',
+            field=models.BooleanField(default=False, help_text='此幀是否完成一次動作'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercise', '0006_session_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exercisesession',
+            name='rep_angle_ranges',
+            field=models.JSONField(blank=True, default=dict, help_text='逐幀累計的每次動作手臂角度範圍'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercise', '0007_session_rep_angle_ranges'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='exercisesession',
+            name='rep_angle_ranges',
+        ),
+        migrations.AddField(
+            model_name='poseanalysis',
+            name='frame_stats',
+            field=models.JSONField(blank=True, help_text='自上一筆儲存以來所有已分析幀的統計', null=True),
+        ),
+    ]
@@ -66,6 +66,9 @@ class ExerciseSession(BaseModel):
     total_duration = models.DurationField(null=True, blank=True)
     total_reps = models.IntegerField(default=0, help_text="總次數")
     average_score = models.FloatField(null=True, blank=True, help_text="平均分數")
+    analyzed_frames = models.IntegerField(default=0, help_text="已分析幀數")
+    persisted_frames = models.IntegerField(default=0, help_text="已儲存幀數")
+    summary = models.JSONField(null=True, blank=True, help_text="訓練結束時計算的每次動作摘要")
     notes = models.TextField(blank=True, help_text="訓練備註")
     
     class Meta:
@@ -91,6 +94,9 @@ class PoseAnalysis(BaseModel):
     # 姿勢分析結果
     pose_score = models.FloatField(help_text="姿勢分數 (0-100)")
     confidence_score = models.FloatField(help_text="信心度分數 (0-1)")
+    angles = models.JSONField(default=dict, blank=True, help_text="左右手臂角度")
+    is_rep_completed = models.BooleanField(default=False, help_text="此幀是否完成一次動作")
+    frame_stats = models.JSONField(null=True, blank=True, help_text="自上一筆儲存以來所有已分析幀的統計")
     
     # 錯誤檢測
     detected_errors = models.JSONField(
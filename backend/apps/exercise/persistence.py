@@ -0,0 +1,169 @@
+"""
+Pose Frame Persistence Policy
+
+以事件驅動的方式決定哪些姿勢分析幀需要寫入資料庫。
+在 20 FPS 下大多數幀的狀態、角度與錯誤都與前一幀相同，
+只儲存「有變化」的幀即可保留回顧所需的資訊。
+
+未儲存的幀不會遺失：每一幀的分數、錯誤與手臂角度都累計在策略中，
+並隨下一個儲存的幀一起寫入（PoseAnalysis.frame_stats），
+訓練摘要因此以所有已分析的幀計算，而不只是事件幀。
+訓練記錄的計數（analyzed_frames、total_reps、average_score）同樣由這些統計
+在儲存幀與訓練結束時一次更新，不需要每幀都寫入訓練記錄。
+"""
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+
+PERSIST_MODE_ALL = 'all'
+PERSIST_MODE_EVENTS = 'events'
+
+ARM_SIDES = ('left', 'right')
+
+# 儲存原因
+REASON_FIRST_FRAME = 'first_frame'
+REASON_STATE_TRANSITION = 'state_transition'
+REASON_REP_COMPLETED = 'rep_completed'
+REASON_ERRORS_CHANGED = 'errors_changed'
+REASON_KEYFRAME = 'keyframe'
+REASON_ALL_FRAMES = 'all_frames'
+
+
+def new_frame_stats() -> Dict:
+    """空的逐幀統計（可直接存入 JSONField）"""
+    return {'frames': 0, 'score_sum': 0.0, 'error_frames': 0, 'errors': {}, 'angle_range': {},
+            'completed_reps': 0, 'rep_score_sum': 0.0}
+
+
+def add_frame_stats(stats: Dict, pose_result: Dict):
+    """
+    將一幀的結果累計到統計中
+
+    Args:
+        stats: new_frame_stats() 建立的統計（就地更新）
+        pose_result: 姿勢檢測結果（detect_pose 的回傳值）
+    """
+    score = float(pose_result.get('pose_score') or 0.0)
+    stats['frames'] += 1
+    stats['score_sum'] += score
+    if pose_result.get('is_success'):
+        stats['completed_reps'] += 1
+        stats['rep_score_sum'] += score
+    errors = pose_result.get('detected_errors') or []
+    if errors:
+        stats['error_frames'] += 1
+        for error in errors:
+            stats['errors'][error] = stats['errors'].get(error, 0) + 1
+    angles = pose_result.get('angles') or {}
+    for side in ARM_SIDES:
+        value = angles.get(side)
+        if value is None:
+            continue
+        value = float(value)
+        low, high = stats['angle_range'].get(side) or (value, value)
+        stats['angle_range'][side] = [min(low, value), max(high, value)]
+
+
+class PosePersistencePolicy:
+    """
+    姿勢幀持久化策略
+
+    在 'events' 模式下，只有以下情況會儲存該幀：
+      - 動作狀態機發生轉換
+      - 完成一次動作
+      - detected_errors 與上次儲存的幀不同
+      - 距離上次儲存已超過關鍵幀間隔
+    'all' 模式保留原本每幀都儲存的行為。
+    """
+
+    def __init__(self, mode: Optional[str] = None, keyframe_interval: Optional[int] = None,
+                 max_tracked_sessions: int = 256):
+        """
+        Args:
+            mode: 'events' 或 'all'（預設讀取 settings.POSE_PERSIST_MODE）
+            keyframe_interval: 關鍵幀間隔（幀數，預設讀取 settings.POSE_KEYFRAME_INTERVAL）
+            max_tracked_sessions: 最多追蹤的訓練數量（超過時淘汰最舊的）
+        """
+        self.mode = mode or getattr(settings, 'POSE_PERSIST_MODE', PERSIST_MODE_EVENTS)
+        if keyframe_interval is None:
+            keyframe_interval = getattr(settings, 'POSE_KEYFRAME_INTERVAL', 100)
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.max_tracked_sessions = max_tracked_sessions
+
+        # session_id -> {'frame_number': int, 'detected_errors': list}
+        self._last_persisted: "OrderedDict[int, Dict]" = OrderedDict()
+        # session_id -> 上次儲存後（含目前幀）此 worker 累計的逐幀統計
+        self._pending_stats: "OrderedDict[int, Dict]" = OrderedDict()
+
+    def record_frame(self, session_id: int, pose_result: Dict):
+        """累計此幀的統計（每一幀都呼叫，不論是否儲存）"""
+        stats = self._pending_stats.get(session_id)
+        if stats is None:
+            stats = self._pending_stats[session_id] = new_frame_stats()
+        self._pending_stats.move_to_end(session_id)
+        add_frame_stats(stats, pose_result)
+        while len(self._pending_stats) > self.max_tracked_sessions:
+            self._pending_stats.popitem(last=False)
+
+    def take_frame_stats(self, session_id: int) -> Optional[Dict]:
+        """取出並清除累計的統計（寫入儲存的幀時呼叫）"""
+        return self._pending_stats.pop(session_id, None)
+
+    def should_persist(self, session_id: int, frame_number: int, pose_result: Dict) -> Tuple[bool, Optional[str]]:
+        """
+        判斷此幀是否需要儲存
+
+        Args:
+            session_id: 訓練記錄 ID
+            frame_number: 幀數
+            pose_result: 姿勢檢測結果（detect_pose 的回傳值）
+
+        Returns:
+            (是否儲存, 儲存原因)
+        """
+        if self.mode == PERSIST_MODE_ALL:
+            return True, REASON_ALL_FRAMES
+
+        last = self._last_persisted.get(session_id)
+        if last is None:
+            # 此 worker 尚未看過這個訓練，保守地儲存
+            return True, REASON_FIRST_FRAME
+        if pose_result.get('is_success'):
+            return True, REASON_REP_COMPLETED
+        if pose_result.get('state_changed'):
+            return True, REASON_STATE_TRANSITION
+        if list(pose_result.get('detected_errors') or []) != last['detected_errors']:
+            return True, REASON_ERRORS_CHANGED
+        if frame_number - last['frame_number'] >= self.keyframe_interval or frame_number < last['frame_number']:
+            return True, REASON_KEYFRAME
+        return False, None
+
+    def mark_persisted(self, session_id: int, frame_number: int, detected_errors: List[str]):
+        """記錄最後一次儲存的幀"""
+        self._last_persisted[session_id] = {
+            'frame_number': frame_number,
+            'detected_errors': list(detected_errors or []),
+        }
+        self._last_persisted.move_to_end(session_id)
+        while len(self._last_persisted) > self.max_tracked_sessions:
+            self._last_persisted.popitem(last=False)
+
+    def reset_session(self, session_id: int):
+        """清除訓練的追蹤狀態（訓練結束時呼叫）"""
+        self._last_persisted.pop(session_id, None)
+        self._pending_stats.pop(session_id, None)
+
+
+# 全域策略實例
+_persistence_policy_instance = None
+
+
+def get_persistence_policy() -> PosePersistencePolicy:
+    """獲取全域持久化策略實例"""
+    global _persistence_policy_instance
+    if _persistence_policy_instance is None:
+        _persistence_policy_instance = PosePersistencePolicy()
+    return _persistence_policy_instance
@@ -48,8 +48,8 @@ class PoseAnalysisSerializer(serializers.ModelSerializer):
         model = PoseAnalysis
         fields = [
             'id', 'session', 'frame_number', 'timestamp',
-            'keypoints', 'pose_score', 'confidence_score',
-            'detected_errors', 'ai_feedback', 'image'
+            'keypoints', 'pose_score', 'confidence_score', 'angles',
+            'is_rep_completed', 'detected_errors', 'ai_feedback', 'image'
         ]
         read_only_fields = ['id', 'timestamp']
 
@@ -67,11 +67,13 @@ class ExerciseSessionSerializer(serializers.ModelSerializer):
             'id', 'user', 'exercise_type', 'exercise_type_id',
             'session_name', 'start_time', 'end_time', 
             'total_duration', 'total_reps', 'average_score',
+            'analyzed_frames', 'persisted_frames', 'summary',
             'notes', 'pose_analyses', 'created_at', 'updated_at'
         ]
         read_only_fields = [
             'id', 'user', 'start_time', 'total_duration',
-            'average_score', 'created_at', 'updated_at'
+            'average_score', 'analyzed_frames', 'persisted_frames',
+            'summary', 'created_at', 'updated_at'
         ]
     
     def create(self, validated_data):
@@ -0,0 +1,157 @@
+"""
+Exercise Session Summary
+
+訓練結束時以單次向量化運算，從已儲存的姿勢幀計算每次動作的摘要，
+讓歷史與統計頁面只需讀取一筆訓練記錄即可呈現細節。
+
+'events' 模式只儲存部分幀，因此每筆儲存的幀帶有自上一筆儲存以來所有已分析幀的
+統計（PoseAnalysis.frame_stats，見 persistence.py），分數、錯誤幀數與角度範圍
+都由這些統計計算，而不是只看事件幀本身。
+"""
+
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .models import PoseAnalysis
+
+
+SUMMARY_VERSION = 2
+ARM_SIDES = ('left', 'right')
+
+
+def _round_or_none(value: float, digits: int = 2) -> Optional[float]:
+    """NaN 轉為 None，其餘四捨五入"""
+    if value is None or np.isnan(value):
+        return None
+    return round(float(value), digits)
+
+
+def _row_frame_stats(pose_score: float, angles: Optional[Dict], detected_errors: Optional[List],
+                     frame_stats: Optional[Dict]) -> Dict:
+    """儲存幀的統計；沒有 frame_stats 的舊記錄只代表該幀本身"""
+    if frame_stats:
+        return frame_stats
+    angles = angles or {}
+    errors = detected_errors or []
+    return {
+        'frames': 1,
+        'score_sum': pose_score,
+        'error_frames': int(bool(errors)),
+        'errors': dict(Counter(errors)),
+        'angle_range': {side: [angles.get(side), angles.get(side)] for side in ARM_SIDES},
+    }
+
+
+def compute_rep_summary(frame_numbers: np.ndarray, timestamps: np.ndarray, frame_counts: np.ndarray,
+                        score_sums: np.ndarray, error_frames: np.ndarray, angle_min: np.ndarray,
+                        angle_max: np.ndarray, completed: np.ndarray) -> List[Dict]:
+    """
+    以 reduceat 一次計算所有動作區段的統計
+
+    每次動作的區段為「上一次完成的下一筆」到「本次完成的一筆」儲存幀，
+    每筆儲存幀的統計涵蓋自上一筆儲存以來分析過的所有幀。
+
+    Args:
+        frame_numbers: 幀數 (N,)
+        timestamps: 時間戳記（秒）(N,)
+        frame_counts: 每筆涵蓋的已分析幀數 (N,)
+        score_sums: 涵蓋幀的姿勢分數總和 (N,)
+        error_frames: 涵蓋幀中偵測到錯誤的幀數 (N,)
+        angle_min / angle_max: 涵蓋幀的左右手臂最小／最大角度，無法計算者為 NaN (N, 2)
+        completed: 該筆是否完成一次動作 (N,)
+
+    Returns:
+        每次動作的摘要列表
+    """
+    ends = np.flatnonzero(completed)
+    if ends.size == 0:
+        return []
+
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    length = ends[-1] + 1
+
+    rep_frames = np.add.reduceat(frame_counts[:length], starts)
+    score_means = np.add.reduceat(score_sums[:length], starts) / np.maximum(rep_frames, 1)
+    rep_error_frames = np.add.reduceat(error_frames[:length], starts)
+    # fmin/fmax 會忽略 NaN，整段皆為 NaN 時結果仍為 NaN
+    rep_angle_min = np.fmin.reduceat(angle_min[:length], starts, axis=0)
+    rep_angle_max = np.fmax.reduceat(angle_max[:length], starts, axis=0)
+    durations = timestamps[ends] - timestamps[starts]
+
+    reps = []
+    for i in range(ends.size):
+        reps.append({
+            'index': i + 1,
+            'start_frame': int(frame_numbers[starts[i]]),
+            'end_frame': int(frame_numbers[ends[i]]),
+            'start_time': float(timestamps[starts[i]]),
+            'end_time': float(timestamps[ends[i]]),
+            'tempo_seconds': _round_or_none(durations[i]),
+            'analyzed_frames': int(rep_frames[i]),
+            'angle_range': {
+                side: [_round_or_none(rep_angle_min[i, j]), _round_or_none(rep_angle_max[i, j])]
+                for j, side in enumerate(ARM_SIDES)
+            },
+            'average_score': _round_or_none(score_means[i]),
+            'error_frames': int(rep_error_frames[i]),
+        })
+    return reps
+
+
+def build_session_summary(session, pending_stats: Optional[Dict] = None) -> Dict:
+    """
+    從訓練的已儲存幀建立摘要
+
+    Args:
+        session: ExerciseSession 實例
+        pending_stats: 最後一筆儲存之後尚未寫入的逐幀統計（只計入錯誤次數）
+
+    Returns:
+        可直接存入 ExerciseSession.summary 的字典
+    """
+    rows = list(
+        PoseAnalysis.objects.filter(session=session)
+        .order_by('frame_number', 'timestamp')
+        .values_list('frame_number', 'timestamp', 'pose_score', 'angles',
+                     'detected_errors', 'is_rep_completed', 'frame_stats')
+    )
+    stats = [_row_frame_stats(r[2], r[3], r[4], r[6]) for r in rows]
+
+    error_counts: Counter = Counter()
+    for item in stats + ([pending_stats] if pending_stats else []):
+        error_counts.update(item.get('errors') or {})
+
+    summary = {
+        'version': SUMMARY_VERSION,
+        'analyzed_frames': session.analyzed_frames,
+        'persisted_frames': len(rows),
+        'rep_count': 0,
+        'average_tempo_seconds': None,
+        'reps': [],
+        'error_counts': dict(error_counts.most_common()),
+    }
+    if not rows:
+        return summary
+
+    count = len(rows)
+    frame_numbers = np.fromiter((r[0] for r in rows), dtype=np.int64, count=count)
+    timestamps = np.fromiter((r[1].timestamp() for r in rows), dtype=np.float64, count=count)
+    frame_counts = np.fromiter((s['frames'] for s in stats), dtype=np.int64, count=count)
+    score_sums = np.fromiter((s['score_sum'] for s in stats), dtype=np.float64, count=count)
+    error_frames = np.fromiter((s['error_frames'] for s in stats), dtype=np.int64, count=count)
+    angle_ranges = np.array(
+        [[(s['angle_range'].get(side) or (None, None)) for side in ARM_SIDES] for s in stats],
+        dtype=np.float64
+    ).reshape(count, len(ARM_SIDES), 2)
+    completed = np.fromiter((r[5] for r in rows), dtype=bool, count=count)
+
+    reps = compute_rep_summary(frame_numbers, timestamps, frame_counts, score_sums, error_frames,
+                               angle_ranges[..., 0], angle_ranges[..., 1], completed)
+    tempos = [rep['tempo_seconds'] for rep in reps if rep['tempo_seconds'] is not None]
+
+    summary['rep_count'] = len(reps)
+    summary['reps'] = reps
+    summary['average_tempo_seconds'] = _round_or_none(np.mean(tempos)) if tempos else None
+    return summary
@@ -16,6 +16,8 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.conf import settings
 from django.utils import timezone
 from django.db import transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast, Coalesce
 
 from .models import (
     ExerciseType, ExerciseSession, PoseAnalysis, 
@@ -25,6 +27,8 @@ from .serializers import (
     ExerciseTypeSerializer, ExerciseSessionSerializer,
     PoseAnalysisSerializer, ExerciseTemplateSerializer
 )
+from .persistence import get_persistence_policy
+from .summary import build_session_summary
 from ml_models.pose_detector import get_pose_detector
 
 
@@ -53,6 +57,38 @@ def ensure_weightlifting_exercise_type():
     )
 
 
+def apply_session_counts(session_id, frame_stats, persisted_frames=0):
+    """
+    以單一 UPDATE 將累計的逐幀統計加到訓練記錄的計數
+
+    使用 F() 在資料庫端累加，多個 worker 同時更新同一訓練也不會互相覆蓋。
+
+    Args:
+        session_id: 訓練記錄 ID
+        frame_stats: policy.take_frame_stats() 取出的統計（可為 None）
+        persisted_frames: 本次新增的儲存幀數
+    """
+    if not frame_stats and not persisted_frames:
+        return
+    frame_stats = frame_stats or {}
+    updates = {}
+    if frame_stats.get('frames'):
+        updates['analyzed_frames'] = F('analyzed_frames') + frame_stats['frames']
+    if persisted_frames:
+        updates['persisted_frames'] = F('persisted_frames') + persisted_frames
+    completed_reps = frame_stats.get('completed_reps', 0)
+    if completed_reps:
+        # 平均分數以完成動作當幀的分數計算（同一 UPDATE 中 F() 皆為更新前的值）
+        score_total = (
+            Coalesce(F('average_score'), Value(0.0)) * Cast(F('total_reps'), FloatField())
+            + Value(float(frame_stats.get('rep_score_sum', 0.0)))
+        )
+        updates['average_score'] = score_total / Cast(F('total_reps') + completed_reps, FloatField())
+        updates['total_reps'] = F('total_reps') + completed_reps
+    if updates:
+        ExerciseSession.objects.filter(id=session_id).update(**updates)
+
+
 class ExerciseTypeListView(generics.ListCreateAPIView):
     """運動類型列表和創建"""
     serializer_class = ExerciseTypeSerializer
@@ -87,7 +123,10 @@ def analyze_pose(request):
         image_data = request.data.get('image')
         exercise_type = DEFAULT_WEIGHTLIFTING_EXERCISE['name']
         session_id = request.data.get('session_id')
-        frame_number = request.data.get('frame_number', 0)
+        try:
+            frame_number = int(request.data.get('frame_number', 0))
+        except (TypeError, ValueError):
+            frame_number = 0
         
         if not image_data:
             return Response(
@@ -119,7 +158,7 @@ def analyze_pose(request):
             exercise_type
         )
         
-        # 如果有訓練記錄，儲存分析結果
+        # 如果有訓練記錄，依持久化策略儲存分析結果
         pose_analysis = None
         if session_id:
             try:
@@ -128,27 +167,28 @@ def analyze_pose(request):
                     user=request.user
                 )
                 
-                pose_analysis = PoseAnalysis.objects.create(
-                    session=session,
-                    frame_number=frame_number,
-                    keypoints=pose_result['keypoints'],
-                    pose_score=pose_result['pose_score'],
-                    confidence_score=pose_result['confidence'],
-                    detected_errors=pose_result['detected_errors'],
-                    ai_feedback=feedback
-                )
+                policy = get_persistence_policy()
+                # 每一幀都累計統計，未儲存的幀也可能是該次動作的角度極值或錯誤；
+                # 訓練記錄的計數只在儲存幀時隨統計一併更新
+                policy.record_frame(session.id, pose_result)
+                should_persist, _ = policy.should_persist(session.id, frame_number, pose_result)
                 
-                # 更新訓練記錄（僅在成功時累計）
-                if pose_result.get('is_success'):
-                    session.total_reps += 1
-                    if session.average_score is None:
-                        session.average_score = pose_result['pose_score']
-                    else:
-                        session.average_score = (
-                            session.average_score * (session.total_reps - 1) + 
-                            pose_result['pose_score']
-                        ) / session.total_reps
-                    session.save(update_fields=['total_reps', 'average_score'])
+                if should_persist:
+                    frame_stats = policy.take_frame_stats(session.id)
+                    pose_analysis = PoseAnalysis.objects.create(
+                        session=session,
+                        frame_number=frame_number,
+                        keypoints=pose_result['keypoints'],
+                        pose_score=pose_result['pose_score'],
+                        confidence_score=pose_result['confidence'],
+                        angles=pose_result.get('angles') or {},
+                        is_rep_completed=bool(pose_result.get('is_success')),
+                        detected_errors=pose_result['detected_errors'],
+                        frame_stats=frame_stats,
+                        ai_feedback=feedback
+                    )
+                    policy.mark_persisted(session.id, frame_number, pose_result['detected_errors'])
+                    apply_session_counts(session.id, frame_stats, persisted_frames=1)
                 
             except ExerciseSession.DoesNotExist:
                 pass
@@ -161,6 +201,7 @@ def analyze_pose(request):
             'confidence': pose_result['confidence'],
             'is_success': pose_result.get('is_success', False),
             'angles': pose_result.get('angles', {}),
+            'joint_angles': pose_result.get('joint_angles', {}),
             'detected_errors': pose_result['detected_errors'],
             'ai_feedback': feedback,
             'timestamp': pose_result['timestamp'],
@@ -218,7 +259,15 @@ def end_exercise_session(request, session_id):
         session.end_time = timezone.now()
         if session.start_time:
             session.total_duration = session.end_time - session.start_time
-        session.save()
+        policy = get_persistence_policy()
+        pending_stats = policy.take_frame_stats(session.id)
+        # 寫入最後一筆儲存幀之後尚未更新的計數
+        apply_session_counts(session.id, pending_stats)
+        session.refresh_from_db(fields=['total_reps', 'average_score', 'analyzed_frames', 'persisted_frames'])
+        session.summary = build_session_summary(session, pending_stats=pending_stats)
+        # 只寫入結束時設定的欄位，計數由 F() 累加
+        session.save(update_fields=['end_time', 'total_duration', 'summary'])
+        policy.reset_session(session.id)
         
         serializer = ExerciseSessionSerializer(session)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -14,3 +14,15 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.production')
 
 application = get_asgi_application()
+
+# Size torch / OpenCV thread pools for this process before any model runs
+from ml_models.thread_budget import apply_thread_budget
+
+apply_thread_budget()
+
+# Optionally load ML models before serving the first request
+from django.conf import settings
+
+if settings.FOODSEG_PRELOAD:
+    from ml_models.food_classifier import get_foodseg103_manager
+    get_foodseg103_manager().preload()
@@ -5,6 +5,7 @@ This file contains settings common to all environments.
 
 from pathlib import Path
 import os
+import json
 from datetime import timedelta
 from dotenv import load_dotenv
 
@@ -195,4 +196,74 @@ DEFAULT_FROM_EMAIL = "no-reply@foodcam.com"
 
 # Login/Logout redirects
 LOGIN_REDIRECT_URL = 'index'
-LOGOUT_REDIRECT_URL = 'index' 
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'index' 
+
+# Pose analysis persistence
+# 'events': 只儲存狀態轉換、完成動作、錯誤變化或關鍵幀；'all': 每幀都儲存
+POSE_PERSIST_MODE = os.getenv('POSE_PERSIST_MODE', 'events')
+POSE_KEYFRAME_INTERVAL = int(os.getenv('POSE_KEYFRAME_INTERVAL', 100))
+
+# Pose detector backend: 'solutions'（舊版 mp.solutions.pose）、'video' 或 'live_stream'（MediaPipe Tasks PoseLandmarker）
+POSE_DETECTOR_BACKEND = os.getenv('POSE_DETECTOR_BACKEND', 'solutions')
+POSE_LANDMARKER_MODEL_PATH = os.getenv('POSE_LANDMARKER_MODEL_PATH', str(BASE_DIR / 'ml_models' / 'models' / 'pose_landmarker_lite.task'))
+
+# FoodSeg103 micro-batching（需搭配多執行緒 worker，例如 gunicorn --threads，才會有並行請求可合併）
+FOODSEG_BATCHING_ENABLED = os.getenv('FOODSEG_BATCHING_ENABLED', 'False').lower() in ('1', 'true', 'yes')
+FOODSEG_BATCH_MAX_SIZE = int(os.getenv('FOODSEG_BATCH_MAX_SIZE', 8))
+FOODSEG_BATCH_MAX_WAIT_MS = float(os.getenv('FOODSEG_BATCH_MAX_WAIT_MS', 10))
+
+# FoodSeg103 model lifecycle
+FOODSEG_PRELOAD = os.getenv('FOODSEG_PRELOAD', 'False').lower() in ('1', 'true', 'yes')  # 在 worker 啟動時載入模型，而非第一次請求
+FOODSEG_WARMUP_ITERATIONS = int(os.getenv('FOODSEG_WARMUP_ITERATIONS', 2))
+FOODSEG_PREPROCESS_THREADS = int(os.getenv('FOODSEG_PREPROCESS_THREADS', 4))  # 多張圖片解碼的執行緒數（0 = 在請求執行緒中解碼）
+FOODSEG_RELOAD_MARKER_DIR = os.getenv('FOODSEG_RELOAD_MARKER_DIR', '')  # 熱重載標記檔目錄，同一主機的 worker 共用（預設為 ml_models/models/）
+FOODSEG_RELOAD_CHECK_INTERVAL = float(os.getenv('FOODSEG_RELOAD_CHECK_INTERVAL', 1.0))  # 各 worker 檢查標記檔的間隔（秒）
+
+# FoodSeg103 CPU quantization: 'fp32', 'dynamic'（僅分類頭）或 'int8'（需先執行 manage.py calibrate_foodseg103）
+FOODSEG_QUANTIZATION = os.getenv('FOODSEG_QUANTIZATION', 'fp32')
+FOODSEG_INT8_MODEL_PATH = os.getenv('FOODSEG_INT8_MODEL_PATH', '')  # 預設為 checkpoint 旁的 <name>_int8.pth
+
+# FoodSeg103 inference backend: 'torch' 或 'onnx'（需先執行 manage.py export_onnx）
+FOODSEG_BACKEND = os.getenv('FOODSEG_BACKEND', 'torch')
+FOODSEG_ONNX_MODEL_PATH = os.getenv('FOODSEG_ONNX_MODEL_PATH', '')  # 預設為 checkpoint 旁的 <name>.onnx
+
+# Uploaded image result cache (SHA-256 exact; perceptual dHash matching is opt-in)
+FOODSEG_RESULT_CACHE_ENABLED = os.getenv('FOODSEG_RESULT_CACHE_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+FOODSEG_RESULT_CACHE_BACKEND = os.getenv('FOODSEG_RESULT_CACHE_BACKEND', 'memory')  # 'memory'（單一 worker）或 'django'（使用 CACHES，例如 Redis）
+FOODSEG_RESULT_CACHE_ALIAS = os.getenv('FOODSEG_RESULT_CACHE_ALIAS', 'default')
+FOODSEG_RESULT_CACHE_TTL = int(os.getenv('FOODSEG_RESULT_CACHE_TTL', 86400))  # 秒
+FOODSEG_RESULT_CACHE_MAX_ENTRIES = int(os.getenv('FOODSEG_RESULT_CACHE_MAX_ENTRIES', 1024))
+FOODSEG_PHASH_MAX_DISTANCE = int(os.getenv('FOODSEG_PHASH_MAX_DISTANCE', 0))  # 0 = 只使用完全相同的檔案（預設）；dHash 只看灰階梯度，不同食物的相似構圖也可能相符
+
+# Gemini nutrition analysis cache (per normalised food-name set + prompt version)
+NUTRITION_CACHE_ENABLED = os.getenv('NUTRITION_CACHE_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+NUTRITION_CACHE_MAX_AGE_DAYS = int(os.getenv('NUTRITION_CACHE_MAX_AGE_DAYS', 30))  # 0 = 永不過期
+
+# Nutrition source: 'gemini'（預設，等待 Gemini）；可選 'local'（只用本地營養素表）或 'hybrid'（Gemini 逾時則以本地表回覆，Gemini 結果於背景寫入快取）
+NUTRITION_MODE = os.getenv('NUTRITION_MODE', 'gemini')
+NUTRITION_GEMINI_TIMEOUT = float(os.getenv('NUTRITION_GEMINI_TIMEOUT', 0.1))  # 秒（hybrid 模式；快取命中時立即回覆）
+NUTRITION_BACKGROUND_WORKERS = int(os.getenv('NUTRITION_BACKGROUND_WORKERS', 4))
+NUTRITION_LOCAL_WEIGHTING = os.getenv('NUTRITION_LOCAL_WEIGHTING', 'confidence')  # 'confidence'（依信心加權份量）或 'portion'（每種食物一份）
+NUTRITION_TABLE_PATH = os.getenv('NUTRITION_TABLE_PATH', '')  # 預設為 ml_models/models/foodseg103_nutrition.csv
+
+# Two-phase upload (api/upload/async/): nutrition analysis runs in background threads, results are polled
+ANALYSIS_JOB_WORKERS = int(os.getenv('ANALYSIS_JOB_WORKERS', 4))  # 每個 worker 的背景執行緒數
+ANALYSIS_JOB_MAX_WAIT = float(os.getenv('ANALYSIS_JOB_MAX_WAIT', 2))  # long-poll ?wait= 上限（秒）；同步 WSGI worker 在等待期間無法處理其他請求，請保持在 1–2 秒
+ANALYSIS_JOB_TTL_HOURS = float(os.getenv('ANALYSIS_JOB_TTL_HOURS', 24))  # 超過此時間的 job 會被刪除
+
+# Multi-image upload (api/upload/batch/)
+FOODSEG_BATCH_UPLOAD_MAX_IMAGES = int(os.getenv('FOODSEG_BATCH_UPLOAD_MAX_IMAGES', 16))  # 單次請求最多圖片數（一次 forward pass）
+
+# Models served side by side (api/upload/* accept a `model` field): JSON {name: FoodSeg103Classifier options},
+# e.g. {"setr_mla": {"model_name": "setr_mla", "model_path": "foodseg103_setr_mla.pth", "image_size": 384}}
+# Paths are relative to ml_models/models/. The default model is configured by the FOODSEG_* settings above.
+FOODSEG_MODELS = json.loads(os.getenv('FOODSEG_MODELS', '{}'))
+FOODSEG_DEFAULT_MODEL = os.getenv('FOODSEG_DEFAULT_MODEL', 'resnet50_attention')
+FOODSEG_MODEL_MEMORY_BUDGET_MB = float(os.getenv('FOODSEG_MODEL_MEMORY_BUDGET_MB', 0))  # 已載入模型權重上限，超過時卸載最久未用的模型；0 = 不限
+
+# CPU thread budget per worker process (ml_models/thread_budget.py); 0 = derive from core and worker count
+CPU_WORKERS = int(os.getenv('CPU_WORKERS', 1))  # 同一台機器上的 worker 數（gunicorn 下自動使用 --workers）
+CPU_TORCH_THREADS = int(os.getenv('CPU_TORCH_THREADS', 0))  # 預設：可用核心數 / worker 數
+CPU_TORCH_INTEROP_THREADS = int(os.getenv('CPU_TORCH_INTEROP_THREADS', 0))  # 預設：1
+CPU_OPENCV_THREADS = int(os.getenv('CPU_OPENCV_THREADS', 0))  # 預設：1
+CPU_AFFINITY = os.getenv('CPU_AFFINITY', 'off')  # 'off' 或 'auto'（每個 worker 綁定各自的核心）
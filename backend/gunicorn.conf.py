@@ -0,0 +1,91 @@
+"""
+Gunicorn configuration, picked up automatically when gunicorn starts in backend/.
+
+GUNICORN_PRELOAD=true loads the Django app, and with it the FoodSeg103
+classifier, in the master before the workers are forked. Workers then share the
+model weights copy-on-write instead of each loading its own copy (see
+ml_models/worker_memory.py). Models loaded lazily after fork (other
+FOODSEG_MODELS entries, MediaPipe pose detectors) are still per worker.
+
+Each worker gets its own CPU thread budget (torch, OpenCV, optional CPU
+affinity; see ml_models/thread_budget.py and the CPU_* settings), applied right
+after fork.
+
+Command-line flags (e.g. --workers 3) take precedence over this file.
+"""
+
+import os
+import threading
+import time
+
+
+def _env_flag(name, default='False'):
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+
+preload_app = _env_flag('GUNICORN_PRELOAD')
+
+# Per-worker RSS/PSS logged by the master every N seconds (0 = off)
+_memory_report_interval = float(os.getenv('GUNICORN_MEMORY_REPORT_INTERVAL', 300))
+
+# Workers apply their budget in post_fork; importing the app must not apply one in the master
+os.environ['CPU_THREAD_BUDGET_DEFERRED'] = '1'
+
+if preload_app:
+    os.environ.setdefault('FOODSEG_PRELOAD', 'true')
+    import torch
+    # Intra-op thread pools do not survive fork: keep the master single-threaded
+    torch.set_num_threads(1)
+
+
+def _mb(value):
+    return f"{value / 1e6:.1f} MB" if value is not None else 'n/a'
+
+
+def _report_memory(server):
+    from ml_models.worker_memory import process_memory
+
+    while True:
+        time.sleep(_memory_report_interval)
+        usages = [process_memory(pid) for pid in list(server.WORKERS)]
+        for usage in usages:
+            server.log.info("Worker %s memory: rss=%s pss=%s shared=%s private=%s", usage['pid'],
+                            _mb(usage['rss']), _mb(usage['pss']), _mb(usage['shared']), _mb(usage['private']))
+        pss = [u['pss'] for u in usages if u['pss'] is not None]
+        if pss:
+            server.log.info("Workers total pss=%s across %d workers", _mb(sum(pss)), len(pss))
+
+
+def when_ready(server):
+    from ml_models.worker_memory import prepare_fork, process_memory
+
+    if server.cfg.preload_app:
+        packed = prepare_fork()
+        server.log.info("Preloaded models, %s of weights shared with workers (master rss=%s)",
+                        _mb(packed), _mb(process_memory()['rss']))
+    if _memory_report_interval > 0:
+        threading.Thread(target=_report_memory, args=(server,), name='memory-report', daemon=True).start()
+
+
+def pre_fork(server, worker):
+    # Lowest slot not held by a live worker, so a respawned worker takes over the cores of the one it replaces
+    taken = {getattr(w, 'cpu_slot', None) for w in server.WORKERS.values()}
+    worker.cpu_slot = next(slot for slot in range(len(taken) + 1) if slot not in taken)
+
+
+def post_fork(server, worker):
+    from ml_models.thread_budget import apply_thread_budget
+
+    budget = apply_thread_budget(workers=server.cfg.workers, worker_slot=worker.cpu_slot, force=True)
+    server.log.info("Worker %s thread budget: %s", worker.pid, budget)
+    if server.cfg.preload_app:
+        from ml_models.worker_memory import after_fork
+        after_fork()
+
+
+def post_worker_init(worker):
+    from ml_models.worker_memory import process_memory
+
+    usage = process_memory()
+    worker.log.info("Worker %s ready: rss=%s pss=%s shared=%s", usage['pid'],
+                    _mb(usage['rss']), _mb(usage['pss']), _mb(usage['shared']))
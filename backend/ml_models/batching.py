@@ -0,0 +1,156 @@
+"""
+Dynamic micro-batching engine for classifier inference.
+
+Concurrent requests put their input tensors on a queue. A background thread
+merges them into one batch bounded by a maximum batch size and a maximum wait,
+runs a single forward pass and scatters the output rows back to the callers.
+"""
+
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Callable, Dict
+
+import torch
+
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    In-process micro-batcher.
+
+    Args:
+        infer_fn: Callable mapping a [B, ...] tensor to a [B, ...] result
+        max_batch_size: Maximum number of requests merged into one batch
+        max_wait_ms: Maximum time the first queued request waits for others
+    """
+
+    def __init__(self, infer_fn: Callable[[torch.Tensor], torch.Tensor],
+                 max_batch_size: int = 8, max_wait_ms: float = 10.0):
+        self.infer_fn = infer_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._closing = False
+        self._submit_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+        self._worker = threading.Thread(target=self._run, name='foodseg103-batcher', daemon=True)
+        self._worker.start()
+
+    def _reset_stats(self):
+        self._batch_sizes: Counter = Counter()
+        self._items = 0
+        self._batches = 0
+        self._queue_wait_ms_total = 0.0
+        self._queue_wait_ms_max = 0.0
+        self._forward_ms_total = 0.0
+        self._errors = 0
+
+    def submit(self, item: torch.Tensor) -> Future:
+        """
+        Queue a single input (without the batch dimension).
+
+        Returns:
+            Future resolving to the output row for this input
+        """
+        future: Future = Future()
+        with self._submit_lock:
+            if not self._closing:
+                self._queue.put((item, future, time.perf_counter()))
+                return future
+        # Late caller still holding a replaced model: run unbatched
+        try:
+            future.set_result(self.infer_fn(item.unsqueeze(0))[0])
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def close(self):
+        """Stop the worker once the requests already queued have been served."""
+        with self._submit_lock:
+            self._closing = True
+            self._queue.put(_STOP)
+
+    def _collect(self):
+        """Block for the first request, then fill the batch until the deadline."""
+        batch = []
+        entry = self._queue.get()
+        if entry is _STOP:
+            self._closed = True
+            return batch
+        batch.append(entry)
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                self._closed = True
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while not self._closed:
+            batch = self._collect()
+            if not batch:
+                continue
+            started = time.perf_counter()
+            items = [entry[0] for entry in batch]
+            futures = [entry[1] for entry in batch]
+            try:
+                outputs = self.infer_fn(torch.stack(items))
+            except Exception as e:
+                with self._stats_lock:
+                    self._errors += 1
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            for i, future in enumerate(futures):
+                future.set_result(outputs[i])
+
+            waits = [(started - entry[2]) * 1000.0 for entry in batch]
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._batch_sizes[len(batch)] += 1
+                self._queue_wait_ms_total += sum(waits)
+                self._queue_wait_ms_max = max(self._queue_wait_ms_max, max(waits))
+                self._forward_ms_total += (finished - started) * 1000.0
+
+    def stats(self) -> Dict:
+        """Batch-size and wait-time metrics for tuning throughput against latency."""
+        with self._stats_lock:
+            batches = self._batches or 1
+            items = self._items or 1
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'queue_depth': self._queue.qsize(),
+                'batches': self._batches,
+                'items': self._items,
+                'errors': self._errors,
+                'mean_batch_size': round(self._items / batches, 3) if self._batches else 0.0,
+                'batch_size_histogram': {str(k): v for k, v in sorted(self._batch_sizes.items())},
+                'mean_queue_wait_ms': round(self._queue_wait_ms_total / items, 3) if self._items else 0.0,
+                'max_queue_wait_ms': round(self._queue_wait_ms_max, 3),
+                'mean_forward_ms': round(self._forward_ms_total / batches, 3) if self._batches else 0.0,
+            }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._reset_stats()
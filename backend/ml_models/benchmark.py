@@ -0,0 +1,267 @@
+"""
+End-to-end benchmark of the FoodSeg103 classifier (``manage.py benchmark_classifier``).
+
+Each case is one (model, image size, batch size, threads, backend) combination
+and times the four serving stages per batch:
+
+    decode       JPEG bytes -> PIL images (reduced DCT decode + EXIF orientation)
+    preprocess   PIL images -> normalised float32 batch
+    forward      model probabilities
+    postprocess  probabilities -> sorted prediction lists
+
+Everything runs offline: inputs are local photos or synthetic JPEGs, and
+models without a checkpoint get random weights, written once as a slim
+checkpoint (and exported to ONNX for the onnx backend) in a work directory.
+Results are JSON; compare_to_baseline() flags cases that got slower, lost
+throughput or hold larger weights than a saved run. Peak RSS is a process-wide
+high-water mark that depends on every case run before, so it is reported once
+per run and not compared per case.
+"""
+
+import gc
+import io
+import platform
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import torch
+from PIL import Image
+
+from .food_classifier import FoodSeg103Classifier
+from .foodseg103_model import create_model
+from .onnx_backend import ONNXRUNTIME_AVAILABLE
+from .onnx_export import EXPORTABLE_MODELS, export_onnx
+from .slim_checkpoint import save_slim_checkpoint
+from .thread_budget import available_cpus, thread_budget_status
+from .worker_memory import process_memory
+
+
+STAGES = ('decode', 'preprocess', 'forward', 'postprocess')
+
+# Backend name -> FoodSeg103Classifier (backend, quantization)
+BACKENDS = {
+    'torch': ('torch', 'fp32'),
+    'dynamic': ('torch', 'dynamic'),
+    'int8': ('torch', 'int8'),
+    'onnx': ('onnx', 'fp32'),
+}
+
+# Metrics compared against the baseline: name -> True if higher is better
+BASELINE_METRICS = {
+    'latency_ms.total.p50': False,
+    'latency_ms.total.p95': False,
+    'images_per_second': True,
+    'model_mb': False,
+}
+
+
+def synthetic_jpegs(count: int, size=(640, 480), seed: int = 0) -> List[bytes]:
+    """Photo-sized JPEGs with smooth gradients and noise (decode cost similar to real photos)."""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    images = []
+    for _ in range(count):
+        base = rng.uniform(0, 255, size=3).astype(np.float32)
+        pixels = (base + 60 * np.sin(x[..., None] / rng.uniform(20, 80) + y[..., None] / rng.uniform(20, 80))
+                  + rng.normal(0, 12, size=(height, width, 3)))
+        buffer = io.BytesIO()
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, format='JPEG', quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def load_images(paths: Sequence) -> List[bytes]:
+    return [Path(p).read_bytes() for p in paths]
+
+
+def case_key(case: Dict) -> str:
+    return (f"{case['model']}/{case['backend']}/size{case['image_size']}"
+            f"/batch{case['batch_size']}/threads{case['threads']}")
+
+
+def _summary(values_ms: np.ndarray) -> Dict:
+    return {
+        'mean': round(float(values_ms.mean()), 3),
+        'p50': round(float(np.percentile(values_ms, 50)), 3),
+        'p90': round(float(np.percentile(values_ms, 90)), 3),
+        'p95': round(float(np.percentile(values_ms, 95)), 3),
+        'p99': round(float(np.percentile(values_ms, 99)), 3),
+    }
+
+
+def peak_rss_bytes() -> int:
+    """High-water mark of this process's RSS."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class ClassifierFactory:
+    """
+    Builds (and caches) classifiers for benchmark cases.
+
+    Args:
+        workdir: Where random-weight checkpoints and ONNX exports are written
+        checkpoint: Trained checkpoint used for every model (None = random weights)
+        int8_path: Calibrated INT8 state for the 'int8' backend (default: next to the checkpoint)
+    """
+
+    def __init__(self, workdir, checkpoint=None, int8_path=None):
+        self.workdir = Path(workdir)
+        self.workdir.mkdir(parents=True, exist_ok=True)
+        self.checkpoint = checkpoint
+        self.int8_path = int8_path
+        self._cache: Dict[tuple, FoodSeg103Classifier] = {}
+
+    def _checkpoint(self, model_name: str, image_size: int) -> Path:
+        if self.checkpoint is not None:
+            return Path(self.checkpoint)
+        path = self.workdir / f"{model_name}_{image_size}_random.safetensors"
+        if not path.exists():
+            num_classes = 104 if model_name in FoodSeg103Classifier.SEGMENTATION_MODELS else 103
+            torch.manual_seed(0)
+            model = create_model(model_name, num_classes=num_classes, pretrained=False, dropout=0.3,
+                                 img_size=image_size)
+            save_slim_checkpoint(model.state_dict(), path, metadata={'model_name': model_name,
+                                                                     'image_size': image_size})
+        return path
+
+    def get(self, model_name: str, image_size: int, backend: str, threads: int) -> FoodSeg103Classifier:
+        """
+        Raises:
+            RuntimeError: The backend is not available for this model (e.g. no calibrated INT8 state)
+        """
+        # ONNX Runtime sizes its thread pool (from torch.get_num_threads()) when the session is created
+        key = (model_name, image_size, backend, threads if backend == 'onnx' else None)
+        if key in self._cache:
+            return self._cache[key]
+
+        checkpoint = self._checkpoint(model_name, image_size)
+        backend_name, quantization = BACKENDS[backend]
+        onnx_path = None
+        if backend == 'onnx':
+            if not ONNXRUNTIME_AVAILABLE:
+                raise RuntimeError("onnxruntime is not installed")
+            if model_name not in EXPORTABLE_MODELS:
+                raise RuntimeError(f"{model_name} cannot be exported to ONNX")
+            onnx_path = self.workdir / f"{checkpoint.stem}_{image_size}.onnx"
+            if not onnx_path.exists():
+                source = FoodSeg103Classifier(model_path=str(checkpoint), model_name=model_name,
+                                              image_size=image_size)
+                export_onnx(source.model, onnx_path, image_size=image_size)
+
+        classifier = FoodSeg103Classifier(
+            model_path=str(checkpoint), model_name=model_name, image_size=image_size,
+            backend=backend_name, quantization=quantization,
+            quantized_model_path=self.int8_path, onnx_model_path=onnx_path,
+        )
+        if (classifier.backend, classifier.quantization) != (backend_name, quantization):
+            raise RuntimeError(f"{backend} is not available for {model_name} "
+                               f"(loaded as {classifier.backend}/{classifier.quantization})")
+        self._cache[key] = classifier
+        return classifier
+
+    def clear(self):
+        """Drop the cached classifiers (their weights and ONNX sessions)."""
+        for classifier in self._cache.values():
+            classifier.close()
+        self._cache.clear()
+        gc.collect()
+
+
+def run_case(classifier: FoodSeg103Classifier, images: List[bytes], batch_size: int,
+             iterations: int = 20, warmup: int = 2, threshold: float = 0.5) -> Dict:
+    """
+    Time the serving stages on batches of batch_size images (cycling through images).
+
+    Returns:
+        Per-stage and total latency percentiles (ms per batch), throughput, weight and process memory
+    """
+    timings = {stage: [] for stage in STAGES}
+    for i in range(warmup + iterations):
+        batch = [io.BytesIO(images[(i * batch_size + j) % len(images)]) for j in range(batch_size)]
+
+        started = time.perf_counter()
+        decoded = classifier.preprocessor.decode(batch)
+        errors = [e for e in decoded if isinstance(e, Exception)]
+        if errors:
+            raise errors[0]
+        decoded_at = time.perf_counter()
+        tensor = classifier.preprocess_images(decoded)
+        preprocessed_at = time.perf_counter()
+        probabilities = classifier.predict_probabilities(tensor)
+        forward_at = time.perf_counter()
+        classifier.predictions_from_probabilities(probabilities, threshold)
+        finished = time.perf_counter()
+
+        if i >= warmup:
+            for stage, seconds in zip(STAGES, (decoded_at - started, preprocessed_at - decoded_at,
+                                               forward_at - preprocessed_at, finished - forward_at)):
+                timings[stage].append(seconds * 1000)
+
+    stage_ms = {stage: np.array(values) for stage, values in timings.items()}
+    total_ms = sum(stage_ms.values())
+    return {
+        'latency_ms': {'total': _summary(total_ms), **{s: _summary(v) for s, v in stage_ms.items()}},
+        'images_per_second': round(batch_size * 1000 * len(total_ms) / float(total_ms.sum()), 2),
+        'model_mb': round(classifier.memory_bytes() / 1e6, 1),
+        # Current RSS of the whole process (includes classifiers cached for other cases)
+        'rss_mb': round(process_memory()['rss'] / 1e6, 1),
+    }
+
+
+def environment() -> Dict:
+    return {
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': len(available_cpus()),
+        'thread_budget': thread_budget_status(),
+        'onnxruntime': ONNXRUNTIME_AVAILABLE,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def _metric(case: Dict, path: str) -> Optional[float]:
+    value = case
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def compare_to_baseline(cases: List[Dict], baseline: Dict, tolerance: float = 0.1) -> List[Dict]:
+    """
+    Compare cases with the same key in a saved run.
+
+    A metric regresses when it is worse than the baseline by more than
+    tolerance (relative). Each case gets a 'baseline' entry with the ratios.
+
+    Returns:
+        One entry per regressed metric
+    """
+    previous = {case_key(c): c for c in baseline.get('cases', []) if 'error' not in c}
+    regressions = []
+    for case in cases:
+        base = previous.get(case_key(case))
+        if base is None or 'error' in case:
+            continue
+        ratios = {}
+        for metric, higher_is_better in BASELINE_METRICS.items():
+            current, reference = _metric(case, metric), _metric(base, metric)
+            if not current or not reference:
+                continue
+            ratio = current / reference
+            ratios[metric] = round(ratio, 3)
+            worse = ratio < 1 - tolerance if higher_is_better else ratio > 1 + tolerance
+            if worse:
+                regressions.append({'case': case_key(case), 'metric': metric,
+                                    'baseline': reference, 'current': current, 'ratio': round(ratio, 3)})
+        case['baseline'] = ratios
+    return regressions
@@ -12,6 +12,23 @@ from pathlib import Path
 import numpy as np
 import cv2
 
+from .batching import MicroBatcher
+from .image_preprocessing import ImagePreprocessor
+from .onnx_backend import default_onnx_path, load_onnx_model
+from .model_manager import ModelManager
+from .quantization import QUANTIZATION_MODES, quantize_model
+from .slim_checkpoint import default_slim_path, is_slim_checkpoint, load_slim_checkpoint
+from .worker_memory import consolidate_weights
+
+
+def _get_setting(name, default=None):
+    """Read a Django setting, falling back to the environment when Django is not configured."""
+    try:
+        from django.conf import settings
+        return getattr(settings, name, os.getenv(name, default))
+    except Exception:
+        return os.getenv(name, default)
+
 
 class FoodClassifier:
     """
@@ -141,7 +158,16 @@ class FoodSeg103Classifier:
     Multi-label food classification using FoodSeg103 ResNet50 with CBAM Attention.
     """
     
-    def __init__(self, model_path=None, class_names_path=None, threshold=0.3):
+    BACKENDS = ('torch', 'onnx')
+    
+    # Architectures from foodseg103_model.create_model; SETR is a segmentation model
+    # with a background output whose class shares are used as probabilities
+    MODEL_NAMES = ('resnet50', 'resnet50_attention', 'efficientnet', 'swin', 'setr_mla')
+    SEGMENTATION_MODELS = ('setr_mla',)
+    
+    def __init__(self, model_path=None, class_names_path=None, threshold=0.3, preprocess_threads=0,
+                 quantization='fp32', quantized_model_path=None, backend='torch', onnx_model_path=None,
+                 model_name='resnet50_attention', image_size=224):
         """
         Initialize the FoodSeg103 classifier.
         
@@ -149,113 +175,386 @@ class FoodSeg103Classifier:
             model_path (str): Path to the trained model checkpoint
             class_names_path (str): Path to the class mapping JSON file
             threshold (float): Classification threshold for multi-label prediction
+            preprocess_threads (int): Threads decoding multi-image batches (0 = decode in the caller)
+            quantization (str): Inference mode, 'fp32', 'dynamic' or 'int8' (CPU only)
+            quantized_model_path (str): Calibrated INT8 state for 'int8' mode
+                (defaults to <checkpoint>_int8.pth next to the checkpoint)
+            backend (str): 'torch' (eager PyTorch) or 'onnx' (ONNX Runtime, fp32 only)
+            onnx_model_path (str): Exported graph for the 'onnx' backend
+                (defaults to <checkpoint>.onnx next to the checkpoint)
+            model_name (str): Architecture, one of MODEL_NAMES
+            image_size (int): Model input height/width
         """
+        if model_name not in self.MODEL_NAMES:
+            raise ValueError(f"Unknown model: {model_name}")
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode: {quantization}")
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
+        if backend == 'onnx' and quantization != 'fp32':
+            raise ValueError("The onnx backend does not support quantization modes")
+        if model_name in self.SEGMENTATION_MODELS and (backend != 'torch' or quantization != 'fp32'):
+            print(f"{model_name} only runs on the fp32 torch backend, ignoring "
+                  f"backend={backend} quantization={quantization}")
+            backend, quantization = 'torch', 'fp32'
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.model = None
+        # True when the weights are views into a memory-mapped slim checkpoint
+        self.weights_mapped = False
+        self.model_name = model_name
         self.class_names = {}
+        # Segmentation models also predict background (class ID 0) as output 0
+        self.is_segmentation = model_name in self.SEGMENTATION_MODELS
+        self.num_classes = 104 if self.is_segmentation else 103
+        self.class_offset = 0 if self.is_segmentation else 1
+        self.output_class_names = []
+        self.output_class_mask = None
         self.threshold = threshold
+        self.batcher = None
         
-        # Default paths - using ResNet50 with CBAM Attention (trained on FoodSeg103)
+        # Default paths - using ResNet50 with CBAM Attention (trained on FoodSeg103),
+        # from the slim inference checkpoint when it has been converted
         if model_path is None:
             model_path = Path(__file__).parent / 'models' / 'foodseg103_resnet50_attention.pth'
+            if default_slim_path(model_path).exists():
+                model_path = default_slim_path(model_path)
         if class_names_path is None:
             class_names_path = Path(__file__).parent / 'models' / 'foodseg103_classes.json'
             
+        if quantized_model_path is None:
+            quantized_model_path = Path(model_path).with_name(f"{Path(model_path).stem}_int8.pth")
+            
+        if onnx_model_path is None:
+            onnx_model_path = default_onnx_path(model_path)
+            
         self.model_path = model_path
         self.class_names_path = class_names_path
+        self.quantization = quantization
+        self.quantized_model_path = quantized_model_path
+        self.backend = backend
+        self.onnx_model_path = onnx_model_path
         
-        # Image preprocessing transforms (ImageNet normalization, same as training)
-        self.transform = transforms.Compose([
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], 
-                               std=[0.229, 0.224, 0.225])
-        ])
+        # Image preprocessing (reduced JPEG decode, ImageNet normalization same as training)
+        self.image_size = int(image_size)
+        # Resolution the architecture is built at (SETR: read from the checkpoint when loading)
+        self.model_image_size = self.image_size
+        self.preprocessor = ImagePreprocessor(size=(self.image_size, self.image_size),
+                                              num_threads=preprocess_threads)
         
         self.load_model()
         self.load_class_names()
     
     def load_model(self):
-        """Load the trained ResNet50 with CBAM Attention model from checkpoint."""
+        """Load the trained model (ResNet50 with CBAM Attention by default) from checkpoint."""
+        if self.backend == 'onnx':
+            self.model = load_onnx_model(self.onnx_model_path, num_threads=torch.get_num_threads())
+            if self.model is not None:
+                self.device = torch.device('cpu')
+                return
+            print(f"ONNX model not available at {self.onnx_model_path} "
+                  f"(run `manage.py export_onnx` first), falling back to the torch backend")
+            self.backend = 'torch'
+        
         try:
-            from .foodseg103_model import create_model
-            
-            # Create model architecture (ResNet50 with CBAM Attention)
-            self.model = create_model(
-                model_name='resnet50_attention',
-                num_classes=103,
-                pretrained=False,
-                dropout=0.3  # Same dropout as training
-            )
-            
-            # Load checkpoint with compatibility for PyTorch 2.6 weights_only default
-            print(f"Loading checkpoint from: {self.model_path}")
-            try:
-                checkpoint = torch.load(self.model_path, map_location=self.device)
-            except Exception as e:
-                # If running on PyTorch >= 2.6, weights_only=True can cause failures for legacy checkpoints
-                # Retry with weights_only=False if available
-                try:
-                    checkpoint = torch.load(self.model_path, map_location=self.device, weights_only=False)
-                except TypeError:
-                    # Older torch without weights_only arg, re-raise original
-                    raise e
-                except Exception:
-                    raise
-            
-            # Load model state dict
-            self.model.load_state_dict(checkpoint['model_state_dict'])
+            if is_slim_checkpoint(self.model_path):
+                self._load_slim_checkpoint()
+            else:
+                self._load_training_checkpoint()
             self.model = self.model.to(self.device)
             self.model.eval()
             
-            # Print checkpoint info if available
-            if 'epoch' in checkpoint:
-                print(f"Loaded model trained for {checkpoint['epoch']} epochs")
-            if 'best_mAP' in checkpoint:
-                print(f"Model best mAP: {checkpoint['best_mAP']:.4f}")
+            self._apply_quantization()
             
-            print(f"FoodSeg103 ResNet50+Attention model loaded successfully from {self.model_path}")
+            print(f"FoodSeg103 {self.model_name} model loaded successfully from {self.model_path}")
         except Exception as e:
-            print(f"Error loading ResNet50 Attention model: {e}")
+            print(f"Error loading {self.model_name} model: {e}")
             import traceback
             traceback.print_exc()
             raise
     
-    def load_class_names(self):
-        """Load class names from JSON file."""
+    def _create_model(self, state_dict):
+        from .foodseg103_model import create_model, setr_training_image_size
+        
+        # SETR is built at the resolution its positional embeddings were trained for;
+        # image_size only sets the input size (positional embeddings are interpolated per grid)
+        if self.is_segmentation:
+            self.model_image_size = setr_training_image_size(state_dict)
+        
+        # Create model architecture (ResNet50 with CBAM Attention by default)
+        return create_model(
+            model_name=self.model_name,
+            num_classes=self.num_classes,
+            pretrained=False,
+            dropout=0.3,  # Same dropout as training
+            img_size=self.model_image_size
+        )
+    
+    def _load_training_checkpoint(self):
+        """Load the weights from a training checkpoint (pickle with optimizer state and metadata)."""
+        from .foodseg103_model import convert_mmseg_checkpoint
+        
+        # Load checkpoint with compatibility for PyTorch 2.6 weights_only default
+        print(f"Loading checkpoint from: {self.model_path}")
         try:
-            with open(self.class_names_path, 'r') as f:
-                self.class_names = json.load(f)
-            print(f"Loaded {len(self.class_names)} FoodSeg103 class names")
+            checkpoint = torch.load(self.model_path, map_location=self.device)
         except Exception as e:
-            print(f"Error loading class names: {e}")
-            raise
+            # If running on PyTorch >= 2.6, weights_only=True can cause failures for legacy checkpoints
+            # Retry with weights_only=False if available
+            try:
+                checkpoint = torch.load(self.model_path, map_location=self.device, weights_only=False)
+            except TypeError:
+                # Older torch without weights_only arg, re-raise original
+                raise e
+            except Exception:
+                raise
+        
+        # Load model state dict
+        if self.is_segmentation:
+            state_dict = convert_mmseg_checkpoint(checkpoint)
+            self.model = self._create_model(state_dict)
+            self.model.load_state_dict(state_dict, strict=False)
+        else:
+            state_dict = checkpoint.get('model_state_dict', checkpoint)
+            self.model = self._create_model(state_dict)
+            self.model.load_state_dict(state_dict)
+        
+        # Print checkpoint info if available
+        if 'epoch' in checkpoint:
+            print(f"Loaded model trained for {checkpoint['epoch']} epochs")
+        if 'best_mAP' in checkpoint:
+            print(f"Model best mAP: {checkpoint['best_mAP']:.4f}")
+    
+    def _load_slim_checkpoint(self):
+        """Memory-map an inference checkpoint written by `manage.py convert_checkpoint` (see slim_checkpoint.py)."""
+        print(f"Mapping slim checkpoint from: {self.model_path}")
+        state_dict, metadata = load_slim_checkpoint(self.model_path)
+        if metadata.get('model_name', self.model_name) != self.model_name:
+            raise ValueError(f"{self.model_path} holds a {metadata['model_name']} model, not {self.model_name}")
+        if 'class_names' in metadata:
+            self.class_names = json.loads(metadata['class_names'])
+        
+        if any(t.is_floating_point() and t.dtype != torch.float32 for t in state_dict.values()):
+            # Reduced-precision storage: upcast for the CPU kernels (weights are no longer file-backed)
+            state_dict = {k: v.float() if v.is_floating_point() else v for k, v in state_dict.items()}
+        else:
+            self.weights_mapped = True
+        
+        # Build without allocating weights, then adopt the mapped tensors as parameters and buffers
+        with torch.device('meta'):
+            self.model = self._create_model(state_dict)
+        self.model.load_state_dict(state_dict, assign=True)
+    
+    def _apply_quantization(self):
+        """Replace the float model with its quantized CPU version (see quantization.py)."""
+        if self.quantization == 'fp32':
+            return
+        
+        quantized_state_dict = None
+        if self.quantization == 'int8':
+            if not Path(self.quantized_model_path).exists():
+                print(f"INT8 model not found at {self.quantized_model_path} "
+                      f"(run `manage.py calibrate_foodseg103` first), falling back to fp32")
+                self.quantization = 'fp32'
+                return
+            quantized = torch.load(self.quantized_model_path, map_location='cpu', weights_only=False)
+            quantized_state_dict = quantized['quantized_state_dict']
+        
+        # Quantized kernels run on CPU only
+        self.device = torch.device('cpu')
+        self.model = quantize_model(self.model.cpu(), self.quantization, quantized_state_dict)
+        print(f"FoodSeg103 model quantized ({self.quantization})")
+    
+    def load_class_names(self):
+        """Load class names from JSON file (unless embedded in a slim checkpoint)."""
+        if not self.class_names:
+            try:
+                with open(self.class_names_path, 'r') as f:
+                    self.class_names = json.load(f)
+                print(f"Loaded {len(self.class_names)} FoodSeg103 class names")
+            except Exception as e:
+                print(f"Error loading class names: {e}")
+                raise
+        
+        # Names aligned with model output indices (output idx -> class ID idx + class_offset, 0 is background)
+        self.output_class_names = [
+            self.class_names.get(str(idx + self.class_offset), f"class_{idx + self.class_offset}")
+            for idx in range(self.num_classes)
+        ]
+        self.output_class_mask = torch.tensor(
+            [name != "background" for name in self.output_class_names], dtype=torch.bool
+        )
     
     def preprocess_image(self, image):
         """
         Preprocess image for model input.
         
         Args:
-            image: PIL Image or image path
+            image: PIL Image, image path, or file-like object
             
         Returns:
-            torch.Tensor: Preprocessed image tensor
+            torch.Tensor: Preprocessed image tensor [1, 3, image_size, image_size]
         """
-        if isinstance(image, str):
-            image = Image.open(image).convert('RGB')
-        elif hasattr(image, 'read'):
-            # Handle file-like objects
-            image = Image.open(image).convert('RGB')
+        return self.preprocess_images([image])
+    
+    def preprocess_images(self, images):
+        """
+        Decode and normalise several images into one batch tensor.
         
-        return self.transform(image).unsqueeze(0).to(self.device)
+        Args:
+            images (list): PIL Images, image paths, or file-like objects
+            
+        Returns:
+            torch.Tensor: Preprocessed batch [len(images), 3, image_size, image_size]
+        """
+        return self.preprocessor(images).to(self.device)
+    
+    def enable_batching(self, max_batch_size=8, max_wait_ms=10.0):
+        """
+        Route single-image predictions through a micro-batching engine.
+        
+        Args:
+            max_batch_size (int): Maximum number of requests merged into one forward pass
+            max_wait_ms (float): Maximum time the first queued request waits for others
+        """
+        self.batcher = MicroBatcher(self.predict_probabilities, max_batch_size, max_wait_ms)
+        print(f"FoodSeg103 micro-batching enabled (max_batch_size={max_batch_size}, max_wait_ms={max_wait_ms})")
+    
+    def warmup(self, iterations=2, batch_size=1):
+        """
+        Run forward passes on synthetic inputs so the first real request
+        does not pay for cold kernels and lazy allocations.
+        
+        Args:
+            iterations (int): Number of warmup forward passes
+            batch_size (int): Batch size of the synthetic input
+        """
+        if self.model is None:
+            raise ValueError("Model not loaded")
+        dummy = torch.zeros(batch_size, 3, self.image_size, self.image_size)
+        for _ in range(iterations):
+            self.predict_probabilities(dummy)
     
-    def predict(self, image, threshold=None):
+    def share_weights(self):
+        """
+        Pack the torch weights into contiguous per-dtype blocks, so processes forked
+        after loading share them copy-on-write (see worker_memory.py).
+        
+        Returns:
+            int: Bytes packed (0 for the ONNX backend, whose session is rebuilt per process)
+        """
+        if self.backend != 'torch' or self.weights_mapped:
+            # Mapped weights are already shared through the page cache
+            return 0
+        return consolidate_weights(self.model)
+    
+    def after_fork(self):
+        """
+        Recreate per-process resources in a forked worker: decode threads, the
+        micro-batching worker and the ONNX Runtime session. Torch weights stay shared.
+        """
+        self.preprocessor.after_fork()
+        if self.batcher is not None:
+            self.enable_batching(self.batcher.max_batch_size, self.batcher.max_wait_ms)
+        if self.backend == 'onnx':
+            self.model = load_onnx_model(self.onnx_model_path, num_threads=torch.get_num_threads())
+    
+    def close(self):
+        """Release background resources (micro-batching worker, decode threads)."""
+        if self.batcher is not None:
+            self.batcher.close()
+        self.preprocessor.close()
+    
+    def memory_bytes(self):
+        """Approximate resident size of the model weights."""
+        if self.backend == 'onnx':
+            return Path(self.onnx_model_path).stat().st_size
+        
+        def nbytes(value):
+            if isinstance(value, torch.Tensor):
+                return value.numel() * value.element_size()
+            if isinstance(value, (tuple, list)):
+                # Packed quantized weights are stored as (weight, bias) tuples
+                return sum(nbytes(v) for v in value)
+            return 0
+        
+        return sum(nbytes(v) for v in self.model.state_dict().values())
+    
+    def batching_stats(self):
+        """Return micro-batching metrics, or None when batching is disabled."""
+        return self.batcher.stats() if self.batcher is not None else None
+    
+    def predict_probabilities(self, input_tensor):
+        """
+        Run the model on a preprocessed batch.
+        
+        Args:
+            input_tensor (torch.Tensor): Images [batch_size, 3, H, W]
+            
+        Returns:
+            torch.Tensor: Sigmoid probabilities [batch_size, num_classes] on CPU
+        """
+        if self.backend == 'onnx':
+            return torch.sigmoid(torch.from_numpy(self.model(input_tensor.cpu().numpy())))
+        with torch.no_grad():
+            if self.is_segmentation:
+                # Area share of each class, aggregated at decoder resolution
+                return self.model.predict_multilabel(input_tensor.to(self.device)).cpu()
+            outputs = self.model(input_tensor.to(self.device))
+            return torch.sigmoid(outputs).cpu()
+    
+    def predictions_from_probabilities(self, probabilities, threshold=None, top_k=None):
+        """
+        Convert a batch of class probabilities to sorted prediction lists.
+        
+        Thresholding, background masking and sorting are done with tensor ops;
+        only the selected entries are converted to Python objects.
+        
+        Args:
+            probabilities (torch.Tensor): Probabilities [batch_size, num_classes]
+            threshold (float): Classification threshold (uses instance threshold if None)
+            top_k (int): Keep at most this many predictions per image (all if None)
+            
+        Returns:
+            list: One list of {'name', 'confidence'} dicts per image, highest confidence first
+        """
+        if threshold is None:
+            threshold = self.threshold
+        
+        # Background (and any non-food output) can never pass the threshold
+        probabilities = probabilities.masked_fill(~self.output_class_mask, float('-inf'))
+        
+        k = int((probabilities >= threshold).sum(dim=1).max().item()) if probabilities.numel() else 0
+        if top_k is not None:
+            k = min(k, top_k)
+        if k == 0:
+            return [[] for _ in range(probabilities.shape[0])]
+        
+        values, indices = probabilities.topk(k, dim=1)
+        keep = (values >= threshold).tolist()
+        values = values.tolist()
+        indices = indices.tolist()
+        names = self.output_class_names
+        
+        return [
+            [
+                {'name': names[idx], 'confidence': prob}
+                for prob, idx, ok in zip(row_values, row_indices, row_keep) if ok
+            ]
+            for row_values, row_indices, row_keep in zip(values, indices, keep)
+        ]
+    
+    def _probabilities_to_predictions(self, probabilities, threshold, top_k=None):
+        """Convert one row of class probabilities to sorted prediction dicts."""
+        return self.predictions_from_probabilities(probabilities.unsqueeze(0), threshold, top_k)[0]
+    
+    def predict(self, image, threshold=None, top_k=None):
         """
         Predict food classes for given image (multi-label).
         
         Args:
             image: PIL Image, image path, or file-like object
             threshold (float): Classification threshold (uses instance threshold if None)
+            top_k (int): Keep at most this many predictions (all if None)
             
         Returns:
             list: List of dicts with 'name' and 'confidence' for detected foods
@@ -269,31 +568,34 @@ class FoodSeg103Classifier:
         # Preprocess image
         input_tensor = self.preprocess_image(image)
         
-        # Make prediction
-        with torch.no_grad():
-            outputs = self.model(input_tensor)
-            probabilities = torch.sigmoid(outputs).cpu().squeeze(0)
+        # Make prediction (merged with concurrent requests when batching is enabled)
+        if self.batcher is not None:
+            probabilities = self.batcher.submit(input_tensor.squeeze(0).cpu()).result()
+        else:
+            probabilities = self.predict_probabilities(input_tensor).squeeze(0)
         
-        # Get predictions above threshold
-        predictions = []
-        for idx in range(len(probabilities)):
-            prob = probabilities[idx].item()
-            if prob >= threshold:
-                class_id = str(idx + 1)  # Class IDs start at 1 (0 is background)
-                class_name = self.class_names.get(class_id, f"class_{class_id}")
-                
-                # Skip background class
-                if class_name != "background":
-                    predictions.append({
-                        'name': class_name,
-                        'confidence': prob
-                    })
-        
-        
-        # Sort by confidence (highest first)
-        predictions.sort(key=lambda x: x['confidence'], reverse=True)
+        return self._probabilities_to_predictions(probabilities, threshold, top_k)
+    
+    def predict_batch(self, images, threshold=None, top_k=None):
+        """
+        Predict food classes for several images in one forward pass.
         
-        return predictions
+        Args:
+            images (list): PIL Images, image paths, or file-like objects
+            threshold (float): Classification threshold (uses instance threshold if None)
+            top_k (int): Keep at most this many predictions per image (all if None)
+            
+        Returns:
+            list: One list of {'name', 'confidence'} dicts per image
+        """
+        if self.model is None:
+            raise ValueError("Model not loaded")
+        if not images:
+            return []
+        
+        # Already a batch, so the micro-batcher is bypassed
+        probabilities = self.predict_probabilities(self.preprocess_images(images))
+        return self.predictions_from_probabilities(probabilities, threshold, top_k)
     
     def get_top_predictions(self, image, top_k=5, threshold=None):
         """
@@ -307,13 +609,12 @@ class FoodSeg103Classifier:
         Returns:
             list: List of top k predictions
         """
-        predictions = self.predict(image, threshold)
-        return predictions[:top_k]
+        return self.predict(image, threshold, top_k=top_k)
 
 
 # Global classifier instances
 _classifier_instance = None
-_foodseg103_classifier_instance = None
+_foodseg103_manager = None
 
 
 def get_classifier():
@@ -329,14 +630,76 @@ def get_classifier():
     return _classifier_instance
 
 
+def _build_foodseg103_classifier(model_path=None, **options):
+    """
+    Create a FoodSeg103 classifier configured from settings.
+    
+    Keyword options (FoodSeg103Classifier arguments, e.g. from a FOODSEG_MODELS entry)
+    override the settings.
+    """
+    kwargs = {
+        'preprocess_threads': int(_get_setting('FOODSEG_PREPROCESS_THREADS', 0)),
+        'quantization': _get_setting('FOODSEG_QUANTIZATION', 'fp32'),
+        'quantized_model_path': _get_setting('FOODSEG_INT8_MODEL_PATH') or None,
+        'backend': _get_setting('FOODSEG_BACKEND', 'torch'),
+        'onnx_model_path': _get_setting('FOODSEG_ONNX_MODEL_PATH') or None,
+    }
+    kwargs.update(options)
+    if model_path is not None:
+        kwargs['model_path'] = model_path
+    instance = FoodSeg103Classifier(**kwargs)
+    if str(_get_setting('FOODSEG_BATCHING_ENABLED', 'false')).lower() in ('1', 'true', 'yes'):
+        instance.enable_batching(
+            max_batch_size=int(_get_setting('FOODSEG_BATCH_MAX_SIZE', 8)),
+            max_wait_ms=float(_get_setting('FOODSEG_BATCH_MAX_WAIT_MS', 10))
+        )
+    return instance
+
+
+def _warmup_foodseg103_classifier(instance):
+    iterations = int(_get_setting('FOODSEG_WARMUP_ITERATIONS', 2))
+    if iterations > 0:
+        instance.warmup(iterations=iterations)
+
+
+def _reload_marker_path(name):
+    """Reload marker file shared by the worker processes serving a model (see ModelManager)."""
+    directory = _get_setting('FOODSEG_RELOAD_MARKER_DIR') or (Path(__file__).parent / 'models')
+    return Path(directory) / f".reload-{name}.json"
+
+
+def _manager_options(name):
+    return {
+        'marker_path': _reload_marker_path(name),
+        'marker_check_interval': float(_get_setting('FOODSEG_RELOAD_CHECK_INTERVAL', 1.0)),
+    }
+
+
+def get_foodseg103_manager():
+    """
+    Get the global lifecycle manager of the FoodSeg103 classifier.
+    
+    Returns:
+        ModelManager: Manager handling lazy load, warmup and hot reload
+    """
+    global _foodseg103_manager
+    if _foodseg103_manager is None:
+        _foodseg103_manager = ModelManager(
+            'foodseg103_resnet50_attention',
+            _build_foodseg103_classifier,
+            warmup=_warmup_foodseg103_classifier,
+            **_manager_options('foodseg103_resnet50_attention')
+        )
+    return _foodseg103_manager
+
+
 def get_foodseg103_classifier():
     """
     Get or create a global FoodSeg103 classifier instance.
     
+    The model is loaded (and warmed up) on first use.
+    
     Returns:
         FoodSeg103Classifier: Global FoodSeg103 classifier instance
     """
-    global _foodseg103_classifier_instance
-    if _foodseg103_classifier_instance is None:
-        _foodseg103_classifier_instance = FoodSeg103Classifier()
-    return _foodseg103_classifier_instance 
\ No newline at end of file
+    return get_foodseg103_manager().get()
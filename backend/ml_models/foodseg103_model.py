@@ -2,11 +2,13 @@
 """
 Multi-label food classification models including SETR-MLA for semantic segmentation.
 """
+import math
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from torchvision import models
 import timm
+from timm.layers import resample_abs_pos_embed
 from collections import OrderedDict
 
 
@@ -335,6 +337,51 @@ class MLAHead(nn.Module):
         return x
 
 
+def bipartite_soft_matching(metric, num_merge):
+    """
+    Token merging (ToMe) by bipartite soft matching.
+    
+    Tokens are split alternately into sets A and B; the num_merge A tokens most
+    similar to their best B match are averaged into it. Returns merge(x), which
+    shortens [batch, N, C] to [batch, N - num_merge, C], and unmerge(y), which
+    copies outputs back to all N positions (merged tokens share their match's output).
+    
+    Args:
+        metric: Token features used for similarity [batch, N, C]
+        num_merge: Number of tokens to remove (at most N // 2)
+    """
+    batch, num_tokens, _ = metric.shape
+    with torch.no_grad():
+        metric = metric / metric.norm(dim=-1, keepdim=True)
+        scores = metric[:, ::2] @ metric[:, 1::2].transpose(1, 2)
+        node_max, node_idx = scores.max(dim=-1)
+        edge_idx = node_max.argsort(dim=-1, descending=True)[..., None]
+        unm_idx = edge_idx[:, num_merge:]  # A tokens kept
+        src_idx = edge_idx[:, :num_merge]  # A tokens merged into B
+        dst_idx = node_idx[..., None].gather(dim=1, index=src_idx)
+    
+    def merge(x):
+        src, dst = x[:, ::2], x[:, 1::2]
+        channels = x.shape[-1]
+        unm = src.gather(dim=1, index=unm_idx.expand(-1, -1, channels))
+        src = src.gather(dim=1, index=src_idx.expand(-1, -1, channels))
+        dst = dst.scatter_reduce(1, dst_idx.expand(-1, -1, channels), src, reduce='mean')
+        return torch.cat([unm, dst], dim=1)
+    
+    def unmerge(x):
+        num_unm = unm_idx.shape[1]
+        unm, dst = x[:, :num_unm], x[:, num_unm:]
+        channels = x.shape[-1]
+        out = x.new_empty(batch, num_tokens, channels)
+        out[:, 1::2] = dst
+        out.scatter_(1, (2 * unm_idx).expand(-1, -1, channels), unm)
+        out.scatter_(1, (2 * src_idx).expand(-1, -1, channels),
+                     dst.gather(dim=1, index=dst_idx.expand(-1, -1, channels)))
+        return out
+    
+    return merge, unmerge
+
+
 class VIT_MLA(nn.Module):
     """Vision Transformer with Multi-Level Aggregation backbone for SETR."""
     
@@ -346,10 +393,25 @@ class VIT_MLA(nn.Module):
         # Load pretrained ViT
         self.vit = timm.create_model(model_name, pretrained=False, img_size=img_size, 
                                      num_classes=0)  # Remove classification head
+        # Accept any input size; sides that are not a multiple of the patch size are padded
+        self.vit.patch_embed.strict_img_size = False
+        self.vit.patch_embed.dynamic_img_pad = True
         
         self.img_size = img_size
         self.embed_dim = embed_dim
         self.mla_index = mla_index
+        self.patch_size = self.vit.patch_embed.patch_size[0]
+        # Positional embeddings resized per (rows, cols) patch grid, reused across inference calls
+        self._pos_embed_cache = {}
+        
+        # Fused scaled-dot-product attention kernels (timm may default to the unfused path)
+        for blk in self.vit.blocks:
+            if hasattr(blk.attn, 'fused_attn'):
+                blk.attn.fused_attn = True
+        
+        # Optional token merging in the first blocks (inference only, see set_token_merging)
+        self.token_merge_ratio = 0.0
+        self.token_merge_depth = min(mla_index)
         
         # MLA projection layers - two-stage: 1x1 reduction then 3x3 conv
         # Stage 1: 1x1 convolution to reduce dimension from embed_dim to mla_channels
@@ -396,54 +458,116 @@ class VIT_MLA(nn.Module):
             nn.ReLU()
         )
     
+    def interpolate_pos_embed(self, grid_size):
+        """
+        Positional embeddings for a (rows, cols) patch grid.
+        
+        The pretrained grid is resized with 2D bicubic interpolation; the class
+        token embedding is kept as-is.
+        
+        Returns:
+            torch.Tensor: [1, num_prefix_tokens + rows * cols, embed_dim]
+        """
+        num_prefix = 0 if self.vit.no_embed_class else self.vit.num_prefix_tokens
+        return resample_abs_pos_embed(
+            self.vit.pos_embed,
+            new_size=list(grid_size),
+            old_size=list(self.vit.patch_embed.grid_size),
+            num_prefix_tokens=num_prefix,
+            interpolation='bicubic',
+            antialias=True,
+        )
+    
+    def _pos_embed(self, grid_size):
+        if torch.is_grad_enabled():
+            # Training: keep the interpolation in the autograd graph
+            return self.interpolate_pos_embed(grid_size)
+        pos_embed = self.vit.pos_embed
+        # Loading weights or moving the model invalidates cached entries
+        version = (pos_embed.data_ptr(), pos_embed._version, pos_embed.dtype)
+        cached = self._pos_embed_cache.get(grid_size)
+        if cached is None or cached[0] != version:
+            cached = (version, self.interpolate_pos_embed(grid_size))
+            self._pos_embed_cache[grid_size] = cached
+        return cached[1]
+    
+    def set_token_merging(self, ratio=0.0, depth=None):
+        """
+        Merge redundant (e.g. background) patch tokens in the first blocks at inference.
+        
+        Each affected block attends over and runs its MLP on the merged tokens, and
+        the outputs are copied back to every patch, so the MLA feature maps keep
+        their full grid.
+        
+        Args:
+            ratio: Fraction of patch tokens merged per block (0 disables, at most 0.5)
+            depth: Number of leading blocks that merge (default: up to the first MLA level)
+        """
+        self.token_merge_ratio = min(max(float(ratio), 0.0), 0.5)
+        self.token_merge_depth = min(self.mla_index) if depth is None else int(depth)
+    
+    def _merged_block(self, blk, x, num_merge):
+        """timm Block forward with ToMe merge/unmerge around attention and MLP."""
+        prefix = self.vit.num_prefix_tokens
+        merge, unmerge = bipartite_soft_matching(x[:, prefix:], num_merge)
+        
+        h = blk.norm1(x)
+        h = torch.cat([h[:, :prefix], merge(h[:, prefix:])], dim=1)
+        h = blk.attn(h)
+        x = x + blk.drop_path1(blk.ls1(torch.cat([h[:, :prefix], unmerge(h[:, prefix:])], dim=1)))
+        
+        h = blk.norm2(x)
+        h = torch.cat([h[:, :prefix], merge(h[:, prefix:])], dim=1)
+        h = blk.mlp(h)
+        return x + blk.drop_path2(blk.ls2(torch.cat([h[:, :prefix], unmerge(h[:, prefix:])], dim=1)))
+    
     def forward(self, x):
         # Get multi-level features from ViT
-        B = x.shape[0]
-        H, W = self.img_size // 16, self.img_size // 16  # patch size = 16
+        B, _, height, width = x.shape
+        H = -(-height // self.patch_size)  # patch grid rows (input padded up to whole patches)
+        W = -(-width // self.patch_size)
         
         # Patch embedding
         x = self.vit.patch_embed(x)
         
-        # Add position embedding (handle size mismatch by interpolation if needed)
-        if x.shape[1] != self.vit.pos_embed.shape[1]:
-            # Interpolate position embedding to match input size
-            pos_embed = self.vit.pos_embed
-            # Note: pos_embed has shape [1, num_patches + 1, embed_dim]
-            # We need to resize it to match x which has shape [B, num_patches, embed_dim]
-            # For now, we'll slice it to the right size
-            if x.shape[1] < pos_embed.shape[1]:
-                pos_embed = pos_embed[:, :x.shape[1], :]
-            else:
-                # Pad if needed (unlikely for our case)
-                pos_embed = F.pad(pos_embed, (0, 0, 0, x.shape[1] - pos_embed.shape[1]))
+        # Class token + positional embeddings interpolated to this grid
+        pos_embed = self._pos_embed((H, W))
+        if self.vit.cls_token is not None:
+            x = torch.cat([self.vit.cls_token.expand(B, -1, -1), x], dim=1)
+        if self.vit.no_embed_class:
+            x = torch.cat([x[:, :self.vit.num_prefix_tokens], x[:, self.vit.num_prefix_tokens:] + pos_embed], dim=1)
         else:
-            pos_embed = self.vit.pos_embed
-        
-        x = self.vit.pos_drop(x + pos_embed)
-        
-        # Forward through ViT blocks and collect intermediate features
-        features = []
+            x = x + pos_embed
+        x = self.vit.pos_drop(x)
+        
+        # Forward through ViT blocks; each MLA level is projected (1x1 then 3x3) as soon
+        # as its block has run, so only the reduced mla_channels maps are kept alive
+        projections = [
+            (self.mla_p2_1x1, self.mla_p2), (self.mla_p3_1x1, self.mla_p3),
+            (self.mla_p4_1x1, self.mla_p4), (self.mla_p5_1x1, self.mla_p5),
+        ]
+        num_merge = 0
+        if self.token_merge_ratio > 0 and not self.training:
+            num_merge = int(H * W * self.token_merge_ratio)
+        
+        mla_outputs = [None] * len(self.mla_index)
+        last_index = max(self.mla_index)
         for i, blk in enumerate(self.vit.blocks):
-            x = blk(x)
+            if num_merge and i < self.token_merge_depth:
+                x = self._merged_block(blk, x, num_merge)
+            else:
+                x = blk(x)
             if i in self.mla_index:
-                features.append(x)
-        
-        # Reshape features to 2D (remove cls token if present)
-        mla_features = []
-        for feat in features:
-            # Check if cls token is present
-            if feat.shape[1] == H * W + 1:
-                feat = feat[:, 1:, :]  # Remove cls token
-            feat = feat.permute(0, 2, 1).reshape(B, self.embed_dim, H, W)
-            mla_features.append(feat)
-        
-        # Apply MLA projections (two stages: 1x1 then 3x3)
-        mla_p2 = self.mla_p2(self.mla_p2_1x1(mla_features[0]))
-        mla_p3 = self.mla_p3(self.mla_p3_1x1(mla_features[1]))
-        mla_p4 = self.mla_p4(self.mla_p4_1x1(mla_features[2]))
-        mla_p5 = self.mla_p5(self.mla_p5_1x1(mla_features[3]))
-        
-        return mla_p2, mla_p3, mla_p4, mla_p5
+                level = self.mla_index.index(i)
+                # Reshape to 2D (remove the class token)
+                feat = x[:, self.vit.num_prefix_tokens:, :].transpose(1, 2).reshape(B, self.embed_dim, H, W)
+                reduce, refine = projections[level]
+                mla_outputs[level] = refine(reduce(feat))
+                del feat
+            if i == last_index:
+                break  # later blocks do not feed any MLA level
+        
+        return tuple(mla_outputs)
 
 
 class SETR_MLA(nn.Module):
@@ -458,7 +582,8 @@ class SETR_MLA(nn.Module):
         """
         Args:
             num_classes: Number of output classes (104 for FoodSeg103)
-            img_size: Input image size
+            img_size: Training input size; other sizes and aspect ratios work through
+                interpolated positional embeddings (e.g. 384 or 512 for faster CPU inference)
             embed_dim: ViT embedding dimension
             depth: Number of transformer blocks
             num_heads: Number of attention heads
@@ -488,21 +613,33 @@ class SETR_MLA(nn.Module):
         self.num_classes = num_classes
         self.img_size = img_size
     
-    def forward(self, x):
+    def decode_logits(self, x):
         """
-        Forward pass for segmentation.
+        Segmentation logits at decoder resolution (one cell per 16x16 patch).
         
         Args:
             x: Input images [batch_size, 3, H, W]
             
         Returns:
-            Segmentation logits [batch_size, num_classes, H, W]
+            Segmentation logits [batch_size, num_classes, ceil(H/16), ceil(W/16)]
         """
         # Get multi-level features
         mla_p2, mla_p3, mla_p4, mla_p5 = self.backbone(x)
         
         # Decode to segmentation map
-        seg_logits = self.decode_head(mla_p2, mla_p3, mla_p4, mla_p5)
+        return self.decode_head(mla_p2, mla_p3, mla_p4, mla_p5)
+    
+    def forward(self, x):
+        """
+        Forward pass for segmentation.
+        
+        Args:
+            x: Input images [batch_size, 3, H, W]
+            
+        Returns:
+            Segmentation logits [batch_size, num_classes, H, W]
+        """
+        seg_logits = self.decode_logits(x)
         
         # Upsample to input size
         seg_logits = F.interpolate(seg_logits, size=(x.shape[2], x.shape[3]), 
@@ -510,30 +647,45 @@ class SETR_MLA(nn.Module):
         
         return seg_logits
     
+    def _cell_areas(self, image_size, grid_size, device, dtype):
+        """Number of input pixels covered by each decoder cell [rows, cols] (edge cells may be partial)."""
+        stride = self.backbone.patch_size
+        rows = (image_size[0] - torch.arange(grid_size[0], device=device) * stride).clamp(0, stride)
+        cols = (image_size[1] - torch.arange(grid_size[1], device=device) * stride).clamp(0, stride)
+        return torch.outer(rows, cols).to(dtype)
+    
     def predict_multilabel(self, x, threshold=0.5):
         """
         Predict multi-label classification from segmentation output.
         
+        Class probabilities are aggregated at decoder resolution, weighting each
+        cell by the input area it covers, so no full-resolution map is built.
+        Use forward() or predict_segmentation() when masks are needed.
+        
         Args:
             x: Input images [batch_size, 3, H, W]
-            threshold: Threshold for class presence
+            threshold: Threshold for class presence (kept for API compatibility)
             
         Returns:
-            Multi-label predictions [batch_size, num_classes]
+            Class probabilities [batch_size, num_classes] (mean per-pixel class share)
         """
-        seg_logits = self.forward(x)
+        seg_probs = F.softmax(self.decode_logits(x), dim=1)
         
-        # Apply softmax across classes for each pixel
-        seg_probs = F.softmax(seg_logits, dim=1)
-        
-        # Global average pooling to get class-level predictions
-        # Average across spatial dimensions
-        class_probs = seg_probs.mean(dim=[2, 3])
-        
-        # Apply threshold
-        predictions = (class_probs >= threshold).float()
+        # Area-weighted average over spatial cells
+        areas = self._cell_areas(x.shape[-2:], seg_probs.shape[-2:], seg_probs.device, seg_probs.dtype)
+        return (seg_probs * areas).sum(dim=(2, 3)) / areas.sum()
+    
+    def predict_segmentation(self, x):
+        """
+        Full-resolution class masks.
         
-        return class_probs  # Return probabilities for multi-label classification
+        Args:
+            x: Input images [batch_size, 3, H, W]
+            
+        Returns:
+            Class index per pixel [batch_size, H, W]
+        """
+        return self.forward(x).argmax(dim=1)
 
 
 def convert_mmseg_checkpoint(checkpoint):
@@ -600,6 +752,27 @@ def convert_mmseg_checkpoint(checkpoint):
     return new_state_dict
 
 
+def setr_training_image_size(state_dict, patch_size=16, default=768):
+    """
+    Input size a SETR state dict was trained at, read from its positional embedding grid.
+
+    Args:
+        state_dict: SETR_MLA state dict (after convert_mmseg_checkpoint)
+        patch_size: ViT patch size
+        default: Returned when the state dict has no square positional embedding grid
+
+    Returns:
+        Side length in pixels (e.g. 768 for a [1, 2305, 768] pos_embed)
+    """
+    pos_embed = state_dict.get('backbone.vit.pos_embed')
+    if pos_embed is None:
+        return default
+    # One class token in front of the patch tokens
+    tokens = pos_embed.shape[1] - 1
+    side = math.isqrt(tokens)
+    return side * patch_size if side * side == tokens else default
+
+
 def create_model(model_name='resnet50', num_classes=103, pretrained=True, dropout=0.5, **kwargs):
     """
     Factory function to create models.
@@ -609,7 +782,7 @@ def create_model(model_name='resnet50', num_classes=103, pretrained=True, dropou
         num_classes: Number of output classes
         pretrained: If True, use pretrained weights
         dropout: Dropout probability
-        **kwargs: Additional arguments for specific models (e.g., img_size for SETR)
+        **kwargs: Additional arguments for specific models (e.g., img_size, token_merge_ratio for SETR)
         
     Returns:
         Model instance
@@ -625,7 +798,9 @@ def create_model(model_name='resnet50', num_classes=103, pretrained=True, dropou
     elif model_name.lower() == 'setr_mla':
         # SETR uses 104 classes (103 food + 1 background)
         img_size = kwargs.get('img_size', 768)
-        return SETR_MLA(num_classes=num_classes, img_size=img_size)
+        model = SETR_MLA(num_classes=num_classes, img_size=img_size)
+        model.backbone.set_token_merging(kwargs.get('token_merge_ratio', 0.0))
+        return model
     else:
         raise ValueError(f"Unknown model: {model_name}")
 
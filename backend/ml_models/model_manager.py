@@ -0,0 +1,240 @@
+"""
+Model lifecycle management: lazy loading, warmup, readiness and hot reload.
+
+A reload request reaches a single worker process. With a reload marker file
+(shared by the workers of one host), that worker records the reload there and
+every other worker notices the change on its next get() and swaps in the same
+checkpoint in the background; workers started later load it directly.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+STATE_NOT_LOADED = 'not_loaded'
+STATE_LOADING = 'loading'
+STATE_READY = 'ready'
+STATE_FAILED = 'failed'
+
+
+class ModelManager:
+    """
+    Owns a single model instance and its lifecycle.
+
+    The model is built on first use (or on an explicit ``preload``), warmed up
+    with synthetic inputs before it is published, and can be replaced by a new
+    checkpoint with ``reload``. The swap is a single reference assignment, so
+    in-flight requests finish on the old instance while new ones use the new one.
+    """
+
+    def __init__(self, name: str, factory: Callable[..., Any],
+                 warmup: Optional[Callable[[Any], None]] = None,
+                 marker_path=None, marker_check_interval: float = 1.0):
+        """
+        Args:
+            name: Human-readable model name used in status reports
+            factory: Callable building a model instance; accepts an optional model_path
+            warmup: Optional callable run on a freshly built instance before publishing it
+            marker_path: Reload marker file shared with the other worker processes (None = this process only)
+            marker_check_interval: Minimum seconds between two checks of the marker file
+        """
+        self.name = name
+        self.factory = factory
+        self.warmup = warmup
+        self.marker_path = Path(marker_path) if marker_path else None
+        self.marker_check_interval = float(marker_check_interval)
+
+        # Marker version of the published instance, and the last version a reload was started for
+        self._version: Optional[str] = None
+        self._seen_version: Optional[str] = None
+        self._next_marker_check = 0.0
+
+        self._instance = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._status: Dict[str, Any] = {
+            'state': STATE_NOT_LOADED,
+            'model_path': None,
+            'loaded_at': None,
+            'load_seconds': None,
+            'warmup_seconds': None,
+            'reloads': 0,
+            'error': None,
+        }
+
+    def _read_marker(self) -> Optional[Dict[str, Any]]:
+        if self.marker_path is None:
+            return None
+        try:
+            with open(self.marker_path) as f:
+                marker = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Cannot read reload marker %s: %s", self.marker_path, e)
+            return None
+        model_path = marker.get('model_path')
+        if model_path and not Path(model_path).is_file():
+            logger.warning("Reload marker %s points at a missing checkpoint %s, ignored",
+                           self.marker_path, model_path)
+            return None
+        return marker
+
+    def _write_marker(self, model_path) -> str:
+        """Record a reload for the other workers (if a marker file is configured); returns the new version."""
+        version = uuid.uuid4().hex
+        if self.marker_path is None:
+            return version
+        marker = {'version': version, 'model_path': str(model_path) if model_path else None,
+                  'reloaded_at': time.time()}
+        tmp_path = self.marker_path.with_name(f".{self.marker_path.name}.{os.getpid()}.tmp")
+        try:
+            self.marker_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(marker, f)
+            os.replace(tmp_path, self.marker_path)
+        except OSError as e:
+            logger.warning("Cannot write reload marker %s, other workers keep their model: %s",
+                           self.marker_path, e)
+        return version
+
+    def _check_marker(self):
+        """Start a background reload when another worker recorded a newer reload."""
+        if self.marker_path is None:
+            return
+        now = time.monotonic()
+        if now < self._next_marker_check:
+            return
+        self._next_marker_check = now + self.marker_check_interval
+        marker = self._read_marker()
+        if marker is None or marker.get('version') in (self._version, self._seen_version):
+            return
+        # Reload at most once per version, even if it fails
+        self._seen_version = marker.get('version')
+        threading.Thread(target=self._follow_marker, args=(marker,),
+                         name=f"{self.name}-reload", daemon=True).start()
+
+    def _follow_marker(self, marker: Dict[str, Any]):
+        try:
+            self.reload(marker.get('model_path'), marker_version=marker.get('version'))
+        except Exception as e:
+            logger.error("Reload of %s requested by another worker failed: %s", self.name, e)
+
+    def _build(self, model_path=None):
+        started = time.perf_counter()
+        instance = self.factory(model_path) if model_path else self.factory()
+        loaded = time.perf_counter()
+        if self.warmup is not None:
+            self.warmup(instance)
+        warmed = time.perf_counter()
+        return instance, loaded - started, warmed - loaded
+
+    def _publish(self, instance, load_seconds, warmup_seconds):
+        self._instance = instance
+        self._status.update({
+            'state': STATE_READY,
+            'model_path': str(getattr(instance, 'model_path', '') or '') or None,
+            'loaded_at': time.time(),
+            'load_seconds': round(load_seconds, 3),
+            'warmup_seconds': round(warmup_seconds, 3),
+            'error': None,
+        })
+
+    def get(self):
+        """Return the model instance, loading it on first use."""
+        instance = self._instance
+        if instance is not None:
+            self._check_marker()
+            return instance
+        with self._lock:
+            if self._instance is None:
+                self._status['state'] = STATE_LOADING
+                # Start on the checkpoint of the last reload, if any worker made one
+                marker = self._read_marker() or {}
+                try:
+                    self._publish(*self._build(marker.get('model_path')))
+                    self._version = self._seen_version = marker.get('version')
+                except Exception as e:
+                    self._status.update({'state': STATE_FAILED, 'error': str(e)})
+                    raise
+            return self._instance
+
+    def preload(self):
+        """Load and warm up the model now instead of on the first request."""
+        return self.get()
+
+    def current(self):
+        """Return the loaded instance without triggering a load (None if not loaded)."""
+        return self._instance
+
+    def is_ready(self) -> bool:
+        return self._instance is not None
+
+    def version(self) -> Optional[str]:
+        """Reload version of the published instance, shared by all workers (None before any reload)."""
+        return self._version
+
+    def reload(self, model_path=None, marker_version: Optional[str] = None):
+        """
+        Build and warm up a new instance, then swap it in atomically.
+
+        The current instance keeps serving until the new one is ready; if the
+        new checkpoint fails to load, the current instance stays in place.
+        After a successful reload the marker file (if any) is updated so the
+        other workers reload the same checkpoint.
+
+        Args:
+            model_path: Checkpoint to load (None = the factory default)
+            marker_version: Version of another worker's marker being followed (the marker is not rewritten)
+        """
+        with self._reload_lock:
+            previous_state = self._status['state']
+            if self._instance is None:
+                self._status['state'] = STATE_LOADING
+            try:
+                instance, load_seconds, warmup_seconds = self._build(model_path)
+            except Exception as e:
+                self._status['state'] = previous_state if self._instance is not None else STATE_FAILED
+                self._status['error'] = str(e)
+                raise
+            version = marker_version if marker_version is not None else self._write_marker(model_path)
+            with self._lock:
+                previous = self._instance
+                self._publish(instance, load_seconds, warmup_seconds)
+                self._status['reloads'] += 1
+                self._version = self._seen_version = version
+            close = getattr(previous, 'close', None)
+            if close is not None:
+                close()
+            return instance
+
+    def unload(self) -> bool:
+        """
+        Drop the loaded instance so its memory can be reclaimed; the next
+        get() loads it again. Requests already holding the instance finish on it.
+
+        Returns:
+            True if an instance was unloaded
+        """
+        with self._reload_lock, self._lock:
+            previous = self._instance
+            if previous is None:
+                return False
+            self._instance = None
+            self._status.update({'state': STATE_NOT_LOADED, 'loaded_at': None})
+        close = getattr(previous, 'close', None)
+        if close is not None:
+            close()
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        """Load state, load/warmup timings and last error."""
+        return {'name': self.name, **self._status, 'version': self._version}
@@ -0,0 +1,221 @@
+"""
+Registry of FoodSeg103 classifiers served side by side.
+
+Each entry of FOODSEG_MODELS (name -> FoodSeg103Classifier arguments) gets its
+own ModelManager, so models load lazily and hot reload independently. Loaded
+models are kept in least-recently-used order and, when the weights of all
+loaded models exceed FOODSEG_MODEL_MEMORY_BUDGET_MB, the least recently used
+ones that no request is currently running on are unloaded. Requests pick a
+model by name; the default model is the one served by get_foodseg103_manager().
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .food_classifier import (_build_foodseg103_classifier, _get_setting, _manager_options,
+                              _warmup_foodseg103_classifier, get_foodseg103_manager)
+from .model_manager import ModelManager
+
+
+# Per-model request latencies kept for the percentiles in status()
+LATENCY_WINDOW = 512
+
+MODELS_DIR = Path(__file__).parent / 'models'
+
+
+class UnknownModelError(KeyError):
+    """Requested model name is not registered."""
+
+
+def _resolve_spec(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """FoodSeg103Classifier arguments for a FOODSEG_MODELS entry (paths relative to ml_models/models)."""
+    options = {'quantized_model_path': None, 'onnx_model_path': None, **spec}
+    for key in ('model_path', 'class_names_path', 'quantized_model_path', 'onnx_model_path'):
+        if options.get(key):
+            path = Path(options[key])
+            options[key] = str(path if path.is_absolute() else MODELS_DIR / path)
+    return options
+
+
+class ModelRegistry:
+    """
+    Named classifiers with lazy loading and a memory-bounded LRU of loaded models.
+
+    Args:
+        specs: {name: FoodSeg103Classifier keyword arguments}
+        default: Name of the model used when a request does not choose one
+        max_memory_bytes: Budget for the weights of all loaded models (0 = unbounded)
+        default_manager: Manager of the default model (defaults to a new one built from its spec)
+    """
+
+    def __init__(self, specs: Dict[str, Dict[str, Any]], default: str, max_memory_bytes: int = 0,
+                 default_manager: Optional[ModelManager] = None):
+        if default not in specs and default_manager is None:
+            raise ValueError(f"Default model '{default}' is not registered")
+        self.default = default
+        self.max_memory_bytes = max(0, int(max_memory_bytes))
+
+        self._managers: Dict[str, ModelManager] = {}
+        for name, spec in specs.items():
+            factory = partial(_build_foodseg103_classifier, **_resolve_spec(spec))
+            self._managers[name] = ModelManager(name, factory, warmup=_warmup_foodseg103_classifier,
+                                                **_manager_options(name))
+        if default_manager is not None:
+            self._managers[default] = default_manager
+
+        self._lock = threading.Lock()
+        # Loaded models, least recently used first: name -> (instance, resident bytes)
+        self._loaded: "OrderedDict[str, tuple]" = OrderedDict()
+        self._in_use = {name: 0 for name in self._managers}
+        self._latencies = {name: deque(maxlen=LATENCY_WINDOW) for name in self._managers}
+        self._stats = {name: {'requests': 0, 'loads': 0, 'evictions': 0, 'last_used': None}
+                       for name in self._managers}
+
+    def names(self):
+        return list(self._managers)
+
+    def instances(self):
+        """Currently loaded classifiers (no loading is triggered)."""
+        return [m.current() for m in self._managers.values() if m.current() is not None]
+
+    def manager(self, name: Optional[str] = None) -> ModelManager:
+        name = name or self.default
+        if name not in self._managers:
+            raise UnknownModelError(name)
+        return self._managers[name]
+
+    def acquire(self, name: Optional[str] = None):
+        """
+        Return the loaded classifier for a model (loading it if needed) and mark it in use.
+
+        Every acquire() must be paired with release(); prefer use().
+        """
+        name = name or self.default
+        manager = self.manager(name)
+        with self._lock:
+            self._in_use[name] += 1
+        try:
+            instance = manager.get()
+        except Exception:
+            with self._lock:
+                self._in_use[name] -= 1
+            raise
+
+        with self._lock:
+            known = self._loaded.get(name)
+            is_new = known is None or known[0] is not instance
+        if is_new:
+            # First use after a load, reload or eviction by another thread
+            size = instance.memory_bytes() if hasattr(instance, 'memory_bytes') else 0
+            with self._lock:
+                if known is None:
+                    self._stats[name]['loads'] += 1
+                self._loaded[name] = (instance, size)
+        with self._lock:
+            self._loaded.move_to_end(name)
+            self._stats[name]['last_used'] = time.time()
+        self._evict()
+        return instance
+
+    def release(self, name: Optional[str] = None, seconds: Optional[float] = None):
+        """Mark a request on a model as finished and record its latency."""
+        name = name or self.default
+        with self._lock:
+            self._in_use[name] -= 1
+            self._stats[name]['requests'] += 1
+            if seconds is not None:
+                self._latencies[name].append(seconds)
+
+    @contextmanager
+    def use(self, name: Optional[str] = None):
+        """Context manager yielding the classifier for a model; the model is not evicted meanwhile."""
+        instance = self.acquire(name)
+        started = time.perf_counter()
+        try:
+            yield instance
+        finally:
+            self.release(name, time.perf_counter() - started)
+
+    def _evict(self):
+        """Unload least recently used idle models until the loaded weights fit the budget."""
+        if not self.max_memory_bytes:
+            return
+        while True:
+            with self._lock:
+                total = sum(size for _, size in self._loaded.values())
+                if total <= self.max_memory_bytes:
+                    return
+                # The most recently used model always stays, even if it alone exceeds the budget
+                candidates = [n for n in list(self._loaded)[:-1] if self._in_use[n] == 0]
+                if not candidates:
+                    return
+                victim = candidates[0]
+                del self._loaded[victim]
+                self._stats[victim]['evictions'] += 1
+            self._managers[victim].unload()
+            print(f"Unloaded model '{victim}' to stay within the model memory budget "
+                  f"({total / 1e6:.1f} MB > {self.max_memory_bytes / 1e6:.1f} MB)")
+
+    def unload(self, name: str) -> bool:
+        """Unload a model now (it reloads on its next request)."""
+        manager = self.manager(name)
+        with self._lock:
+            self._loaded.pop(name, None)
+        return manager.unload()
+
+    def status(self) -> Dict[str, Any]:
+        """Per-model load state, resident size, request counts and latency percentiles."""
+        with self._lock:
+            loaded = {name: size for name, (_, size) in self._loaded.items()}
+            models = {}
+            for name, manager in self._managers.items():
+                latencies = np.array(self._latencies[name], dtype=np.float64) * 1000
+                models[name] = {
+                    **manager.status(),
+                    **self._stats[name],
+                    'default': name == self.default,
+                    'in_use': self._in_use[name],
+                    'memory_bytes': loaded.get(name),
+                    'latency_ms': {
+                        'mean': round(float(latencies.mean()), 2),
+                        'p50': round(float(np.percentile(latencies, 50)), 2),
+                        'p95': round(float(np.percentile(latencies, 95)), 2),
+                    } if latencies.size else None,
+                }
+        return {
+            'default': self.default,
+            'memory_budget_bytes': self.max_memory_bytes or None,
+            'memory_bytes': sum(loaded.values()),
+            'lru': list(loaded),
+            'models': models,
+        }
+
+
+_model_registry = None
+
+
+def get_model_registry() -> ModelRegistry:
+    """Global model registry configured from FOODSEG_MODELS / FOODSEG_DEFAULT_MODEL."""
+    global _model_registry
+    if _model_registry is None:
+        specs = _get_setting('FOODSEG_MODELS', {}) or {}
+        if isinstance(specs, str):
+            specs = json.loads(specs)
+        default = _get_setting('FOODSEG_DEFAULT_MODEL', 'resnet50_attention')
+        # The default model is the one preloaded, reloaded and reported by get_foodseg103_manager()
+        specs = {name: spec for name, spec in specs.items() if name != default}
+        _model_registry = ModelRegistry(
+            specs,
+            default=default,
+            max_memory_bytes=float(_get_setting('FOODSEG_MODEL_MEMORY_BUDGET_MB', 0)) * 1024 * 1024,
+            default_manager=get_foodseg103_manager(),
+        )
+    return _model_registry
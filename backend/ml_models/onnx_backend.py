@@ -0,0 +1,111 @@
+"""
+ONNX Runtime inference backend for the food classifiers.
+
+Only numpy and onnxruntime are needed here; the model graph is exported ahead of
+time with ``manage.py export_onnx`` (see onnx_export.py), so serving does not
+build the PyTorch model or load the training checkpoint.
+"""
+
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+
+class OnnxClassifierModel:
+    """
+    ONNX Runtime session producing logits [batch_size, num_classes] for images [batch_size, 3, H, W].
+
+    The session runs with all graph optimizations (constant folding, Conv+BN+ReLU
+    fusion, layout transforms). The hardware-independent part of that work
+    (ORT_ENABLE_EXTENDED) can be cached next to the model so later workers skip
+    it; the layout transforms of ORT_ENABLE_ALL are specific to the CPU they run
+    on, so they are always applied at load and never cached.
+    """
+
+    def __init__(self, model_path, num_threads: int = 0, cache_optimized: bool = True):
+        """
+        Args:
+            model_path: Exported .onnx file
+            num_threads: Intra-op threads (0 = onnxruntime default)
+            cache_optimized: Load the cached optimized graph (see optimized_onnx_path),
+                writing it first if it is missing or older than the model
+        """
+        if not ONNXRUNTIME_AVAILABLE:
+            raise RuntimeError("onnxruntime is not installed")
+        self.model_path = Path(model_path)
+        if not self.model_path.exists():
+            raise FileNotFoundError(f"ONNX model not found: {self.model_path}")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+
+        session_path = self.model_path
+        if cache_optimized:
+            optimized_path = optimized_onnx_path(self.model_path)
+            if not _is_fresh(optimized_path, self.model_path) and os.access(self.model_path.parent, os.W_OK):
+                write_optimized_onnx(self.model_path)
+            if _is_fresh(optimized_path, self.model_path):
+                session_path = optimized_path
+
+        self.session = ort.InferenceSession(str(session_path), sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_name = self.session.get_outputs()[0].name
+        print(f"ONNX Runtime model loaded from {session_path}")
+
+    def __call__(self, images: np.ndarray) -> np.ndarray:
+        """Run the graph on a float32 batch and return logits."""
+        images = np.ascontiguousarray(images, dtype=np.float32)
+        return self.session.run([self.output_name], {self.input_name: images})[0]
+
+
+def default_onnx_path(checkpoint_path) -> Path:
+    """Exported model location for a checkpoint: <checkpoint>.onnx next to it."""
+    return Path(checkpoint_path).with_suffix('.onnx')
+
+
+def optimized_onnx_path(model_path) -> Path:
+    """Cached hardware-independent optimized graph: <model>.extended.onnx next to the model."""
+    return Path(model_path).with_suffix('.extended.onnx')
+
+
+def _is_fresh(optimized_path: Path, model_path: Path) -> bool:
+    return optimized_path.exists() and optimized_path.stat().st_mtime >= model_path.stat().st_mtime
+
+
+def write_optimized_onnx(model_path) -> Path:
+    """
+    Write the ORT_ENABLE_EXTENDED optimized graph of an exported model.
+
+    Each process writes its own temporary file and renames it over the cache,
+    so workers starting at the same time never read a partially written graph.
+    """
+    model_path = Path(model_path)
+    optimized_path = optimized_onnx_path(model_path)
+    tmp_path = optimized_path.with_name(f".{optimized_path.name}.{os.getpid()}.tmp")
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    options.optimized_model_filepath = str(tmp_path)
+    try:
+        ort.InferenceSession(str(model_path), sess_options=options, providers=['CPUExecutionProvider'])
+        os.replace(tmp_path, optimized_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return optimized_path
+
+
+def load_onnx_model(model_path, num_threads: int = 0) -> Optional[OnnxClassifierModel]:
+    """Create a session, or return None when onnxruntime or the model file is missing."""
+    if not ONNXRUNTIME_AVAILABLE or not Path(model_path).exists():
+        return None
+    return OnnxClassifierModel(model_path, num_threads=num_threads)
@@ -0,0 +1,97 @@
+"""
+Export food classifiers built by ``create_model`` to ONNX and check the export
+against the PyTorch model.
+"""
+
+from pathlib import Path
+from typing import Dict, Sequence
+
+import numpy as np
+import torch
+
+from .foodseg103_model import create_model
+from .onnx_backend import ONNXRUNTIME_AVAILABLE, OnnxClassifierModel, optimized_onnx_path, write_optimized_onnx
+
+
+EXPORTABLE_MODELS = ('resnet50', 'resnet50_attention', 'efficientnet', 'swin')
+
+INPUT_NAME = 'images'
+OUTPUT_NAME = 'logits'
+
+
+def load_float_model(model_name: str, checkpoint_path=None, num_classes: int = 103, dropout: float = 0.3):
+    """Build a classifier in eval mode, optionally loading a training checkpoint."""
+    model = create_model(model_name=model_name, num_classes=num_classes, pretrained=False, dropout=dropout)
+    if checkpoint_path is not None:
+        try:
+            checkpoint = torch.load(checkpoint_path, map_location='cpu')
+        except Exception:
+            # Legacy checkpoints with non-tensor metadata need weights_only=False
+            checkpoint = torch.load(checkpoint_path, map_location='cpu', weights_only=False)
+        model.load_state_dict(checkpoint.get('model_state_dict', checkpoint))
+    return model.eval()
+
+
+def export_onnx(model: torch.nn.Module, output_path, image_size: int = 224, opset: int = 17) -> Path:
+    """
+    Export a classifier with a dynamic batch axis.
+
+    Args:
+        model: Float model (put in eval mode before export)
+        output_path: Destination .onnx file
+        image_size: Input height/width
+        opset: ONNX opset version
+
+    Returns:
+        Path: The written file
+    """
+    output_path = Path(output_path)
+    model = model.cpu().eval()
+    dummy = torch.zeros(1, 3, image_size, image_size)
+    with torch.no_grad():
+        torch.onnx.export(
+            model, (dummy,), str(output_path),
+            input_names=[INPUT_NAME],
+            output_names=[OUTPUT_NAME],
+            dynamic_axes={INPUT_NAME: {0: 'batch'}, OUTPUT_NAME: {0: 'batch'}},
+            opset_version=opset,
+            do_constant_folding=True,
+            dynamo=False,
+        )
+    # Replace any optimized graph from an earlier export, so serving workers only read it
+    if ONNXRUNTIME_AVAILABLE:
+        write_optimized_onnx(output_path)
+    else:
+        optimized_onnx_path(output_path).unlink(missing_ok=True)
+    return output_path
+
+
+def check_equivalence(model: torch.nn.Module, onnx_path, batch_sizes: Sequence[int] = (1, 4),
+                      image_size: int = 224, atol: float = 1e-4, seed: int = 0) -> Dict:
+    """
+    Compare ONNX Runtime outputs with the PyTorch model on random inputs.
+
+    Returns:
+        dict: Per-batch-size max abs logit/probability differences and 'passed'
+    """
+    generator = torch.Generator().manual_seed(seed)
+    session = OnnxClassifierModel(onnx_path, cache_optimized=False)
+    model = model.cpu().eval()
+
+    results = {'atol': atol, 'batches': [], 'passed': True}
+    for batch_size in batch_sizes:
+        images = torch.randn(batch_size, 3, image_size, image_size, generator=generator)
+        with torch.no_grad():
+            expected = model(images).numpy()
+        actual = session(images.numpy())
+        logit_diff = float(np.abs(expected - actual).max())
+        prob_diff = float(np.abs(1 / (1 + np.exp(-expected)) - 1 / (1 + np.exp(-actual))).max())
+        passed = prob_diff <= atol
+        results['batches'].append({
+            'batch_size': batch_size,
+            'max_abs_logit_diff': logit_diff,
+            'max_abs_prob_diff': prob_diff,
+            'passed': passed,
+        })
+        results['passed'] = results['passed'] and passed
+    return results
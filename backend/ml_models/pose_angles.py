@@ -0,0 +1,108 @@
+"""
+Vectorized joint angle engine for MediaPipe pose landmarks.
+
+所有關節角度由一張靜態的關節三元組表定義，並以單次 numpy 批次運算計算，
+可處理單幀 (33, 4) 或多幀 (frames, 33, 4) 的關鍵點陣列。
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+# MediaPipe Pose 33 個關鍵點（依官方順序）
+LANDMARK_NAMES = [
+    "Nose", "LeftEyeInner", "LeftEye", "LeftEyeOuter", "RightEyeInner", "RightEye", "RightEyeOuter",
+    "LeftEar", "RightEar", "MouthLeft", "MouthRight",
+    "LeftShoulder", "RightShoulder", "LeftElbow", "RightElbow",
+    "LeftWrist", "RightWrist", "LeftPinky", "RightPinky",
+    "LeftIndex", "RightIndex", "LeftThumb", "RightThumb",
+    "LeftHip", "RightHip", "LeftKnee", "RightKnee",
+    "LeftAnkle", "RightAnkle", "LeftHeel", "RightHeel",
+    "LeftFootIndex", "RightFootIndex"
+]
+LANDMARK_INDEX = {name: idx for idx, name in enumerate(LANDMARK_NAMES)}
+NUM_LANDMARKS = len(LANDMARK_NAMES)
+
+# 陣列欄位：x, y, z, confidence(visibility)
+LANDMARK_FIELDS = ('x', 'y', 'z', 'confidence')
+
+# 關節角度定義：(端點 A, 頂點, 端點 B)，角度為頂點處的夾角
+JOINT_TRIPLES = {
+    'left_elbow': ('LeftShoulder', 'LeftElbow', 'LeftWrist'),
+    'right_elbow': ('RightShoulder', 'RightElbow', 'RightWrist'),
+    'left_shoulder': ('LeftElbow', 'LeftShoulder', 'LeftHip'),
+    'right_shoulder': ('RightElbow', 'RightShoulder', 'RightHip'),
+    'left_hip': ('LeftShoulder', 'LeftHip', 'LeftKnee'),
+    'right_hip': ('RightShoulder', 'RightHip', 'RightKnee'),
+    'left_knee': ('LeftHip', 'LeftKnee', 'LeftAnkle'),
+    'right_knee': ('RightHip', 'RightKnee', 'RightAnkle'),
+}
+JOINT_NAMES = list(JOINT_TRIPLES.keys())
+JOINT_INDEX = {name: idx for idx, name in enumerate(JOINT_NAMES)}
+JOINT_TRIPLE_INDICES = np.array(
+    [[LANDMARK_INDEX[name] for name in triple] for triple in JOINT_TRIPLES.values()],
+    dtype=np.intp
+)
+
+
+def keypoints_to_array(keypoints: List[Dict]) -> np.ndarray:
+    """
+    將關鍵點字典列表轉為 (33, 4) 陣列
+
+    依名稱對應 MediaPipe 索引；缺少的關鍵點或欄位以 NaN 表示，
+    因此 HOG 備用檢測產生的部分關鍵點也能使用。
+    """
+    landmarks = np.full((NUM_LANDMARKS, len(LANDMARK_FIELDS)), np.nan, dtype=np.float64)
+    for kp in keypoints or []:
+        idx = LANDMARK_INDEX.get(kp.get('name'))
+        if idx is None:
+            continue
+        for col, field in enumerate(LANDMARK_FIELDS):
+            value = kp.get(field)
+            if value is not None:
+                landmarks[idx, col] = value
+    return landmarks
+
+
+def compute_joint_angles(landmarks: np.ndarray, triples: Optional[np.ndarray] = None,
+                         use_z: bool = False, min_segment_length: float = 0.0) -> np.ndarray:
+    """
+    批次計算所有關節角度（度）
+
+    Args:
+        landmarks: (..., 33, 4) 關鍵點陣列，例如 (33, 4) 或 (frames, 33, 4)
+        triples: (J, 3) 關節三元組索引（預設 JOINT_TRIPLE_INDICES）
+        use_z: 是否使用 MediaPipe 的 z 座標計算 3D 角度
+        min_segment_length: 肢段長度下限，過短者視為無法計算
+
+    Returns:
+        (..., J) 角度陣列，無法計算者為 NaN
+    """
+    if triples is None:
+        triples = JOINT_TRIPLE_INDICES
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    coords = landmarks[..., :3 if use_z else 2]
+
+    vertex = coords[..., triples[:, 1], :]
+    upper = coords[..., triples[:, 0], :] - vertex
+    lower = coords[..., triples[:, 2], :] - vertex
+
+    upper_len = np.linalg.norm(upper, axis=-1)
+    lower_len = np.linalg.norm(lower, axis=-1)
+    dot = np.einsum('...k,...k->...', upper, lower)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cos_theta = dot / (upper_len * lower_len)
+        angles = np.degrees(np.arccos(np.clip(cos_theta, -1.0, 1.0)))
+        too_short = (upper_len < min_segment_length) | (lower_len < min_segment_length)
+    angles[too_short] = np.nan
+    return angles
+
+
+def angles_to_dict(angles: np.ndarray) -> Dict[str, Optional[float]]:
+    """將單幀角度陣列轉為 {關節名稱: 角度}，NaN 轉為 None"""
+    return {
+        name: (None if np.isnan(angles[idx]) else float(angles[idx]))
+        for name, idx in JOINT_INDEX.items()
+    }
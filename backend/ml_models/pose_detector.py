@@ -11,6 +11,12 @@ from typing import List, Dict, Tuple, Optional
 from pathlib import Path
 import logging
 
+from .pose_angles import (
+    LANDMARK_NAMES, JOINT_INDEX, keypoints_to_array, compute_joint_angles, angles_to_dict
+)
+from .rep_segmentation import segment_reps
+from .pose_landmarker import PoseLandmarkerBackend, RUNNING_MODE_VIDEO, RUNNING_MODE_LIVE_STREAM
+
 try:
     import mediapipe as mp
     MEDIAPIPE_AVAILABLE = True
@@ -28,16 +34,22 @@ class OpenPoseDetector:
     支援實時攝影鏡頭輸入和姿勢分析
     """
     
-    def __init__(self, model_path: Optional[str] = None):
+    BACKEND_SOLUTIONS = 'solutions'  # 舊版 mp.solutions.pose（同步 process）
+    BACKENDS = (BACKEND_SOLUTIONS, RUNNING_MODE_VIDEO, RUNNING_MODE_LIVE_STREAM)
+
+    def __init__(self, model_path: Optional[str] = None, backend: str = BACKEND_SOLUTIONS):
         """
         初始化檢測器
         
         Args:
-            model_path: 模型檔案路徑（可選）
+            model_path: 模型檔案路徑（可選，PoseLandmarker 後端使用的 .task 檔）
+            backend: 推論後端 'solutions'、'video' 或 'live_stream'
         """
         self.model_path = model_path
+        self.backend = backend if backend in self.BACKENDS else self.BACKEND_SOLUTIONS
         self.mp_pose = None
         self.pose = None
+        self.landmarker = None
         self.keypoints = None
         self.confidence_threshold = 0.3
         
@@ -45,16 +57,7 @@ class OpenPoseDetector:
         self.POSE_CONNECTIONS = None  # MediaPipe 會自動處理
         
         # 關鍵點名稱 (MediaPipe - 33個關鍵點，依官方順序)
-        self.KEYPOINT_NAMES = [
-            "Nose", "LeftEyeInner", "LeftEye", "LeftEyeOuter", "RightEyeInner", "RightEye", "RightEyeOuter",
-            "LeftEar", "RightEar", "MouthLeft", "MouthRight",
-            "LeftShoulder", "RightShoulder", "LeftElbow", "RightElbow",
-            "LeftWrist", "RightWrist", "LeftPinky", "RightPinky",
-            "LeftIndex", "RightIndex", "LeftThumb", "RightThumb",
-            "LeftHip", "RightHip", "LeftKnee", "RightKnee",
-            "LeftAnkle", "RightAnkle", "LeftHeel", "RightHeel",
-            "LeftFootIndex", "RightFootIndex"
-        ]
+        self.KEYPOINT_NAMES = list(LANDMARK_NAMES)
         
         self.ARM_KEYPOINT_NAMES = {
             'left': {'shoulder': 'LeftShoulder', 'elbow': 'LeftElbow', 'wrist': 'LeftWrist'},
@@ -64,6 +67,7 @@ class OpenPoseDetector:
         self.ANGLE_TOLERANCE = 15.0
         self.MIN_KEYPOINT_CONFIDENCE = 0.4
         self.MIN_SEGMENT_LENGTH = 0.05
+        self.USE_3D_ANGLES = False  # 是否使用 MediaPipe 的 z 座標計算 3D 角度
         
         # 動作辨識狀態機（追蹤完整動作循環：垂直 -> 伸直 -> 垂直）
         # 狀態：'idle' -> 'at_vertical' -> 'at_extended' -> 'completed'
@@ -83,6 +87,20 @@ class OpenPoseDetector:
     
     def _load_model(self):
         """載入 MediaPipe 模型"""
+        if self.backend != self.BACKEND_SOLUTIONS:
+            try:
+                self.landmarker = PoseLandmarkerBackend(
+                    model_path=self.model_path,
+                    running_mode=self.backend,
+                    min_detection_confidence=0.3,
+                    min_tracking_confidence=0.3
+                )
+                return
+            except Exception as e:
+                logger.error(f"Failed to load PoseLandmarker ({self.backend}), falling back to solutions: {e}")
+                self.landmarker = None
+                self.backend = self.BACKEND_SOLUTIONS
+
         try:
             if MEDIAPIPE_AVAILABLE:
                 self.mp_pose = mp.solutions.pose
@@ -111,21 +129,23 @@ class OpenPoseDetector:
         self.last_success_time = 0.0
         logger.info("動作狀態機已重置")
     
-    def detect_pose(self, frame: np.ndarray, exercise_type: str = "general") -> Dict:
+    def detect_pose(self, frame: np.ndarray, exercise_type: str = "general",
+                    timestamp_ms: Optional[int] = None) -> Dict:
         """
         檢測單一幀的姿勢
         
         Args:
             frame: 輸入影像幀 (BGR 格式)
             exercise_type: 運動類型（用於計算動作接近程度的分數）
+            timestamp_ms: 幀時間戳記（毫秒，PoseLandmarker 後端使用，預設為目前時間）
             
         Returns:
             包含關鍵點和姿勢資訊的字典
         """
         try:
             # 優先使用 MediaPipe
-            if self.pose is not None:
-                return self._mediapipe_detection(frame, exercise_type)
+            if self.landmarker is not None or self.pose is not None:
+                return self._mediapipe_detection(frame, exercise_type, timestamp_ms)
             else:
                 # 備用 HOG 檢測
                 return self._simple_pose_detection(frame, exercise_type)
@@ -133,36 +153,82 @@ class OpenPoseDetector:
             logger.error(f"Pose detection failed: {e}")
             return self._fallback_pose_detection(frame, exercise_type)
     
-    def _mediapipe_detection(self, frame: np.ndarray, exercise_type: str = "general") -> Dict:
+    def detect_pose_async(self, frame: np.ndarray, callback, exercise_type: str = "general",
+                          timestamp_ms: Optional[int] = None) -> int:
+        """
+        非同步檢測（僅 live_stream 後端）
+
+        提交後立即返回，呼叫端可同時解碼下一幀；結果以 callback(result, timestamp_ms) 送達
+        （在 PoseLandmarker 的分派執行緒中，依時間戳記順序），沒有偵測到人體時改用 HOG 備用檢測。
+        被 MediaPipe 丟棄的幀回報為未偵測（detector 為 'dropped'），不執行備用檢測也不更新動作狀態機。
+
+        Returns:
+            此幀使用的時間戳記
+        """
+        if self.landmarker is None or self.backend != RUNNING_MODE_LIVE_STREAM:
+            raise RuntimeError("detect_pose_async requires the live_stream backend")
+
+        def _on_landmarks(landmarks, ts, dropped):
+            if dropped:
+                callback(self._empty_result('dropped'), ts)
+                return
+            try:
+                if landmarks:
+                    result = self._build_detection_result(self._landmarks_to_keypoints(landmarks))
+                else:
+                    result = self._simple_pose_detection(frame, exercise_type)
+            except Exception as e:
+                logger.error(f"Pose detection failed: {e}")
+                result = self._fallback_pose_detection(frame, exercise_type)
+            callback(result, ts)
+
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        return self.landmarker.detect_async(rgb_frame, _on_landmarks, timestamp_ms)
+
+    def _landmarks_to_keypoints(self, landmarks) -> List[Dict]:
+        """將 MediaPipe 關鍵點轉為關鍵點字典列表"""
+        keypoints = []
+        for idx, landmark in enumerate(landmarks):
+            keypoints.append({
+                'id': idx,
+                'name': self.KEYPOINT_NAMES[idx] if idx < len(self.KEYPOINT_NAMES) else f"Point_{idx}",
+                'x': landmark.x,
+                'y': landmark.y,
+                'z': landmark.z,
+                'confidence': landmark.visibility
+            })
+        return keypoints
+
+    def _build_detection_result(self, keypoints: List[Dict]) -> Dict:
+        """評估關鍵點並組成檢測結果"""
+        evaluation = self._evaluate_weightlifting_pose(keypoints)
+
+        return {
+            'keypoints': keypoints,
+            'confidence': evaluation['confidence'],
+            'pose_score': evaluation['pose_score'],
+            'is_success': evaluation['is_success'],
+            'state_changed': evaluation['state_changed'],
+            'angles': evaluation['angles'],
+            'joint_angles': evaluation['joint_angles'],
+            'detected_errors': evaluation['warnings'],
+            'detector': 'mediapipe',
+            'timestamp': cv2.getTickCount() / cv2.getTickFrequency()
+        }
+
+    def _mediapipe_detection(self, frame: np.ndarray, exercise_type: str = "general",
+                             timestamp_ms: Optional[int] = None) -> Dict:
         """使用 MediaPipe 進行姿勢檢測"""
         # MediaPipe 需要 RGB 格式
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.pose.process(rgb_frame)
+        if self.landmarker is not None:
+            landmarks = self.landmarker.detect(rgb_frame, timestamp_ms)
+        else:
+            results = self.pose.process(rgb_frame)
+            landmarks = results.pose_landmarks.landmark if results.pose_landmarks else None
         
-        if results.pose_landmarks:
-            # 解析關鍵點
-            keypoints = []
-            for idx, landmark in enumerate(results.pose_landmarks.landmark):
-                keypoints.append({
-                    'id': idx,
-                    'name': self.KEYPOINT_NAMES[idx] if idx < len(self.KEYPOINT_NAMES) else f"Point_{idx}",
-                    'x': landmark.x,
-                    'y': landmark.y,
-                    'z': landmark.z,
-                    'confidence': landmark.visibility
-                })
-            
-            evaluation = self._evaluate_weightlifting_pose(keypoints)
-
-            return {
-                'keypoints': keypoints,
-                'confidence': evaluation['confidence'],
-                'pose_score': evaluation['pose_score'],
-                'is_success': evaluation['is_success'],
-                'angles': evaluation['angles'],
-                'detected_errors': evaluation['warnings'],
-                'timestamp': cv2.getTickCount() / cv2.getTickFrequency()
-            }
+        if landmarks:
+            return self._build_detection_result(self._landmarks_to_keypoints(landmarks))
         else:
             # 沒檢測到人體，使用 HOG 備用
             logger.info("MediaPipe no detection, using HOG fallback")
@@ -216,8 +282,12 @@ class OpenPoseDetector:
             'confidence': evaluation['confidence'],
             'pose_score': evaluation['pose_score'],
             'is_success': evaluation['is_success'],
+            'state_changed': evaluation['state_changed'],
             'angles': evaluation['angles'],
+            'joint_angles': evaluation['joint_angles'],
             'detected_errors': warnings,
+            # 關鍵點由人體框估計，非實際偵測
+            'detector': 'fallback',
             'timestamp': cv2.getTickCount() / cv2.getTickFrequency()
         }
     
@@ -229,15 +299,22 @@ class OpenPoseDetector:
             return self._simple_pose_detection(frame, exercise_type)
         except Exception as e:
             logger.error(f"Fallback pose detection failed: {e}")
-            return {
-                'keypoints': [],
-                'confidence': 0.0,
-                'pose_score': 0.0,
-                'is_success': False,
-                'angles': {'left': None, 'right': None},
-                'detected_errors': ['Detection failed'],
-                'timestamp': cv2.getTickCount() / cv2.getTickFrequency()
-            }
+            return self._empty_result('fallback', ['Detection failed'])
+
+    def _empty_result(self, detector: str, detected_errors: Optional[List[str]] = None) -> Dict:
+        """沒有關鍵點的檢測結果（不經過動作狀態機）"""
+        return {
+            'keypoints': [],
+            'confidence': 0.0,
+            'pose_score': 0.0,
+            'is_success': False,
+            'state_changed': False,
+            'angles': {'left': None, 'right': None},
+            'joint_angles': {},
+            'detected_errors': list(detected_errors or []),
+            'detector': detector,
+            'timestamp': cv2.getTickCount() / cv2.getTickFrequency()
+        }
     
     def _estimate_keypoints_from_box(self, box: Tuple, frame_shape: Tuple) -> List[Dict]:
         """從人體框估計關鍵點位置"""
@@ -288,17 +365,13 @@ class OpenPoseDetector:
         """依名稱取得單一關鍵點"""
         return next((kp for kp in keypoints if kp.get('name') == name), None)
 
-    def _compute_elbow_angle(self, shoulder: Dict, elbow: Dict, wrist: Dict) -> Optional[float]:
-        """計算肩-肘-腕所形成的夾角（肘部角度）"""
-        upper = np.array([shoulder['x'] - elbow['x'], shoulder['y'] - elbow['y']])
-        lower = np.array([wrist['x'] - elbow['x'], wrist['y'] - elbow['y']])
-
-        if np.linalg.norm(upper) < self.MIN_SEGMENT_LENGTH or np.linalg.norm(lower) < self.MIN_SEGMENT_LENGTH:
-            return None
-
-        cos_theta = np.dot(upper, lower) / (np.linalg.norm(upper) * np.linalg.norm(lower))
-        cos_theta = float(np.clip(cos_theta, -1.0, 1.0))
-        return float(np.degrees(np.arccos(cos_theta)))
+    def _compute_joint_angles(self, keypoints: List[Dict]) -> np.ndarray:
+        """一次計算所有關節角度（肘、肩、髖、膝）"""
+        return compute_joint_angles(
+            keypoints_to_array(keypoints),
+            use_z=self.USE_3D_ANGLES,
+            min_segment_length=self.MIN_SEGMENT_LENGTH
+        )
 
     def _evaluate_weightlifting_pose(self, keypoints: List[Dict]) -> Dict:
         """評估舉重姿勢，追蹤完整動作循環（垂直 -> 伸直 -> 垂直）"""
@@ -306,10 +379,14 @@ class OpenPoseDetector:
             'pose_score': 0.0,
             'confidence': 0.0,
             'angles': {'left': None, 'right': None},
+            'joint_angles': {},
             'is_success': False,
+            'state_changed': False,
             'warnings': []
         }
 
+        previous_state = dict(self.action_state)
+
         if not keypoints:
             result['warnings'].append('無法偵測到手臂關鍵點，請站在鏡頭正中央。')
             return result
@@ -318,6 +395,9 @@ class OpenPoseDetector:
         confidences: List[float] = []
         completed_arms: List[str] = []  # 完成完整動作循環的手臂
 
+        joint_angles = self._compute_joint_angles(keypoints)
+        result['joint_angles'] = angles_to_dict(joint_angles)
+
         for side, names in self.ARM_KEYPOINT_NAMES.items():
             label = '左' if side == 'left' else '右'
             shoulder = self._get_keypoint(keypoints, names['shoulder'])
@@ -346,7 +426,8 @@ class OpenPoseDetector:
                 self.action_state[side] = 'idle'
                 continue
 
-            angle = self._compute_elbow_angle(shoulder, elbow, wrist)
+            angle = joint_angles[JOINT_INDEX[f'{side}_elbow']]
+            angle = None if np.isnan(angle) else float(angle)
             logger.debug('Weightlifting evaluation - %s臂角度=%s, 當前狀態=%s', label, angle, self.action_state[side])
             if angle is None:
                 result['warnings'].append(f"{label}臂角度無法計算，請伸直手臂並保持穩定。")
@@ -427,8 +508,32 @@ class OpenPoseDetector:
         if not side_scores:
             result['warnings'].append('無法判定手臂角度，請將雙臂完全呈現在鏡頭中。')
 
+        # 狀態機是否有轉換（供持久化策略判斷是否需要儲存此幀）
+        result['state_changed'] = self.action_state != previous_state
+
         return result
 
+    def segment_reps_offline(self, angles: np.ndarray, timestamps: np.ndarray) -> Dict:
+        """
+        離線動作分段（與即時狀態機相同的閾值與冷卻時間）
+
+        Args:
+            angles: (N, 2) 左右手臂角度序列，無法計算者為 NaN
+            timestamps: 每幀時間戳記（秒）
+
+        Returns:
+            segment_reps 的分段結果
+        """
+        return segment_reps(
+            angles,
+            timestamps,
+            vertical_min=self.VERTICAL_ANGLE_MIN,
+            vertical_max=self.VERTICAL_ANGLE_MAX,
+            extended_threshold=self.EXTENDED_ANGLE_THRESHOLD,
+            cooldown_seconds=self.COOLDOWN_SECONDS,
+            sides=tuple(self.ARM_KEYPOINT_NAMES.keys())
+        )
+
     def get_pose_feedback(self, keypoints: List[Dict], exercise_type: str = "general") -> str:
         """生成舉重姿勢回饋建議"""
         if not keypoints:
@@ -472,8 +577,16 @@ _pose_detector_instance = None
 
 
 def get_pose_detector() -> OpenPoseDetector:
-    """獲取全域姿勢檢測器實例"""
+    """獲取全域姿勢檢測器實例（後端由 settings.POSE_DETECTOR_BACKEND 決定）"""
     global _pose_detector_instance
     if _pose_detector_instance is None:
-        _pose_detector_instance = OpenPoseDetector()
+        backend = os.getenv('POSE_DETECTOR_BACKEND', OpenPoseDetector.BACKEND_SOLUTIONS)
+        model_path = os.getenv('POSE_LANDMARKER_MODEL_PATH') or None
+        try:
+            from django.conf import settings
+            backend = getattr(settings, 'POSE_DETECTOR_BACKEND', backend)
+            model_path = getattr(settings, 'POSE_LANDMARKER_MODEL_PATH', model_path)
+        except Exception:
+            pass
+        _pose_detector_instance = OpenPoseDetector(model_path=model_path, backend=backend)
     return _pose_detector_instance
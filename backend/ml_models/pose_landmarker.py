@@ -0,0 +1,181 @@
+"""
+MediaPipe Tasks PoseLandmarker backend (VIDEO / LIVE_STREAM running modes).
+
+與舊版 mp.solutions.pose 的同步 process() 不同，Tasks API 需要每幀的時間戳記，
+LIVE_STREAM 模式會以回呼非同步回傳結果，讓下一幀的解碼可與本幀的推論重疊。
+MediaPipe 的結果執行緒只負責把結果放入佇列，回呼由單一分派執行緒依時間戳記順序呼叫，
+回呼中的評估與狀態機不會阻塞推論，也不會並行執行。
+"""
+
+import logging
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import mediapipe as mp
+    from mediapipe.tasks.python import BaseOptions
+    from mediapipe.tasks.python import vision
+    MEDIAPIPE_TASKS_AVAILABLE = True
+except ImportError:
+    MEDIAPIPE_TASKS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+RUNNING_MODE_VIDEO = 'video'
+RUNNING_MODE_LIVE_STREAM = 'live_stream'
+
+DEFAULT_MODEL_PATH = Path(__file__).parent / 'models' / 'pose_landmarker_lite.task'
+
+# 回呼：callback(landmarks 或 None, timestamp_ms, dropped)
+# dropped 為 True 表示該幀被 MediaPipe 丟棄（未經推論），landmarks 必為 None
+LandmarkCallback = Callable[[Optional[List], int, bool], None]
+
+
+class PoseLandmarkerBackend:
+    """
+    PoseLandmarker 推論後端
+
+    - VIDEO：同步 detect_for_video，使用時間戳記在幀間追蹤
+    - LIVE_STREAM：detect_async 提交後立即返回，結果經由回呼送達
+    """
+
+    def __init__(self, model_path: Optional[str] = None, running_mode: str = RUNNING_MODE_VIDEO,
+                 min_detection_confidence: float = 0.3, min_tracking_confidence: float = 0.3):
+        """
+        Args:
+            model_path: .task 模型檔路徑（預設 models/pose_landmarker_lite.task）
+            running_mode: 'video' 或 'live_stream'
+            min_detection_confidence: 最低檢測門檻
+            min_tracking_confidence: 最低追蹤門檻
+        """
+        if not MEDIAPIPE_TASKS_AVAILABLE:
+            raise RuntimeError("MediaPipe Tasks API is not available")
+        if running_mode not in (RUNNING_MODE_VIDEO, RUNNING_MODE_LIVE_STREAM):
+            raise ValueError(f"Unsupported running mode: {running_mode}")
+
+        self.model_path = Path(model_path) if model_path else DEFAULT_MODEL_PATH
+        if not self.model_path.exists():
+            raise FileNotFoundError(f"PoseLandmarker model not found: {self.model_path}")
+
+        self.running_mode = running_mode
+        self._lock = threading.Lock()
+        self._last_timestamp_ms = -1
+        # timestamp_ms -> callback（LIVE_STREAM 等待中的幀）
+        self._pending: Dict[int, LandmarkCallback] = {}
+        self._dispatch_queue: "queue.Queue" = queue.Queue()
+        self._dispatcher: Optional[threading.Thread] = None
+
+        is_live = running_mode == RUNNING_MODE_LIVE_STREAM
+        options = vision.PoseLandmarkerOptions(
+            base_options=BaseOptions(model_asset_path=str(self.model_path)),
+            running_mode=(vision.RunningMode.LIVE_STREAM if is_live else vision.RunningMode.VIDEO),
+            num_poses=1,
+            min_pose_detection_confidence=min_detection_confidence,
+            min_pose_presence_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence,
+            output_segmentation_masks=False,
+            result_callback=self._on_result if is_live else None,
+        )
+        self.landmarker = vision.PoseLandmarker.create_from_options(options)
+        if is_live:
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name='pose-landmarker-dispatch',
+                                                daemon=True)
+            self._dispatcher.start()
+        logger.info("MediaPipe PoseLandmarker loaded (%s mode) from %s", running_mode, self.model_path)
+
+    def _next_timestamp(self, timestamp_ms: Optional[int] = None) -> int:
+        """取得嚴格遞增的時間戳記（Tasks API 要求單調遞增）"""
+        if timestamp_ms is None:
+            timestamp_ms = int(time.monotonic() * 1000)
+        with self._lock:
+            timestamp_ms = max(int(timestamp_ms), self._last_timestamp_ms + 1)
+            self._last_timestamp_ms = timestamp_ms
+        return timestamp_ms
+
+    @staticmethod
+    def _to_mp_image(rgb_frame: np.ndarray):
+        return mp.Image(image_format=mp.ImageFormat.SRGB, data=np.ascontiguousarray(rgb_frame))
+
+    @staticmethod
+    def _first_pose(result) -> Optional[List]:
+        if result is None or not result.pose_landmarks:
+            return None
+        return result.pose_landmarks[0]
+
+    def _on_result(self, result, output_image, timestamp_ms: int):
+        """LIVE_STREAM 結果回呼（在 MediaPipe 執行緒中呼叫，只做排入佇列）"""
+        with self._lock:
+            callback = self._pending.pop(timestamp_ms, None)
+            # 較舊且尚未回傳的幀已被 MediaPipe 丟棄
+            dropped = sorted(ts for ts in self._pending if ts < timestamp_ms)
+            for ts in dropped:
+                self._dispatch_queue.put((self._pending.pop(ts), None, ts, True))
+            if callback is not None:
+                self._dispatch_queue.put((callback, self._first_pose(result), timestamp_ms, False))
+
+    def _dispatch_loop(self):
+        """依序呼叫 LIVE_STREAM 回呼，直到收到結束訊號（None）"""
+        while True:
+            item = self._dispatch_queue.get()
+            if item is None:
+                return
+            callback, landmarks, timestamp_ms, dropped = item
+            try:
+                callback(landmarks, timestamp_ms, dropped)
+            except Exception as e:
+                logger.error(f"PoseLandmarker result callback failed: {e}")
+
+    def detect_async(self, rgb_frame: np.ndarray, callback: LandmarkCallback,
+                     timestamp_ms: Optional[int] = None) -> int:
+        """
+        非同步提交一幀（僅 LIVE_STREAM）
+
+        Returns:
+            此幀使用的時間戳記
+        """
+        if self.running_mode != RUNNING_MODE_LIVE_STREAM:
+            raise RuntimeError("detect_async requires the live_stream running mode")
+        timestamp_ms = self._next_timestamp(timestamp_ms)
+        with self._lock:
+            self._pending[timestamp_ms] = callback
+        self.landmarker.detect_async(self._to_mp_image(rgb_frame), timestamp_ms)
+        return timestamp_ms
+
+    def detect(self, rgb_frame: np.ndarray, timestamp_ms: Optional[int] = None,
+               timeout: float = 1.0) -> Optional[List]:
+        """
+        同步取得單幀關鍵點
+
+        LIVE_STREAM 模式下提交後等待回呼；逾時或被丟棄時回傳 None。
+        """
+        if self.running_mode == RUNNING_MODE_VIDEO:
+            timestamp_ms = self._next_timestamp(timestamp_ms)
+            result = self.landmarker.detect_for_video(self._to_mp_image(rgb_frame), timestamp_ms)
+            return self._first_pose(result)
+
+        done = threading.Event()
+        holder = {}
+
+        def _collect(landmarks, ts, dropped):
+            holder['landmarks'] = landmarks
+            done.set()
+
+        self.detect_async(rgb_frame, _collect, timestamp_ms)
+        if not done.wait(timeout):
+            logger.warning("PoseLandmarker live stream result timed out")
+            return None
+        return holder.get('landmarks')
+
+    def close(self):
+        """釋放 MediaPipe 資源（LIVE_STREAM 會先送出已排入佇列的回呼）"""
+        self.landmarker.close()
+        if self._dispatcher is not None:
+            self._dispatch_queue.put(None)
+            self._dispatcher.join()
+            self._dispatcher = None
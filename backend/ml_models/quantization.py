@@ -0,0 +1,131 @@
+"""
+INT8 quantization for CPU inference of the FoodSeg103 classifier.
+
+Modes:
+    fp32     Original float model.
+    dynamic  Dynamic INT8 quantization of the Linear classifier head only
+             (weights quantized ahead of time, activations per batch); no calibration.
+    int8     Static post-training quantization of the conv trunk and CBAM blocks
+             (FX graph mode, so residual adds and attention ops are handled
+             without rewriting the model) plus dynamic quantization of the head.
+             Requires activation ranges from a calibration run.
+
+A calibrated model is stored as the state dict of the converted graph module.
+Loading rebuilds the same graph from the float model and loads that state dict,
+so no calibration images are needed at serving time.
+"""
+
+import copy
+import io
+from typing import Iterable
+
+import torch
+import torch.nn as nn
+
+try:
+    from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+    QUANTIZATION_AVAILABLE = True
+except ImportError:
+    QUANTIZATION_AVAILABLE = False
+
+
+QUANTIZATION_MODES = ('fp32', 'dynamic', 'int8')
+
+# Submodule kept out of static quantization and quantized dynamically instead
+HEAD_MODULE_NAME = 'classifier'
+
+
+def _quantized_engine():
+    """Pick the best available quantized kernel backend for this CPU."""
+    engines = torch.backends.quantized.supported_engines
+    for engine in ('x86', 'fbgemm', 'qnnpack'):
+        if engine in engines:
+            return engine
+    raise RuntimeError("No quantized CPU engine available")
+
+
+def _example_inputs(image_size=224):
+    return (torch.zeros(1, 3, image_size, image_size),)
+
+
+def quantize_head_dynamic(model: nn.Module) -> nn.Module:
+    """Dynamically quantize every nn.Linear (the classifier head) to INT8."""
+    if not QUANTIZATION_AVAILABLE:
+        raise RuntimeError("torch.ao.quantization is not available")
+    torch.backends.quantized.engine = _quantized_engine()
+    return quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def prepare_static(model: nn.Module, image_size=224) -> nn.Module:
+    """
+    Insert observers into a copy of the float model for calibration.
+
+    The classifier head is excluded; it is quantized dynamically after conversion.
+    """
+    if not QUANTIZATION_AVAILABLE:
+        raise RuntimeError("torch.ao.quantization is not available")
+    engine = _quantized_engine()
+    torch.backends.quantized.engine = engine
+    qconfig_mapping = get_default_qconfig_mapping(engine).set_module_name(HEAD_MODULE_NAME, None)
+    model = copy.deepcopy(model).cpu().eval()
+    return prepare_fx(model, qconfig_mapping, _example_inputs(image_size))
+
+
+def convert_static(prepared: nn.Module) -> nn.Module:
+    """Convert a calibrated (or to-be-loaded) prepared model to INT8."""
+    return quantize_head_dynamic(convert_fx(prepared))
+
+
+def calibrate(model: nn.Module, batches: Iterable[torch.Tensor], image_size=224) -> nn.Module:
+    """
+    Static post-training quantization.
+
+    Args:
+        model: Float model in eval mode
+        batches: Preprocessed calibration batches [batch_size, 3, H, W]
+        image_size: Input resolution used for tracing
+
+    Returns:
+        nn.Module: INT8 model
+    """
+    prepared = prepare_static(model, image_size)
+    seen = 0
+    with torch.no_grad():
+        for batch in batches:
+            prepared(batch.cpu())
+            seen += batch.shape[0]
+    if seen == 0:
+        raise ValueError("Calibration needs at least one image")
+    return convert_static(prepared)
+
+
+def load_static(model: nn.Module, quantized_state_dict, image_size=224) -> nn.Module:
+    """Rebuild the INT8 graph for a float model and load calibrated weights/scales."""
+    quantized = convert_static(prepare_static(model, image_size))
+    quantized.load_state_dict(quantized_state_dict)
+    return quantized.eval()
+
+
+def quantize_model(model: nn.Module, mode: str, quantized_state_dict=None) -> nn.Module:
+    """
+    Return the model for an inference mode ('fp32', 'dynamic' or 'int8').
+
+    'int8' needs the state dict written by the calibration command.
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {mode} (expected one of {QUANTIZATION_MODES})")
+    if mode == 'fp32':
+        return model
+    if mode == 'dynamic':
+        return quantize_head_dynamic(model.cpu().eval())
+    if quantized_state_dict is None:
+        raise ValueError("int8 mode requires a calibrated state dict")
+    return load_static(model, quantized_state_dict)
+
+
+def model_size_bytes(model: nn.Module) -> int:
+    """Size of the serialized state dict (parameters + buffers + packed INT8 weights)."""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
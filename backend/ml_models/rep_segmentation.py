@@ -0,0 +1,164 @@
+"""
+Offline vectorized rep segmentation.
+
+以整段角度時間序列一次找出所有動作次數的邊界，語意與
+OpenPoseDetector._evaluate_weightlifting_pose 的串流狀態機相同：
+垂直 -> 伸直 -> 垂直 為一次動作，角度過小或無法計算時重置，
+冷卻時間以幀時間戳記（而非 time.time()）計算。
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+# 角度區間代碼
+ZONE_NONE = 0       # 介於垂直與伸直之間，不影響狀態
+ZONE_VERTICAL = 1   # 垂直區間 [VERTICAL_ANGLE_MIN, VERTICAL_ANGLE_MAX]
+ZONE_EXTENDED = 2   # 伸直 (>= EXTENDED_ANGLE_THRESHOLD)
+ZONE_RESET = 3      # 角度過小 (< VERTICAL_ANGLE_MIN) 或無法計算 (NaN)，狀態回到 idle
+
+
+def classify_zones(angles: np.ndarray, vertical_min: float, vertical_max: float,
+                   extended_threshold: float) -> np.ndarray:
+    """將角度序列依滯後閾值分類為區間代碼"""
+    zones = np.full(angles.shape, ZONE_NONE, dtype=np.int8)
+    with np.errstate(invalid='ignore'):
+        zones[(angles >= vertical_min) & (angles <= vertical_max)] = ZONE_VERTICAL
+        zones[angles >= extended_threshold] = ZONE_EXTENDED
+        zones[(angles < vertical_min) | np.isnan(angles)] = ZONE_RESET
+    return zones
+
+
+def find_completions(angles: np.ndarray, vertical_min: float = 75.0, vertical_max: float = 105.0,
+                     extended_threshold: float = 150.0) -> Dict[str, np.ndarray]:
+    """
+    找出單一手臂所有完成動作的幀（不含冷卻時間）
+
+    去除不影響狀態的幀後，將區間序列壓縮為連續區段（run），
+    完成條件即為「垂直區段 -> 伸直區段 -> 垂直區段」的第三個區段起點。
+
+    Args:
+        angles: 單一手臂角度序列 (N,)，無法計算者為 NaN
+
+    Returns:
+        {'end': 完成幀, 'start': 離開垂直前的最後一幀, 'extend': 進入伸直的第一幀}
+    """
+    angles = np.asarray(angles, dtype=np.float64)
+    zones = classify_zones(angles, vertical_min, vertical_max, extended_threshold)
+
+    significant = np.flatnonzero(zones != ZONE_NONE)
+    empty = np.empty(0, dtype=np.intp)
+    if significant.size < 3:
+        return {'end': empty, 'start': empty, 'extend': empty}
+
+    sig_zones = zones[significant]
+    run_start_mask = np.concatenate(([True], sig_zones[1:] != sig_zones[:-1]))
+    run_start_idx = np.flatnonzero(run_start_mask)
+    run_first = significant[run_start_idx]
+    run_last = significant[np.concatenate((run_start_idx[1:] - 1, [significant.size - 1]))]
+    run_zone = sig_zones[run_start_idx]
+
+    k = np.flatnonzero(
+        (run_zone[2:] == ZONE_VERTICAL)
+        & (run_zone[1:-1] == ZONE_EXTENDED)
+        & (run_zone[:-2] == ZONE_VERTICAL)
+    ) + 2
+    return {
+        'end': run_first[k],
+        'start': run_last[k - 2],
+        'extend': run_first[k - 1],
+    }
+
+
+def apply_cooldown(times: np.ndarray, cooldown_seconds: float) -> np.ndarray:
+    """
+    依冷卻時間篩選候選事件（時間需已排序）
+
+    與串流版相同：與上一次「被計數」的事件相隔至少 cooldown_seconds 才計數。
+    每次以 searchsorted 直接跳到下一個可計數的事件。
+
+    Returns:
+        被計數事件的索引
+    """
+    accepted: List[int] = []
+    i = 0
+    n = times.size
+    while i < n:
+        accepted.append(i)
+        i = int(np.searchsorted(times, times[i] + cooldown_seconds, side='left'))
+    return np.asarray(accepted, dtype=np.intp)
+
+
+def segment_reps(angles: np.ndarray, timestamps: Sequence[float], vertical_min: float = 75.0,
+                 vertical_max: float = 105.0, extended_threshold: float = 150.0,
+                 cooldown_seconds: float = 1.5, sides: Optional[Sequence[str]] = None) -> Dict:
+    """
+    對整段訓練的角度時間序列進行動作分段
+
+    Args:
+        angles: 角度序列 (N,) 或多手臂 (N, arms)，無法計算者為 NaN
+        timestamps: 每幀時間戳記（秒）(N,)
+        vertical_min / vertical_max: 垂直角度區間
+        extended_threshold: 伸直角度閾值
+        cooldown_seconds: 冷卻時間（以幀時間計算）
+        sides: 手臂名稱（預設 ('left', 'right') 或 ('arm',)）
+
+    Returns:
+        {'rep_count': int, 'rep_frames': ndarray, 'reps': [...]}
+    """
+    angles = np.asarray(angles, dtype=np.float64)
+    if angles.ndim == 1:
+        angles = angles[:, None]
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if timestamps.shape[0] != angles.shape[0]:
+        raise ValueError("angles and timestamps must have the same number of frames")
+    if sides is None:
+        sides = ('left', 'right') if angles.shape[1] == 2 else tuple(f'arm_{i}' for i in range(angles.shape[1]))
+
+    # 各手臂獨立執行狀態機，再合併候選事件
+    ends, starts, extends, arm_ids = [], [], [], []
+    for arm in range(angles.shape[1]):
+        found = find_completions(angles[:, arm], vertical_min, vertical_max, extended_threshold)
+        ends.append(found['end'])
+        starts.append(found['start'])
+        extends.append(found['extend'])
+        arm_ids.append(np.full(found['end'].size, arm, dtype=np.intp))
+
+    ends = np.concatenate(ends)
+    starts = np.concatenate(starts)
+    extends = np.concatenate(extends)
+    arm_ids = np.concatenate(arm_ids)
+
+    order = np.lexsort((arm_ids, ends))
+    ends, starts, extends, arm_ids = ends[order], starts[order], extends[order], arm_ids[order]
+
+    # 同一幀多隻手臂完成只計一次
+    unique_frames, first_idx = np.unique(ends, return_index=True)
+    accepted = first_idx[apply_cooldown(timestamps[unique_frames], cooldown_seconds)]
+
+    reps = []
+    for n, idx in enumerate(accepted):
+        end = int(ends[idx])
+        same_frame = np.flatnonzero(ends == end)
+        start = int(starts[same_frame].min())
+        arm = int(arm_ids[idx])
+        ext = int(extends[idx])
+        peak = ext + int(np.nanargmax(angles[ext:end + 1, arm])) if end >= ext else ext
+        reps.append({
+            'index': n + 1,
+            'start_frame': start,
+            'peak_frame': peak,
+            'end_frame': end,
+            'start_time': float(timestamps[start]),
+            'end_time': float(timestamps[end]),
+            'tempo_seconds': float(timestamps[end] - timestamps[start]),
+            'peak_angle': float(angles[peak, arm]),
+            'arms': [sides[a] for a in arm_ids[same_frame]],
+        })
+
+    return {
+        'rep_count': len(reps),
+        'rep_frames': ends[accepted],
+        'reps': reps,
+    }
@@ -0,0 +1,133 @@
+"""
+Inference-only checkpoints in the safetensors layout.
+
+A training checkpoint is a pickle holding the optimizer state and training
+metadata next to the weights; torch.load reads and unpickles all of it. The
+slim artifact written by ``manage.py convert_checkpoint`` holds only the weights
+(fp32 or fp16) plus string metadata (architecture, input size, class names):
+
+    [8-byte little-endian header size][JSON header][raw tensor bytes]
+
+The file is compatible with the safetensors library, but reading it needs
+nothing beyond torch: it is memory-mapped and every tensor is a view into the
+mapping. Loading is then a header parse, pages are read from disk only when
+first touched, and processes serving the same file share its pages through the
+OS page cache.
+"""
+
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import torch
+
+
+FORMAT_VERSION = '1'
+
+SLIM_SUFFIX = '.safetensors'
+
+DTYPES = {
+    'F64': torch.float64, 'F32': torch.float32, 'F16': torch.float16, 'BF16': torch.bfloat16,
+    'I64': torch.int64, 'I32': torch.int32, 'I16': torch.int16, 'I8': torch.int8,
+    'U8': torch.uint8, 'BOOL': torch.bool,
+}
+DTYPE_NAMES = {dtype: name for name, dtype in DTYPES.items()}
+
+# Data section alignment (largest element size), as in safetensors
+ALIGNMENT = 8
+
+
+def default_slim_path(checkpoint_path) -> Path:
+    """<checkpoint>.safetensors next to the training checkpoint."""
+    return Path(checkpoint_path).with_suffix(SLIM_SUFFIX)
+
+
+def is_slim_checkpoint(path) -> bool:
+    return Path(path).suffix == SLIM_SUFFIX
+
+
+def save_slim_checkpoint(state_dict: Dict[str, torch.Tensor], path, metadata: Optional[Dict[str, str]] = None,
+                         dtype: Optional[torch.dtype] = None) -> Path:
+    """
+    Write a state dict as a slim checkpoint.
+
+    Args:
+        state_dict: Tensors to store (moved to CPU, made contiguous)
+        path: Output file
+        metadata: String key/values stored in the header
+        dtype: Cast floating point tensors to this dtype (e.g. torch.float16)
+
+    The file is written next to the target and renamed over it, so processes
+    that have the previous version mapped keep reading intact pages.
+    """
+    tensors = {}
+    for name, tensor in state_dict.items():
+        tensor = tensor.detach().cpu()
+        if dtype is not None and tensor.is_floating_point():
+            tensor = tensor.to(dtype)
+        tensors[name] = tensor.contiguous()
+
+    header = {'__metadata__': {'format_version': FORMAT_VERSION, **{k: str(v) for k, v in (metadata or {}).items()}}}
+    offset = 0
+    for name, tensor in tensors.items():
+        if tensor.dtype not in DTYPE_NAMES:
+            raise ValueError(f"Unsupported dtype {tensor.dtype} for tensor {name}")
+        size = tensor.numel() * tensor.element_size()
+        header[name] = {'dtype': DTYPE_NAMES[tensor.dtype], 'shape': list(tensor.shape),
+                        'data_offsets': [offset, offset + size]}
+        offset += size
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    header_bytes += b' ' * (-(8 + len(header_bytes)) % ALIGNMENT)
+
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for tensor in tensors.values():
+            if tensor.numel():
+                f.write(tensor.reshape(-1).view(torch.uint8).numpy().tobytes())
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_slim_metadata(path) -> Dict[str, str]:
+    """Header metadata only (no tensor data is read)."""
+    with open(path, 'rb') as f:
+        header_size, = struct.unpack('<Q', f.read(8))
+        return json.loads(f.read(header_size)).get('__metadata__', {})
+
+
+def load_slim_checkpoint(path) -> Tuple[Dict[str, torch.Tensor], Dict[str, str]]:
+    """
+    Memory-map a slim checkpoint.
+
+    The mapping is private copy-on-write, so the tensors are writable but
+    untouched pages stay shared with the page cache.
+
+    Returns:
+        (state dict of tensors backed by the file, metadata)
+    """
+    with open(path, 'rb') as f:
+        header_size, = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_size))
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    metadata = header.pop('__metadata__', {})
+    data_start = 8 + header_size
+
+    state_dict = {}
+    for name, info in header.items():
+        dtype = DTYPES[info['dtype']]
+        begin, end = info['data_offsets']
+        if end == begin:
+            state_dict[name] = torch.empty(info['shape'], dtype=dtype)
+            continue
+        count = (end - begin) // torch.empty((), dtype=dtype).element_size()
+        # The tensor keeps a reference to the mapping, which is unmapped with the last tensor
+        state_dict[name] = torch.frombuffer(mapped, dtype=dtype, count=count,
+                                            offset=data_start + begin).view(info['shape'])
+    return state_dict, metadata
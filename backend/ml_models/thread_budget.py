@@ -0,0 +1,139 @@
+"""
+CPU thread budget shared by the native libraries of one web worker.
+
+torch (intra-op and inter-op pools), OpenCV and MediaPipe each size their
+thread pools to every core of the machine. With several gunicorn workers on the
+same box that multiplies into heavy oversubscription under concurrent load.
+apply_thread_budget() runs once per worker process, before any model is used:
+
+- the usable cores (CPU affinity of the process, i.e. the container's cpuset)
+  are split evenly between the workers;
+- torch gets the worker's share as intra-op threads and a single inter-op thread;
+- OpenCV gets one thread (it only handles small per-frame operations here);
+- with CPU_AFFINITY=auto each worker is pinned to its own block of cores,
+  which also bounds MediaPipe's graph threads, as it exposes no thread setting.
+
+Every value can be overridden through the CPU_* settings (0 = derive). The
+effective configuration is reported by thread_budget_status().
+"""
+
+import os
+from typing import Dict, List, Optional
+
+import torch
+
+from .food_classifier import _get_setting
+
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+except ImportError:
+    OPENCV_AVAILABLE = False
+
+
+AFFINITY_MODES = ('off', 'auto')
+
+# Set by a process manager that applies the budget itself after fork (gunicorn.conf.py),
+# so that importing the app in a preloading master does not apply one there
+DEFERRED_ENV = 'CPU_THREAD_BUDGET_DEFERRED'
+
+_applied: Optional[Dict] = None
+
+
+def available_cpus() -> List[int]:
+    """Cores this process may run on (respects cpusets / taskset)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def compute_thread_budget(workers: int = 1, worker_slot: int = 0, cpus: Optional[List[int]] = None,
+                          torch_threads: int = 0, torch_interop_threads: int = 0,
+                          opencv_threads: int = 0, affinity: str = 'off') -> Dict:
+    """
+    Derive the per-worker configuration (0 = derive from core and worker count).
+
+    Args:
+        workers: Worker processes sharing the cores
+        worker_slot: Index of this worker in [0, workers), selects its cores when pinning
+        cpus: Usable cores (default: this process's affinity)
+        affinity: 'off' or 'auto' (pin the worker to its share of the cores)
+    """
+    if affinity not in AFFINITY_MODES:
+        raise ValueError(f"Unknown CPU affinity mode '{affinity}', expected one of {AFFINITY_MODES}")
+    cpus = list(cpus) if cpus is not None else available_cpus()
+    workers = max(1, int(workers))
+    share = max(1, len(cpus) // workers)
+
+    cpu_affinity = None
+    if affinity == 'auto' and len(cpus) > 1:
+        # Contiguous blocks; with more workers than cores, workers share cores round-robin
+        start = (worker_slot * share) % len(cpus)
+        cpu_affinity = [cpus[(start + i) % len(cpus)] for i in range(share)]
+
+    return {
+        'cpus': len(cpus),
+        'workers': workers,
+        'worker_slot': worker_slot,
+        'torch_threads': int(torch_threads) or share,
+        'torch_interop_threads': int(torch_interop_threads) or 1,
+        'opencv_threads': int(opencv_threads) or 1,
+        'cpu_affinity': cpu_affinity,
+    }
+
+
+def apply_thread_budget(workers: Optional[int] = None, worker_slot: int = 0, force: bool = False) -> Optional[Dict]:
+    """
+    Configure torch, OpenCV and CPU affinity for this process, once.
+
+    Args:
+        workers: Worker processes on this machine (default: CPU_WORKERS setting)
+        worker_slot: Index of this worker, see compute_thread_budget()
+        force: Apply even if deferred (DEFERRED_ENV) or applied already, e.g. in a forked worker
+
+    Returns:
+        The applied configuration, or None when skipped
+    """
+    global _applied
+    if not force and (os.getenv(DEFERRED_ENV) or _applied is not None):
+        return None
+
+    budget = compute_thread_budget(
+        workers=workers if workers is not None else int(_get_setting('CPU_WORKERS', 1)),
+        worker_slot=worker_slot,
+        torch_threads=int(_get_setting('CPU_TORCH_THREADS', 0)),
+        torch_interop_threads=int(_get_setting('CPU_TORCH_INTEROP_THREADS', 0)),
+        opencv_threads=int(_get_setting('CPU_OPENCV_THREADS', 0)),
+        affinity=_get_setting('CPU_AFFINITY', 'off'),
+    )
+
+    if budget['cpu_affinity'] is not None:
+        # Before the thread pools are (re)created, so they inherit the mask
+        os.sched_setaffinity(0, budget['cpu_affinity'])
+    torch.set_num_threads(budget['torch_threads'])
+    try:
+        torch.set_num_interop_threads(budget['torch_interop_threads'])
+    except RuntimeError:
+        # Only possible before the first inter-op parallel work (e.g. already set in a preloaded master)
+        budget['torch_interop_threads'] = torch.get_num_interop_threads()
+    if OPENCV_AVAILABLE:
+        cv2.setNumThreads(budget['opencv_threads'])
+
+    _applied = budget
+    return budget
+
+
+def thread_budget_status() -> Dict:
+    """Applied budget and the values currently in effect."""
+    return {
+        'applied': _applied,
+        'effective': {
+            'pid': os.getpid(),
+            'cpu_count': os.cpu_count(),
+            'cpu_affinity': available_cpus(),
+            'torch_threads': torch.get_num_threads(),
+            'torch_interop_threads': torch.get_num_interop_threads(),
+            'opencv_threads': cv2.getNumThreads() if OPENCV_AVAILABLE else None,
+            'omp_num_threads': os.getenv('OMP_NUM_THREADS'),
+        },
+    }
@@ -0,0 +1,120 @@
+"""
+Sharing model memory between pre-forked web workers.
+
+With gunicorn's preload_app (see gunicorn.conf.py) the classifiers are loaded
+once in the master. Forked workers then map the same physical pages
+copy-on-write, as long as nothing writes to them:
+
+- Weights are packed into one contiguous block per dtype (consolidate_weights),
+  so weight pages hold nothing else that a worker would touch.
+- Objects alive at fork time are moved to the permanent GC generation
+  (gc.freeze), so garbage collection in a worker does not dirty their pages.
+- Decode threads, the micro-batching worker and ONNX Runtime sessions do not
+  survive fork and are recreated in each worker (after_fork); torch thread
+  pools are sized per worker by thread_budget.py.
+
+process_memory() reports RSS / PSS / shared / private bytes, so the effect can
+be checked per worker.
+"""
+
+import ctypes
+import gc
+import os
+import resource
+import sys
+from typing import Dict, Optional
+
+import torch
+import torch.nn as nn
+
+
+def consolidate_weights(module: nn.Module) -> int:
+    """
+    Re-home the module's parameters and buffers as views into one contiguous
+    tensor per (dtype, device). Values, shapes and requires_grad are unchanged.
+
+    Returns:
+        int: Bytes packed
+    """
+    groups: Dict[tuple, list] = {}
+    seen = set()
+    for tensor in list(module.parameters()) + list(module.buffers()):
+        # Skip tied weights seen already, quantized and non-contiguous (e.g. channels_last) tensors
+        if id(tensor) in seen or tensor.is_quantized or not tensor.is_contiguous() or tensor.numel() == 0:
+            continue
+        seen.add(id(tensor))
+        groups.setdefault((tensor.dtype, tensor.device), []).append(tensor)
+
+    packed = 0
+    with torch.no_grad():
+        for (dtype, device), tensors in groups.items():
+            flat = torch.empty(sum(t.numel() for t in tensors), dtype=dtype, device=device)
+            offset = 0
+            for t in tensors:
+                view = flat[offset:offset + t.numel()].view_as(t)
+                view.copy_(t)
+                t.data = view
+                offset += t.numel()
+            packed += flat.numel() * flat.element_size()
+    return packed
+
+
+def _malloc_trim():
+    """Return freed heap pages (checkpoint dicts, pre-packing weights) to the OS (glibc only)."""
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def prepare_fork() -> int:
+    """
+    Run in the parent once models are loaded and before workers are forked.
+
+    Returns:
+        int: Bytes of weights packed for sharing
+    """
+    from .model_registry import get_model_registry
+
+    packed = sum(instance.share_weights() for instance in get_model_registry().instances()
+                 if hasattr(instance, 'share_weights'))
+    gc.collect()
+    gc.freeze()
+    _malloc_trim()
+    return packed
+
+
+def after_fork():
+    """Run in a forked worker, after its thread budget is applied."""
+    from .model_registry import get_model_registry
+
+    for instance in get_model_registry().instances():
+        if hasattr(instance, 'after_fork'):
+            instance.after_fork()
+
+
+def process_memory(pid: Optional[int] = None) -> Dict[str, Optional[int]]:
+    """
+    Memory of a process in bytes: rss, pss (shared pages split between the
+    processes mapping them), shared and private. On Linux this comes from
+    /proc/<pid>/smaps_rollup; elsewhere only the current process's peak RSS is known.
+    """
+    pid = pid or os.getpid()
+    fields = {'Rss': 'rss', 'Pss': 'pss', 'Shared_Clean': 'shared', 'Shared_Dirty': 'shared',
+              'Private_Clean': 'private', 'Private_Dirty': 'private'}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            usage = {'pid': pid, 'rss': 0, 'pss': 0, 'shared': 0, 'private': 0}
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in fields:
+                    usage[fields[key]] += int(value.split()[0]) * 1024
+            return usage
+    except OSError:
+        pass
+    if pid != os.getpid():
+        return {'pid': pid, 'rss': None, 'pss': None, 'shared': None, 'private': None}
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {'pid': pid, 'rss': peak if sys.platform == 'darwin' else peak * 1024,
+            'pss': None, 'shared': None, 'private': None}